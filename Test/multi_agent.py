@@ -50,15 +50,14 @@ class MultiAgentTester:
                 thread_id=thread_id,
                 summary_with_llm=True
             ):
-                if chunk.strip() and not chunk.startswith("data: [DONE]"):
-                    # 提取实际内容，跳过SSE格式
-                    if chunk.startswith("data: "):
-                        try:
-                            data = json.loads(chunk[6:])
-                            if isinstance(data, dict) and "content" in data:
-                                response += data["content"]
-                        except json.JSONDecodeError:
-                            continue
+                # 提取实际内容，跳过SSE格式，只累加token事件
+                if chunk.startswith(b"data: "):
+                    try:
+                        data = json.loads(chunk[6:])
+                        if isinstance(data, dict) and data.get("type") == "token":
+                            response += data["content"]
+                    except json.JSONDecodeError:
+                        continue
             
             result = {
                 "agent_id": agent_id,
@@ -2,8 +2,9 @@
 配置管理模块
 用于加载环境变量和配置项
 """
+import json
 import os
-from typing import Optional
+from typing import Dict, Optional
 from pathlib import Path
 
 
@@ -51,6 +52,55 @@ class Config:
     def database_url(self) -> str:
         return os.getenv("DATABASE_URL", "postgresql://localhost:5432/chatbot")
     
+    # 数据库连接池配置
+    @property
+    def db_pool_min_size(self) -> int:
+        return int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+
+    @property
+    def db_pool_max_size(self) -> int:
+        return int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+
+    @property
+    def db_pool_max_idle(self) -> float:
+        """空闲连接回收时间（秒）"""
+        return float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+
+    @property
+    def db_pool_max_lifetime(self) -> float:
+        """连接最长存活时间（秒）"""
+        return float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+
+    @property
+    def db_pool_timeout(self) -> float:
+        """获取连接的最长等待时间（秒）"""
+        return float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+    @property
+    def db_pool_pre_ping(self) -> bool:
+        """借出连接前是否检查连接可用性"""
+        return os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    @property
+    def checkpoint_auto_migrate(self) -> bool:
+        """启动时是否自动执行检查点表结构迁移"""
+        return os.getenv("CHECKPOINT_AUTO_MIGRATE", "true").lower() == "true"
+
+    @property
+    def message_index_enabled(self) -> bool:
+        """是否维护消息ID索引表，用于按ID读取和修改单条消息"""
+        return os.getenv("MESSAGE_INDEX_ENABLED", "true").lower() == "true"
+
+    @property
+    def message_index_cache_threads(self) -> int:
+        """进程内缓存消息内容哈希的线程数"""
+        return int(os.getenv("MESSAGE_INDEX_CACHE_THREADS", "256"))
+
+    @property
+    def graph_cache_size(self) -> int:
+        """已编译对话图的最大缓存数量"""
+        return int(os.getenv("GRAPH_CACHE_SIZE", "8"))
+
     # 搜索API配置
     @property
     def search_api_key(self) -> str:
@@ -64,10 +114,261 @@ class Config:
     def crawl_api_url(self) -> str:
         return os.getenv("CRAWL_API_URL", "https://api.search1api.com/crawl")
     
+    # HTTP客户端配置（搜索和网页爬取）
+    @property
+    def http_connect_timeout(self) -> float:
+        return float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+    @property
+    def http_read_timeout(self) -> float:
+        return float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+
+    @property
+    def crawl_read_timeout(self) -> float:
+        """网页爬取请求的读取超时时间（秒）"""
+        return float(os.getenv("CRAWL_READ_TIMEOUT", "60"))
+
+    @property
+    def http_max_connections(self) -> int:
+        return int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+
+    @property
+    def http_max_keepalive(self) -> int:
+        return int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+
+    @property
+    def http_max_concurrency(self) -> int:
+        """同时进行的外部HTTP请求上限"""
+        return int(os.getenv("HTTP_MAX_CONCURRENCY", "20"))
+
+    # 搜索结果缓存配置
+    @property
+    def search_cache_ttl(self) -> float:
+        """搜索结果缓存过期时间（秒）"""
+        return float(os.getenv("SEARCH_CACHE_TTL", "300"))
+
+    @property
+    def search_cache_max_entries(self) -> int:
+        return int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "512"))
+
+    # 网页爬取模式配置
+    @property
+    def crawl_mode(self) -> str:
+        """爬取模式：fanout（逐个URL并发爬取）或 batch（单次批量请求）"""
+        return os.getenv("CRAWL_MODE", "fanout").lower()
+
+    @property
+    def crawl_max_concurrency(self) -> int:
+        return int(os.getenv("CRAWL_MAX_CONCURRENCY", "8"))
+
+    @property
+    def crawl_per_host_limit(self) -> int:
+        return int(os.getenv("CRAWL_PER_HOST_LIMIT", "2"))
+
+    @property
+    def crawl_url_timeout(self) -> float:
+        """单个URL的爬取超时时间（秒）"""
+        return float(os.getenv("CRAWL_URL_TIMEOUT", "20"))
+
+    @property
+    def crawl_time_budget(self) -> float:
+        """一次web_crawler调用的总时间预算（秒）"""
+        return float(os.getenv("CRAWL_TIME_BUDGET", "25"))
+
+    # 网页爬取缓存配置
+    @property
+    def crawl_cache_ttl(self) -> float:
+        """网页内容缓存过期时间（秒）"""
+        return float(os.getenv("CRAWL_CACHE_TTL", "1800"))
+
+    @property
+    def crawl_cache_max_entries(self) -> int:
+        return int(os.getenv("CRAWL_CACHE_MAX_ENTRIES", "256"))
+
+    # Redis配置（可选，为空时只使用进程内缓存）
+    @property
+    def redis_url(self) -> str:
+        return os.getenv("REDIS_URL", "")
+
     # MCP服务器配置
     @property
     def mcp_server_url(self) -> str:
         return os.getenv("MCP_SERVER_URL", "http://localhost:8080/mcp")
+
+    @property
+    def mcp_tools_ttl(self) -> float:
+        """MCP工具列表后台刷新间隔（秒）"""
+        return float(os.getenv("MCP_TOOLS_TTL", "300"))
+
+    @property
+    def mcp_discovery_timeout(self) -> float:
+        """单次MCP工具发现的超时时间（秒）"""
+        return float(os.getenv("MCP_DISCOVERY_TIMEOUT", "10"))
+
+    # 上下文窗口配置
+    @property
+    def context_max_tokens(self) -> int:
+        """每轮发送给LLM的上下文token预算（含系统提示词）"""
+        return int(os.getenv("CONTEXT_MAX_TOKENS", "24000"))
+
+    @property
+    def context_keep_tool_turns(self) -> int:
+        """保留完整工具输出的最新对话轮数，更早的工具输出以占位代替"""
+        return int(os.getenv("CONTEXT_KEEP_TOOL_TURNS", "2"))
+
+    @property
+    def context_tool_preview_chars(self) -> int:
+        """省略工具输出时保留的预览字符数"""
+        return int(os.getenv("CONTEXT_TOOL_PREVIEW_CHARS", "200"))
+
+    # 滚动对话摘要配置
+    @property
+    def summary_enabled(self) -> bool:
+        """是否在每轮对话后于后台更新滚动摘要"""
+        return os.getenv("SUMMARY_ENABLED", "true").lower() == "true"
+
+    @property
+    def summary_keep_turns(self) -> int:
+        """不参与摘要、原样发送的最近轮数"""
+        return int(os.getenv("SUMMARY_KEEP_TURNS", "6"))
+
+    @property
+    def summary_min_delta_turns(self) -> int:
+        """累计多少轮新增的较早对话后才更新摘要"""
+        return int(os.getenv("SUMMARY_MIN_DELTA_TURNS", "2"))
+
+    @property
+    def summary_max_chars(self) -> int:
+        """摘要的最大字符数"""
+        return int(os.getenv("SUMMARY_MAX_CHARS", "2000"))
+
+    # 流式响应配置
+    @property
+    def sse_flush_bytes(self) -> int:
+        """token缓冲达到该字节数时发送，0表示不按大小合并"""
+        return int(os.getenv("SSE_FLUSH_BYTES", "0"))
+
+    @property
+    def sse_flush_ms(self) -> int:
+        """第一个token缓冲超过该毫秒数时发送，0表示不按时间合并"""
+        return int(os.getenv("SSE_FLUSH_MS", "0"))
+
+    @property
+    def sse_disconnect_poll_ms(self) -> int:
+        """检查客户端是否断开的间隔（毫秒）"""
+        return int(os.getenv("SSE_DISCONNECT_POLL_MS", "500"))
+
+    @property
+    def turn_stream_max_events(self) -> int:
+        """每轮对话事件环形缓冲的容量，断线重连时从中重放"""
+        return int(os.getenv("TURN_STREAM_MAX_EVENTS", "4096"))
+
+    @property
+    def turn_stream_grace_seconds(self) -> float:
+        """所有客户端断开后等待重连的时间（秒），超时后取消本轮生成，0表示立即取消"""
+        return float(os.getenv("TURN_STREAM_GRACE_SECONDS", "30"))
+
+    @property
+    def turn_stream_retention_seconds(self) -> float:
+        """本轮结束后事件保留的时间（秒）"""
+        return float(os.getenv("TURN_STREAM_RETENTION_SECONDS", "300"))
+
+    @property
+    def turn_stream_redis(self) -> bool:
+        """是否把事件同步写入Redis，使其他worker也能重放（需要配置REDIS_URL）"""
+        return os.getenv("TURN_STREAM_REDIS", "false").lower() == "true"
+
+    @property
+    def thread_busy_policy(self) -> str:
+        """同一线程已有一轮在运行时的处理策略：reject（返回409）、queue（排队等待）、cancel_older（取消正在运行的一轮）"""
+        return os.getenv("THREAD_BUSY_POLICY", "queue").lower()
+
+    @property
+    def thread_queue_timeout(self) -> float:
+        """排队等待线程空闲的最长时间（秒），超时后返回409"""
+        return float(os.getenv("THREAD_QUEUE_TIMEOUT", "30"))
+
+    @property
+    def thread_lock_backend(self) -> str:
+        """线程锁的实现：local（进程内）、postgres（advisory lock，多个worker之间互斥）"""
+        return os.getenv("THREAD_LOCK_BACKEND", "local").lower()
+
+    # 工具结果处理配置
+    @property
+    def result_processing_mode(self) -> str:
+        """MCP工具结果处理模式：auto(规则优先，必要时LLM)/formatted/structured/raw"""
+        return os.getenv("RESULT_PROCESSING_MODE", "auto")
+
+    @property
+    def result_cache_max_entries(self) -> int:
+        """LLM处理结果进程内缓存的最大条目数"""
+        return int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))
+
+    @property
+    def result_cache_path(self) -> str:
+        """LLM处理结果SQLite持久化文件路径，为空时只使用进程内缓存"""
+        return os.getenv("RESULT_CACHE_PATH", "")
+
+    @property
+    def result_cache_store_max_entries(self) -> int:
+        """SQLite持久化层的最大条目数"""
+        return int(os.getenv("RESULT_CACHE_STORE_MAX_ENTRIES", "10000"))
+
+    @property
+    def result_small_bytes(self) -> int:
+        """小于该字节数的工具结果不调用LLM，原样返回或按规则格式化"""
+        return int(os.getenv("RESULT_SMALL_BYTES", "512"))
+
+    @property
+    def result_large_bytes(self) -> int:
+        """不小于该字节数的工具结果切块并发摘要"""
+        return int(os.getenv("RESULT_LARGE_BYTES", "16000"))
+
+    @property
+    def result_chunk_bytes(self) -> int:
+        """超大结果切块时每块的最大字节数"""
+        return int(os.getenv("RESULT_CHUNK_BYTES", "6000"))
+
+    @property
+    def result_max_chunks(self) -> int:
+        """超大结果最多处理的块数，超出部分省略"""
+        return int(os.getenv("RESULT_MAX_CHUNKS", "8"))
+
+    @property
+    def result_policy_overrides(self) -> Dict[str, Dict[str, int]]:
+        """按工具名称覆盖大小阈值，JSON格式，例如 {"query_all_grades": {"large_bytes": 32000}}"""
+        raw = os.getenv("RESULT_POLICY_OVERRIDES", "")
+        if not raw:
+            return {}
+        try:
+            overrides = json.loads(raw)
+            return {name: dict(policy) for name, policy in overrides.items()}
+        except (ValueError, TypeError, AttributeError) as e:
+            print(f"RESULT_POLICY_OVERRIDES配置格式错误，已忽略: {e}")
+            return {}
+
+    # 工具执行配置
+    @property
+    def tool_max_concurrency(self) -> int:
+        """同一轮模型输出中并发执行的最大工具调用数"""
+        return int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+
+    @property
+    def tool_timeout(self) -> float:
+        """单个工具调用的默认超时时间（秒）"""
+        return float(os.getenv("TOOL_TIMEOUT", "60"))
+
+    @property
+    def tool_timeout_overrides(self) -> Dict[str, float]:
+        """按工具名称覆盖超时时间，JSON格式，例如 {"web_crawler": 90}"""
+        raw = os.getenv("TOOL_TIMEOUTS", "")
+        if not raw:
+            return {}
+        try:
+            return {name: float(value) for name, value in json.loads(raw).items()}
+        except (ValueError, AttributeError) as e:
+            print(f"TOOL_TIMEOUTS配置格式错误，已忽略: {e}")
+            return {}
     
     def validate(self) -> None:
         """验证必要的配置项是否存在"""
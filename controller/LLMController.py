@@ -1,8 +1,12 @@
-from typing import List, Any, Union
+from typing import List, Any, Union, Optional, Literal
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import Response
 from langchain_core.messages import BaseMessage
 
+from llm.llm_chat_with_tools.chatbot.json_codec import dumps_json
+from llm.llm_chat_with_tools.chatbot.thread_lock import ThreadBusyError
+
 from service.impl.LLMServiceImpl import LLMService, LLMServiceImpl
 from vo.ChatAgentRequest import ChatAgentRequest
 from vo.EditMessageRequest import EditMessageRequest, EditWithIDRequest
@@ -20,6 +24,7 @@ class LLMController:
         self.router.post("/house/")(self.get_house_info)
         self.router.post("/chat/tools")(self.chat_with_tools)
         self.router.get("/chat/history/{thread_id}")(self.get_history)
+        self.router.get("/chat/history/{thread_id}/page")(self.get_history_page)
         self.router.get("/chat/message/{thread_id}/{message_id}")(
             self.get_message_by_id
         )
@@ -33,22 +38,49 @@ class LLMController:
         )
         self.router.post("/chat/history/batch/delete")(self.delete_threads_batch)
         self.router.post("/chat/name/{thread_id}")(self.generate_chat_name)
+        self.router.get("/chat/runtime/stats")(self.get_runtime_stats)
 
     async def get_house_info(self, request: HouseInfoRequest):
         return await self.llm_service.get_house_info_service(request.query)
 
-    async def chat_with_tools(self, request: ChatAgentRequest):
+    async def chat_with_tools(
+        self,
+        request: ChatAgentRequest,
+        http_request: Request,
+        last_event_id: Optional[str] = Header(default=None),
+    ):
         """
         添加工具的对话
         :param request: 对话请求
-        :return: sse返回回复内容
-        """
-        return await self.llm_service.chat_with_tools(
-            query=request.query,
-            thread_id=request.thread_id,
-            model=request.model,
-            summary_with_llm=request.summary_with_llm,
-        )
+        :param http_request: HTTP请求，用于检测客户端断开
+        :param last_event_id: 断线重连时客户端收到的最后事件ID，携带时只恢复事件流，不重新执行
+        :return: sse返回回复内容，该线程正在生成且按策略拒绝或排队超时时返回409
+        """
+        if last_event_id:
+            response = await self.llm_service.resume_chat_stream(
+                request.thread_id,
+                last_event_id,
+                is_disconnected=http_request.is_disconnected,
+            )
+            if response is None:
+                raise HTTPException(
+                    status_code=410, detail="该轮对话的事件流已无法恢复，请重新加载对话历史"
+                )
+            return response
+
+        try:
+            return await self.llm_service.chat_with_tools(
+                query=request.query,
+                thread_id=request.thread_id,
+                model=request.model,
+                summary_with_llm=request.summary_with_llm,
+                flush_bytes=request.flush_bytes,
+                flush_ms=request.flush_ms,
+                busy_policy=request.busy_policy,
+                is_disconnected=http_request.is_disconnected,
+            )
+        except ThreadBusyError as e:
+            raise HTTPException(status_code=409, detail=str(e))
 
     async def get_history(self, thread_id: str) -> List[BaseMessage]:
         """
@@ -58,6 +90,47 @@ class LLMController:
         """
         return await self.llm_service.get_history(thread_id=thread_id)
 
+    async def get_history_page(
+        self,
+        thread_id: str,
+        limit: int = Query(50, ge=1, le=200, description="每页条数"),
+        before_id: Optional[str] = Query(None, description="返回该消息之前的消息"),
+        after_id: Optional[str] = Query(None, description="返回该消息之后的消息"),
+        exclude_tools: bool = Query(False, description="是否排除工具调用和工具结果"),
+        fields: Literal["full", "preview"] = Query(
+            "full", description="full返回完整消息，preview只返回id/type/内容预览"
+        ),
+    ) -> Response:
+        """
+        分页获取聊天历史记录，响应体只序列化一次
+        :param thread_id: 线程ID
+        :param limit: 每页条数
+        :param before_id: 向前翻页的游标消息ID
+        :param after_id: 向后翻页的游标消息ID
+        :param exclude_tools: 是否排除工具消息
+        :param fields: 返回字段
+        :return: 分页结果
+        """
+        if before_id and after_id:
+            raise HTTPException(
+                status_code=400, detail="before_id和after_id不能同时指定"
+            )
+
+        page = await self.llm_service.get_history_page(
+            thread_id,
+            limit=limit,
+            before_id=before_id,
+            after_id=after_id,
+            exclude_tools=exclude_tools,
+            fields=fields,
+        )
+        if page is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Message with ID {before_id or after_id} not found in thread {thread_id}",
+            )
+        return Response(content=dumps_json(page), media_type="application/json")
+
     async def get_message_by_id(self, thread_id: str, message_id: str) -> BaseMessage:
         """
         根据消息ID获取指定消息
@@ -159,3 +232,10 @@ class LLMController:
             return {"thread_id": thread_id, "title": title, "status": "success"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"生成对话标题失败: {str(e)}")
+
+    async def get_runtime_stats(self) -> dict[str, Any]:
+        """
+        获取对话运行时统计信息，包含数据库连接池等待指标
+        :return: 统计信息
+        """
+        return await self.llm_service.get_runtime_stats()
@@ -1,28 +1,41 @@
-import json
+import asyncio
+import time
 import uuid
-from typing import TypedDict, Annotated, Sequence, List, Coroutine, Any, Optional
+from typing import (
+    TypedDict,
+    Annotated,
+    Sequence,
+    List,
+    Coroutine,
+    Any,
+    Optional,
+    Tuple,
+    Dict,
+    AsyncIterator,
+)
 from datetime import datetime
 import pytz
 
-import psycopg
 from langchain_core.messages import (
     BaseMessage,
     HumanMessage,
+    RemoveMessage,
     AIMessage,
     AIMessageChunk,
     ToolMessage,
 )
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
 from langchain_deepseek import ChatDeepSeek
 import os
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
 from langgraph.graph import add_messages, StateGraph, START
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langgraph.typing import StateT
+from psycopg_pool import AsyncConnectionPool
 
 from config import config as app_config
 
@@ -31,6 +44,31 @@ from llm.llm_chat_with_tools.tools.search_tools import (
     search_tool,
     web_crawler,
 )
+from llm.llm_chat_with_tools.chatbot.conversation_summary import (
+    conversation_summarizer,
+    messages_after,
+)
+from llm.llm_chat_with_tools.chatbot.checkpoint_store import delete_threads
+from llm.llm_chat_with_tools.chatbot.history import paginate_messages
+from llm.llm_chat_with_tools.chatbot.message_index import IndexedPostgresSaver
+from llm.llm_chat_with_tools.chatbot.thread_lock import (
+    ThreadBusyError,
+    ThreadLease,
+    thread_locks,
+)
+from llm.llm_chat_with_tools.chatbot.sse_events import (
+    FlushPolicy,
+    SSEEncoder,
+    StreamEvent,
+    chunk_text,
+    coalesce_events,
+)
+from llm.llm_chat_with_tools.chatbot.context_window import (
+    context_window,
+    count_message_tokens,
+    estimate_tokens,
+)
+from llm.llm_chat_with_tools.tools.tool_executor import create_tool_executor
 from llm.llm_chat_with_tools.tools.result_processor import (
     result_processor,
     ProcessingMode,
@@ -40,33 +78,48 @@ from llm.llm_chat_with_tools.tools.result_processor import (
 # 配置验证
 app_config.validate()
 
+# 需要进行结果处理的MCP工具名称前缀
+MCP_RESULT_PREFIXES = ("get_", "query_", "fetch_")
+
+# 客户端断开导致工具调用被取消时写入的工具结果
+TOOL_CALL_CANCELLED_CONTENT = "⏹️ 工具调用已取消：客户端在执行完成前断开了连接"
+
+
+def get_processing_mode() -> ProcessingMode:
+    """
+    读取配置的MCP工具结果处理模式，配置无效时使用AUTO
+    :return: 处理模式
+    """
+    try:
+        return ProcessingMode(app_config.result_processing_mode)
+    except ValueError:
+        print(f"无效的RESULT_PROCESSING_MODE: {app_config.result_processing_mode}，使用auto")
+        return ProcessingMode.AUTO
+
 
 class ChatState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
+    # 较早轮次的滚动摘要，以及摘要覆盖到的最后一条消息ID
+    summary: str
+    summarized_upto: Optional[str]
 
 
-def get_current_time_prompt() -> str:
-    """获取包含当前时间信息的系统提示词"""
-    # 获取中国时间（东八区）
-    china_tz = pytz.timezone("Asia/Shanghai")
-    current_time = datetime.now(china_tz)
-
-    # 格式化时间信息
-    time_str = current_time.strftime("%Y年%m月%d日 %H:%M:%S")
-    weekday_map = {
-        0: "星期一",
-        1: "星期二",
-        2: "星期三",
-        3: "星期四",
-        4: "星期五",
-        5: "星期六",
-        6: "星期日",
-    }
-    weekday = weekday_map[current_time.weekday()]
-
-    return f"""你是一个专业的AI智能助手，拥有多种工具能力，致力于为用户提供准确、及时、有用的信息和解决方案。
-
-⏰ **当前时间**: {time_str} ({weekday}) - 中国标准时间 (GMT+8)
+# 中国时区（东八区），模块加载时解析一次
+CHINA_TZ = pytz.timezone("Asia/Shanghai")
+
+WEEKDAY_MAP = {
+    0: "星期一",
+    1: "星期二",
+    2: "星期三",
+    3: "星期四",
+    4: "星期五",
+    5: "星期六",
+    6: "星期日",
+}
+
+SYSTEM_PROMPT = """你是一个专业的AI智能助手，拥有多种工具能力，致力于为用户提供准确、及时、有用的信息和解决方案。
+
+⏰ **当前时间**: {current_time} - 中国标准时间 (GMT+8)
 
 核心能力与工具：
 🔍 智能搜索：实时获取最新网络信息，包括新闻、资讯、技术文档等
@@ -90,24 +143,50 @@ def get_current_time_prompt() -> str:
 - 对于时间相关的查询，参考当前时间提供准确信息
 - 始终以用户需求为导向，灵活运用各种工具组合
 
-请根据用户问题的性质，智能选择最合适的工具组合来提供最佳解决方案。"""
+请根据用户问题的性质，智能选择最合适的工具组合来提供最佳解决方案。{summary}"""
 
-
-client = MultiServerMCPClient(
-    {
-        "Student_Grade_System": {
-            "url": app_config.mcp_server_url,
-            "transport": "streamable_http",
-        }
-    }
+# 预编译的对话提示词模板，当前时间和较早对话的摘要作为模板变量在每轮注入
+CHAT_PROMPT = ChatPromptTemplate.from_messages(
+    [("system", SYSTEM_PROMPT), ("placeholder", "{messages}")]
 )
 
-mcp_tools = []
+# (分钟时间戳, 格式化后的时间字符串)
+_current_time_cache: Tuple[int, str] = (-1, "")
+
+
+def get_current_time_str() -> str:
+    """获取当前中国时间的描述，按分钟粒度缓存"""
+    global _current_time_cache
+    minute = int(time.time() // 60)
+    if _current_time_cache[0] != minute:
+        current_time = datetime.fromtimestamp(minute * 60, CHINA_TZ)
+        time_str = current_time.strftime("%Y年%m月%d日 %H:%M")
+        weekday = WEEKDAY_MAP[current_time.weekday()]
+        _current_time_cache = (minute, f"{time_str} ({weekday})")
+    return _current_time_cache[1]
+
+
+def get_current_time_prompt() -> str:
+    """获取包含当前时间信息的系统提示词"""
+    return SYSTEM_PROMPT.format(current_time=get_current_time_str(), summary="")
+
+
+def get_summary_prompt(summary: str) -> str:
+    """获取拼接在系统提示词末尾的摘要段落，没有摘要时为空"""
+    return f"\n\n📝 **较早对话的摘要**：\n{summary}" if summary else ""
 
 
-async def get_tools():
-    global mcp_tools
-    mcp_tools = await client.get_tools()
+# 系统提示词的token数，在上下文预算中预留
+SYSTEM_PROMPT_TOKENS = estimate_tokens(get_current_time_prompt())
+
+
+# 内置工具，MCP工具由工具注册表发现后在ChatRuntime中合并
+BASE_TOOLS = [
+    search_tool,
+    calculate_tools,
+    advanced_math,
+    web_crawler,
+]
 
 
 class ChatBot:
@@ -127,19 +206,20 @@ class ChatBot:
             temperature=0.6,
             # extra_body={"thinking_budget": 1024},
         )
-        self.tools = [
-            search_tool,
-            calculate_tools,
-            advanced_math,
-            web_crawler,
-        ]
+        self.tools = list(BASE_TOOLS)
         self.llm_with_tools = None
         self.tool_node = None
         self.enable_result_processing = enable_result_processing
         self.result_processor = result_processor
-
-        # 初始化时不创建prompt，在chatbot方法中动态生成
-
+        self.processing_mode = get_processing_mode()
+        self.context_window = context_window
+        self.summarizer = conversation_summarizer
+        # 线程ID -> 正在进行的后台摘要任务
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+        self._repair_tasks: Dict[str, asyncio.Task] = {}
+
+        # 提示词模板预编译，chain在绑定工具后构建
+        self.prompt = CHAT_PROMPT
         self.chain = None
 
         # 类型注解：明确graph的类型，帮助IDE提供代码补全
@@ -147,20 +227,29 @@ class ChatBot:
         self.memory: Optional[AsyncPostgresSaver] = None
         self.graph: Optional[CompiledStateGraph[ChatState]] = None
 
-    async def initialize(self):
-        conn = await psycopg.AsyncConnection.connect(
-            app_config.database_url,
-            autocommit=True,
-        )
-        self.memory = AsyncPostgresSaver(conn)
+    async def initialize(
+        self,
+        memory: Optional[AsyncPostgresSaver] = None,
+        tools: Optional[Sequence[BaseTool]] = None,
+    ):
+        """
+        初始化检查点存储、工具和对话图
+        :param memory: 共享的检查点存储，为空时使用全局ChatRuntime
+        :param tools: 完整工具列表，为空时使用全局ChatRuntime的工具
+        """
+        if memory is None or tools is None:
+            from llm.llm_chat_with_tools.chatbot.chat_runtime import chat_runtime
+
+            await chat_runtime.start()
+            memory = memory or chat_runtime.memory
+            tools = tools if tools is not None else chat_runtime.tools
 
-        await self.memory.setup()
+        self.memory = memory
         if not self.llm_with_tools:
-            await get_tools()
-            self.tools.extend(mcp_tools)
-            print(self.tools)
+            self.tools = list(tools)
             self.llm_with_tools = self.llm.bind_tools(tools=self.tools)
-            self.tool_node = ToolNode(tools=self.tools)
+            self.chain = self.prompt | self.llm_with_tools
+            self.tool_node = create_tool_executor(self.tools)
         self.graph = await self.create_graph()
 
     async def chatbot(self, state: ChatState):
@@ -173,53 +262,73 @@ class ChatBot:
         print(f"messages: {messages}")
         print("chatbot")
 
-        # 动态创建包含当前时间的prompt
-        current_prompt = ChatPromptTemplate.from_messages(
-            [("system", get_current_time_prompt()), ("placeholder", "{messages}")]
+        # 已摘要的轮次用摘要代替，摘要覆盖的消息被编辑或删除时回退到完整历史
+        summary = state.get("summary") or ""
+        recent = messages_after(messages, state.get("summarized_upto"))
+        if not summary or recent is None:
+            summary, recent = "", list(messages)
+        # 摘要放在唯一的系统提示词中，部分模型不接受不在开头的系统消息
+        summary_prompt = get_summary_prompt(summary)
+        reserved_tokens = SYSTEM_PROMPT_TOKENS + estimate_tokens(summary_prompt)
+
+        # 只发送token预算内的最近轮次，较早的工具输出以占位代替
+        window = self.context_window.select(recent, reserved_tokens=reserved_tokens)
+
+        # chain在初始化时构建，每轮只替换时间、摘要和消息变量
+        response = await self.chain.ainvoke(
+            {
+                "messages": window,
+                "current_time": get_current_time_str(),
+                "summary": summary_prompt,
+            }
         )
-
-        # 创建包含当前时间信息的chain
-        chain = current_prompt | self.llm_with_tools
-
-        response = await chain.ainvoke({"messages": messages})
+        # 随消息一起写入检查点，后续轮次无需重新计算
+        count_message_tokens(response)
         return {"messages": response}
 
     async def process_tool_results(self, state: ChatState):
         """
         处理工具执行结果的节点
+
+        只处理本轮工具节点刚产生的ToolMessage（最后一条AIMessage之后），
+        MCP工具结果并发处理，JSON/表格数据按规则格式化，无需调用LLM
         """
         messages = state["messages"]
-        processed_messages = []
+        if not self.enable_result_processing:
+            return {"messages": []}
 
-        length = len(messages)
-        for i in range(length - 1, -1, -1):
-            message = messages[i]
-            if isinstance(message, HumanMessage):
+        pending: List[ToolMessage] = []
+        for message in reversed(messages):
+            if not isinstance(message, ToolMessage):
                 break
-            if isinstance(message, ToolMessage) and self.enable_result_processing:
-                # 获取工具名称
-                tool_name = getattr(message, "name", "unknown_tool")
-                original_content = message.content
-
-                try:
-                    # 如果是MCP工具结果，进行处理
-                    if any(
-                        tool_name.startswith(prefix)
-                        for prefix in ["get_", "query_", "fetch_"]
-                    ):
-                        processed_content = await self.result_processor.process_result(
-                            tool_name=tool_name,
-                            result=original_content,
-                            mode=ProcessingMode.FORMATTED,
-                        )
-                        message.content = processed_content
-                except Exception as e:
-                    print(f"处理工具结果时出错: {e}")
-                    # 保持原始内容
+            # 如果是MCP工具结果，进行处理
+            tool_name = getattr(message, "name", None) or "unknown_tool"
+            if isinstance(message.content, str) and any(
+                tool_name.startswith(prefix) for prefix in MCP_RESULT_PREFIXES
+            ):
+                pending.append(message)
 
-            processed_messages.append(message)
+        if not pending:
+            return {"messages": []}
 
-        return {"messages": processed_messages}
+        pending.reverse()
+        try:
+            processed_contents = await self.result_processor.process_results(
+                [(message.name, message.content) for message in pending],
+                mode=self.processing_mode,
+            )
+        except Exception as e:
+            print(f"处理工具结果时出错: {e}")
+            # 保持原始内容
+            return {"messages": []}
+
+        # 返回同ID的副本按ID替换，不原地修改状态中的消息
+        return {
+            "messages": [
+                message.model_copy(update={"content": processed_content})
+                for message, processed_content in zip(pending, processed_contents)
+            ]
+        }
 
     async def create_graph(self):
         if self.memory is None:
@@ -248,13 +357,21 @@ class ChatBot:
         return graph_builder.compile(checkpointer=self.memory)
 
     async def generate(
-        self, query: str, thread_id: str, summary_with_llm: bool = False
+        self,
+        query: str,
+        thread_id: str,
+        summary_with_llm: bool = False,
+        flush_policy: Optional[FlushPolicy] = None,
     ):
         """
         对话内容生成
+
+        本生成器被关闭或取消时取消本轮的对话图运行，包括正在执行的工具调用和结果处理，
+        并等待检查点中未完成的工具调用修复完成后才结束，同一线程的下一轮总能读到完整的历史
         :param query: 问题内容
         :param thread_id: 线程id
         :param summary_with_llm: 是否启用LLM智能总结功能
+        :param flush_policy: token合并策略，为空时使用配置（默认逐token发送）
         :return: stream返回llm内容
         """
         if self.graph is None:
@@ -263,30 +380,221 @@ class ChatBot:
         # 类型断言：告诉IDE此时graph不为None，提供完整的代码补全
         assert self.graph is not None, "Graph should be initialized"
 
+        encoder = SSEEncoder()
+        events = self._stream_events(query, thread_id, summary_with_llm)
+        repairs: List[asyncio.Task] = []
+        try:
+            async for data in coalesce_events(
+                events,
+                encoder,
+                flush_policy or FlushPolicy.resolve(),
+                on_cancel=lambda run: repairs.append(
+                    self.schedule_turn_repair(thread_id, run)
+                ),
+            ):
+                yield data
+        finally:
+            if repairs:
+                # 修复在独立任务中运行，再次取消也不会中断写入
+                await asyncio.shield(repairs[0])
+
+        self.schedule_summary_update(thread_id)
+        yield encoder.done()
+
+    async def _stream_events(
+        self, query: str, thread_id: str, summary_with_llm: bool
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        运行对话图并产生流式事件
+        :param query: 问题内容
+        :param thread_id: 线程id
+        :param summary_with_llm: 是否启用LLM智能总结功能
+        :return: token、tool_start、tool_end事件
+        """
         config: RunnableConfig = RunnableConfig(
             configurable={"thread_id": thread_id, "summary_with_llm": summary_with_llm}
         )
-        full_messages = ""
 
         print("Start Chat:")
-        async for chunk in self.graph.astream(
+        # messages模式提供逐token输出，updates模式提供节点完成后的工具调用和工具结果
+        async for mode, chunk in self.graph.astream(
             {"messages": HumanMessage(content=query)},
             config=config,
-            stream_mode="messages",
+            stream_mode=["messages", "updates"],
         ):
-            # print(chunk)
-            event = chunk[0]
-            config = chunk[1]
-            if isinstance(event, AIMessageChunk):
-                if config.get("name") and (
-                    config["name"] == "search" or config["name"] == "process_results"
-                ):
+            if mode == "messages":
+                event, metadata = chunk
+                if not isinstance(event, AIMessageChunk) or metadata.get(
+                    "name"
+                ) in ("search", "process_results"):
                     continue
-                full_messages += event.content
-                print(event.content, end="")
-            yield f"data: {json.dumps(dict(chunk[0]), ensure_ascii=False)}\n\n"
-        # print(f"\nfull_messages:\n {full_messages}")
-        yield "data: [DONE]\n"
+                content = chunk_text(event.content)
+                if content:
+                    print(content, end="")
+                    yield "token", (content, event.id)
+                continue
+
+            for node, update in chunk.items():
+                if not update or node not in ("chatbot", "tools"):
+                    continue
+                messages = update.get("messages")
+                if not isinstance(messages, list):
+                    messages = [messages]
+                for message in messages:
+                    if isinstance(message, AIMessage):
+                        for tool_call in message.tool_calls:
+                            yield "tool_start", tool_call
+                    elif isinstance(message, ToolMessage):
+                        yield "tool_end", message
+
+    def schedule_turn_repair(self, thread_id: str, run: asyncio.Task) -> asyncio.Task:
+        """
+        对话图运行被取消后，在后台修复检查点
+        :param thread_id: 线程ID
+        :param run: 被取消的运行任务
+        :return: 修复任务
+        """
+        task = asyncio.create_task(self.repair_cancelled_turn(thread_id, run))
+        self._repair_tasks[thread_id] = task
+        task.add_done_callback(lambda t: self._repair_tasks.pop(thread_id, None))
+        return task
+
+    async def repair_cancelled_turn(
+        self, thread_id: str, run: Optional[asyncio.Task] = None
+    ) -> bool:
+        """
+        为被取消的轮次补全工具调用结果
+
+        取消发生在工具执行期间时，检查点中最后一条AIMessage的工具调用没有对应的ToolMessage，
+        下一轮发送给模型会出错；这里为缺失的调用写入取消说明，使历史保持完整
+        :param thread_id: 线程ID
+        :param run: 被取消的运行任务，先等待其结束
+        :return: 是否写入了修复
+        """
+        if run is not None:
+            await asyncio.wait([run])
+
+        assert self.graph is not None, "Graph should be initialized"
+
+        config = RunnableConfig(configurable={"thread_id": thread_id})
+        try:
+            state = await self.graph.aget_state(config)
+            messages = state.values.get("messages", []) if state.values else []
+
+            answered = set()
+            pending = []
+            for message in reversed(messages):
+                if isinstance(message, ToolMessage):
+                    answered.add(message.tool_call_id)
+                    continue
+                if isinstance(message, AIMessage):
+                    pending = [
+                        tool_call
+                        for tool_call in message.tool_calls
+                        if tool_call["id"] not in answered
+                    ]
+                break
+            if not pending:
+                return False
+
+            await self.graph.aupdate_state(
+                config,
+                {
+                    "messages": [
+                        ToolMessage(
+                            content=TOOL_CALL_CANCELLED_CONTENT,
+                            name=tool_call["name"],
+                            tool_call_id=tool_call["id"],
+                            status="error",
+                        )
+                        for tool_call in pending
+                    ]
+                },
+                as_node="chatbot",
+            )
+            print(f"对话 {thread_id} 已补全 {len(pending)} 个被取消的工具调用")
+            return True
+        except Exception as e:
+            print(f"修复被取消的对话失败: {e}")
+            return False
+
+    def schedule_summary_update(self, thread_id: str) -> None:
+        """
+        在后台更新对话的滚动摘要，不阻塞当前响应；同一线程同时只有一个摘要任务，
+        在本轮释放线程锁之后开始
+        :param thread_id: 线程ID
+        """
+        if not app_config.summary_enabled:
+            return
+        task = self._summary_tasks.get(thread_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(
+            self.update_summary(thread_id, after=thread_locks.holder(thread_id))
+        )
+        self._summary_tasks[thread_id] = task
+        task.add_done_callback(lambda t: self._summary_tasks.pop(thread_id, None))
+
+    async def update_summary(
+        self, thread_id: str, after: Optional[ThreadLease] = None
+    ) -> bool:
+        """
+        把最近窗口之前新增的轮次合并进滚动摘要并写回检查点
+
+        摘要在线程锁之外生成，写回时持有线程锁；期间有新的一轮开始或历史被修改时放弃本次写回，
+        避免被新一轮的检查点覆盖，新的一轮结束后会重新安排摘要
+        :param thread_id: 线程ID
+        :param after: 调度时本轮持有的线程锁，等待其释放后开始
+        :return: 是否更新了摘要
+        """
+        if self.graph is None:
+            await self.initialize()
+
+        assert self.graph is not None, "Graph should be initialized"
+
+        if after is not None:
+            await after.released.wait()
+        if thread_locks.is_busy(thread_id):
+            return False
+
+        config: RunnableConfig = RunnableConfig(configurable={"thread_id": thread_id})
+        try:
+            state = await self.graph.aget_state(config)
+            if not (state and state.values and state.values.get("messages")):
+                return False
+
+            delta, summarized_upto, rebuild = self.summarizer.select_delta(
+                state.values["messages"], state.values.get("summarized_upto")
+            )
+            if not delta:
+                return False
+
+            previous = "" if rebuild else state.values.get("summary", "")
+            summary = await self.summarizer.summarize(self.llm, previous, delta)
+
+            try:
+                lease = await thread_locks.acquire(thread_id, "reject")
+            except ThreadBusyError:
+                print(f"对话 {thread_id} 已开始新的一轮，放弃本次摘要")
+                return False
+            try:
+                latest = await self.graph.aget_state(config)
+                checkpoint_id = state.config["configurable"].get("checkpoint_id")
+                if latest.config["configurable"].get("checkpoint_id") != checkpoint_id:
+                    print(f"对话 {thread_id} 的历史已变化，放弃本次摘要")
+                    return False
+                await self.graph.aupdate_state(
+                    config,
+                    {"summary": summary, "summarized_upto": summarized_upto},
+                    as_node="chatbot",
+                )
+            finally:
+                await lease.release()
+            print(f"对话 {thread_id} 摘要已更新，新增 {len(delta)} 条消息")
+            return True
+        except Exception as e:
+            print(f"更新对话摘要失败: {e}")
+            return False
 
     async def named_chat(self, thread_id: str) -> str:
         """
@@ -456,6 +764,41 @@ class ChatBot:
             print(f"Error getting history: {str(e)}")
             return []
 
+    async def get_history_page(
+        self,
+        thread_id: str,
+        limit: int = 50,
+        before_id: Optional[str] = None,
+        after_id: Optional[str] = None,
+        exclude_tools: bool = False,
+        fields: str = "full",
+        preview_chars: int = 200,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        分页获取历史记录
+        :param thread_id: 对话线程ID
+        :param limit: 每页条数
+        :param before_id: 返回该消息之前的消息
+        :param after_id: 返回该消息之后的消息
+        :param exclude_tools: 是否排除工具调用和工具结果
+        :param fields: full返回完整消息，preview只返回id/type/内容预览
+        :param preview_chars: 预览的最大字符数
+        :return: 分页结果，游标消息不存在时返回None
+        """
+        messages = await self.get_history(thread_id)
+        page = paginate_messages(
+            messages,
+            limit=limit,
+            before_id=before_id,
+            after_id=after_id,
+            exclude_tools=exclude_tools,
+            fields=fields,
+            preview_chars=preview_chars,
+        )
+        if page is not None:
+            page["thread_id"] = thread_id
+        return page
+
     async def delete_history(self, thread_id: str) -> bool:
         """
         删除历史记录
@@ -474,31 +817,135 @@ class ChatBot:
             print(f"Error deleting history: {str(e)}")
             return False
 
-    async def delete_history_batch(self, thread_ids: List[str]) -> bool:
+    async def delete_history_batch(self, thread_ids: List[str]) -> Dict[str, Any]:
         """
         批量删除多个对话历史记录
+
+        PostgreSQL存储时每张检查点表只执行一条批量DELETE，在一个事务中完成；
+        其他存储逐个调用adelete_thread
         :param thread_ids: 线程ID列表
-        :return: bool 删除状态
+        :return: {"results": {线程ID: "deleted" | "not_found" | "error"}, "elapsed_ms": 耗时}
         """
-        if not thread_ids:
-            return False
-
         if self.graph is None:
             await self.initialize()
 
         assert self.memory is not None, "Memory should be initialized"
 
-        success_count = 0
-        for thread_id in thread_ids:
+        ids = list(dict.fromkeys(str(thread_id) for thread_id in thread_ids))
+        if not ids:
+            return {"results": {}, "elapsed_ms": 0.0}
+
+        if isinstance(self.memory, AsyncPostgresSaver) and isinstance(
+            self.memory.conn, AsyncConnectionPool
+        ):
+            try:
+                outcome = await delete_threads(self.memory.conn, ids)
+            except Exception as e:
+                print(f"Error deleting threads in batch: {str(e)}")
+                outcome = {
+                    "results": {thread_id: "error" for thread_id in ids},
+                    "elapsed_ms": 0.0,
+                }
+            if isinstance(self.memory, IndexedPostgresSaver):
+                self.memory.forget_threads(ids)
+            return outcome
+
+        start = time.perf_counter()
+        results: Dict[str, str] = {}
+        for thread_id in ids:
             try:
                 await self.memory.adelete_thread(thread_id)
-                success_count += 1
-                print(f"Successfully deleted thread: {thread_id}")
+                results[thread_id] = "deleted"
             except Exception as e:
                 print(f"Error deleting thread {thread_id}: {str(e)}")
+                results[thread_id] = "error"
+        return {
+            "results": results,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    @staticmethod
+    def _find_message_index(messages: Sequence[BaseMessage], message_id: str) -> int:
+        for i, message in enumerate(messages):
+            if message.id == message_id:
+                return i
+        return -1
 
-        # 如果至少有一个删除成功，返回True
-        return success_count > 0
+    def _touches_summary(self, values: Dict[str, Any], first_index: int) -> bool:
+        """
+        修改位置是否落在已摘要的消息范围内
+        :param values: 当前状态
+        :param first_index: 被修改的最早消息位置
+        :return: 是否需要丢弃摘要
+        """
+        summarized_upto = values.get("summarized_upto")
+        if not summarized_upto:
+            return False
+        summarized_index = self._find_message_index(
+            values.get("messages", []), summarized_upto
+        )
+        return first_index <= summarized_index
+
+    def _message_index(self) -> Optional[IndexedPostgresSaver]:
+        return self.memory if isinstance(self.memory, IndexedPostgresSaver) else None
+
+    async def _locate_message(
+        self, config: RunnableConfig, thread_id: str, message_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        按ID定位消息，优先读取消息索引中的单行，未索引时回退到完整历史扫描
+        :param config: 运行配置
+        :param thread_id: 线程ID
+        :param message_id: 消息ID
+        :return: {"message", "position", "summarized", "messages"}，messages只在扫描时提供；
+                 消息不存在时返回None
+        """
+        index = self._message_index()
+        if index is not None:
+            row = await index.lookup(thread_id, message_id)
+            if row is not None:
+                return {**row, "messages": None}
+
+        state = await self.graph.aget_state(config)
+        messages = state.values.get("messages", [])
+        idx = self._find_message_index(messages, message_id)
+        if idx == -1:
+            return None
+        return {
+            "message": messages[idx],
+            "position": idx,
+            "summarized": self._touches_summary(state.values, idx),
+            "messages": messages,
+        }
+
+    async def _apply_message_updates(
+        self,
+        config: RunnableConfig,
+        updates: List[BaseMessage],
+        reset_summary: bool = False,
+    ) -> None:
+        """
+        以增量方式写入消息修改：同ID消息替换，RemoveMessage删除，只产生一个新的检查点，
+        历史检查点保留，可用于回溯
+        :param config: 运行配置
+        :param updates: 替换或删除的消息
+        :param reset_summary: 修改了已摘要的消息时丢弃摘要，下次摘要时重建
+        """
+        update: Dict[str, Any] = {"messages": updates}
+        if reset_summary:
+            update["summary"] = ""
+            update["summarized_upto"] = None
+
+        await self.graph.aupdate_state(config, update, as_node="chatbot")
+
+    @staticmethod
+    def _edited_message(message: BaseMessage, new_content: str) -> BaseMessage:
+        if not isinstance(message, (HumanMessage, AIMessage)):
+            raise ValueError("Unsupported message type")
+        # 保留消息ID，add_messages按ID原位替换
+        return message.model_copy(
+            update={"content": new_content, "response_metadata": {}}
+        )
 
     async def edit_message(
         self, thread_id: str, message_idx: int, new_content: str
@@ -514,24 +961,21 @@ class ChatBot:
             await self.initialize()
 
         assert self.graph is not None, "Graph should be initialized"
-        assert self.memory is not None, "Memory should be initialized"
 
         config = RunnableConfig(configurable={"thread_id": thread_id})
         try:
             state = await self.graph.aget_state(config)
             messages = state.values.get("messages", [])
             if 0 <= message_idx < len(messages):
-                if isinstance(messages[message_idx], HumanMessage):
-                    messages[message_idx] = HumanMessage(content=new_content)
-                elif isinstance(messages[message_idx], AIMessage):
-                    messages[message_idx] = AIMessage(content=new_content)
-                else:
-                    raise "Unsupported message type"
-                await self.memory.adelete_thread(thread_id)
-                await self.graph.aupdate_state(config, {"messages": messages})
+                edited = self._edited_message(messages[message_idx], new_content)
+                await self._apply_message_updates(
+                    config,
+                    [edited],
+                    reset_summary=self._touches_summary(state.values, message_idx),
+                )
                 return True
             else:
-                raise f"Message index {message_idx} out of range"
+                raise ValueError(f"Message index {message_idx} out of range")
         except Exception as e:
             print(f"Error on edit message: {str(e)}")
             return False
@@ -550,30 +994,18 @@ class ChatBot:
             await self.initialize()
 
         assert self.graph is not None, "Graph should be initialized"
-        assert self.memory is not None, "Memory should be initialized"
 
         config = RunnableConfig(configurable={"thread_id": thread_id})
         try:
-            state = await self.graph.aget_state(config)
-            messages = state.values.get("messages", [])
-            idx = -1
-            for i, message in enumerate(messages):
-                if message.id == message_id:
-                    idx = i
-                    break
-            if idx != -1:
-                if isinstance(messages[idx], AIMessage):
-                    messages[idx] = AIMessage(new_content)
-                elif isinstance(messages[idx], HumanMessage):
-                    messages[idx] = HumanMessage(new_content)
-                else:
-                    raise "Unsupported message type"
-
-                await self.memory.adelete_thread(thread_id)
-                await self.graph.aupdate_state(config, {"messages": messages})
+            located = await self._locate_message(config, thread_id, message_id)
+            if located is not None:
+                edited = self._edited_message(located["message"], new_content)
+                await self._apply_message_updates(
+                    config, [edited], reset_summary=located["summarized"]
+                )
                 return True
             else:
-                raise f"Unable to find messages index {message_id}"
+                raise ValueError(f"Unable to find messages index {message_id}")
         except Exception as e:
             print(f"Error on edit message with id: {str(e)}")
             return False
@@ -589,19 +1021,20 @@ class ChatBot:
             await self.initialize()
 
         assert self.graph is not None, "Graph should be initialized"
-        assert self.memory is not None, "Memory should be initialized"
 
         config = RunnableConfig(configurable={"thread_id": thread_id})
         try:
             state = await self.graph.aget_state(config)
             messages = state.values.get("messages", [])
             if 0 <= message_idx < len(messages):
-                messages.pop(message_idx)
-                await self.memory.adelete_thread(thread_id)
-                await self.graph.aupdate_state(config, {"messages": messages})
+                await self._apply_message_updates(
+                    config,
+                    [RemoveMessage(id=messages[message_idx].id)],
+                    reset_summary=self._touches_summary(state.values, message_idx),
+                )
                 return True
             else:
-                raise f"Message index out of range"
+                raise ValueError("Message index out of range")
         except Exception as e:
             print(f"Error on delete message: {str(e)}")
             return False
@@ -617,23 +1050,17 @@ class ChatBot:
             await self.initialize()
 
         assert self.graph is not None, "Graph should be initialized"
-        assert self.memory is not None, "Memory should be initialized"
 
         config = RunnableConfig(configurable={"thread_id": thread_id})
         try:
-            state = await self.graph.aget_state(config)
-            messages = state.values.get("messages", [])
-            idx = -1
-            for i, message in enumerate(messages):
-                if message.id == message_id:
-                    idx = i
-                    break
-            if idx != -1:
-                messages.pop(idx)
-            else:
-                raise f"Message index {message_id} out of range"
-            await self.memory.adelete_thread(thread_id)
-            await self.graph.aupdate_state(config, {"messages": messages})
+            located = await self._locate_message(config, thread_id, message_id)
+            if located is None:
+                raise ValueError(f"Message index {message_id} out of range")
+            await self._apply_message_updates(
+                config,
+                [RemoveMessage(id=message_id)],
+                reset_summary=located["summarized"],
+            )
             return True
         except Exception as e:
             print(f"Error on delete message with id: {str(e)}")
@@ -652,36 +1079,43 @@ class ChatBot:
             await self.initialize()
 
         assert self.graph is not None, "Graph should be initialized"
-        assert self.memory is not None, "Memory should be initialized"
 
         config = RunnableConfig(configurable={"thread_id": thread_id})
         try:
-            state = await self.graph.aget_state(config)
-            messages = state.values.get("messages", [])
-            idx = -1
-            for i, message in enumerate(messages):
-                if message.id == message_id:
-                    idx = i
-                    break
-            if idx != -1:
-                if not (
-                    isinstance(messages[idx], AIMessage)
-                    or isinstance(messages[idx], HumanMessage)
-                ):
-                    raise "Unsupported message type"
-                messages = messages[:idx]
-                await self.memory.adelete_thread(thread_id)
-                await self.graph.aupdate_state(config, {"messages": messages})
+            located = await self._locate_message(config, thread_id, message_id)
+            if located is not None:
+                if not isinstance(located["message"], (AIMessage, HumanMessage)):
+                    raise ValueError("Unsupported message type")
+                messages = located["messages"]
+                message_ids = None
+                if messages is None:
+                    message_ids = await self._message_index().message_ids_from(
+                        thread_id, located["position"]
+                    )
+                if message_ids is None:
+                    # 索引在定位之后落后时回退到完整历史
+                    if messages is None:
+                        state = await self.graph.aget_state(config)
+                        messages = state.values.get("messages", [])
+                    position = self._find_message_index(messages, message_id)
+                    if position == -1:
+                        raise ValueError(f"Message index {message_id} out of range")
+                    message_ids = [m.id for m in messages[position:]]
+                await self._apply_message_updates(
+                    config,
+                    [RemoveMessage(id=mid) for mid in message_ids],
+                    reset_summary=located["summarized"],
+                )
                 return True
             else:
-                raise f"Message index {message_id} out of range"
+                raise ValueError(f"Message index {message_id} out of range")
         except Exception as e:
             print(f"Error on delete message with id: {str(e)}")
             return False
 
     async def get_message_by_id(self, thread_id: str, message_id: str) -> BaseMessage:
         """
-        根据消息ID获取指定消息
+        根据消息ID获取指定消息，启用消息索引时只读取一行
         :param thread_id: 线程ID
         :param message_id: 消息ID
         :return: 消息对象，如果未找到返回None
@@ -693,12 +1127,8 @@ class ChatBot:
 
         config = RunnableConfig(configurable={"thread_id": thread_id})
         try:
-            state = await self.graph.aget_state(config)
-            messages = state.values.get("messages", [])
-            for message in messages:
-                if message.id == message_id:
-                    return message
-            return None
+            located = await self._locate_message(config, thread_id, message_id)
+            return located["message"] if located is not None else None
         except Exception as e:
             print(f"Error getting message by id: {str(e)}")
             return None
@@ -0,0 +1,183 @@
+"""
+ChatBot运行时 - 进程级共享的检查点存储、工具集与已编译的对话图
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from langchain_core.tools import BaseTool
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from psycopg_pool import AsyncConnectionPool
+
+from config import config as app_config
+from llm.llm_chat_with_tools.chatbot.ChatBot import ChatBot, BASE_TOOLS
+from llm.llm_chat_with_tools.chatbot.checkpoint_store import (
+    LATEST_SCHEMA_VERSION,
+    create_connection_pool,
+    get_pool_stats,
+    get_schema_version,
+    has_message_index,
+    migrate_checkpoint_schema,
+)
+from llm.llm_chat_with_tools.chatbot.message_index import IndexedPostgresSaver
+from llm.llm_chat_with_tools.chatbot.pooled_saver import PooledPostgresSaver
+from llm.llm_chat_with_tools.chatbot.graph_cache import GraphCache
+from llm.llm_chat_with_tools.chatbot.thread_lock import thread_locks
+from llm.llm_chat_with_tools.chatbot.turn_stream import turn_stream_hub
+from llm.llm_chat_with_tools.tools.crawl_cache import crawl_cache
+from llm.llm_chat_with_tools.tools.http_client import http_client
+from llm.llm_chat_with_tools.tools.redis_client import close_redis_client
+from llm.llm_chat_with_tools.tools.result_cache import result_cache
+from llm.llm_chat_with_tools.tools.search_cache import search_cache
+from llm.llm_chat_with_tools.tools.tool_registry import MCPToolRegistry, tool_registry
+
+
+DEFAULT_MODEL = "Qwen/Qwen2.5-7B-Instruct"
+
+
+class ChatRuntime:
+    """
+    进程级ChatBot运行时
+
+    应用启动时创建一次，持有检查点存储、工具注册表以及已编译对话图的缓存，
+    使每次对话请求只需承担LLM调用本身的开销。
+    """
+
+    def __init__(self, registry: MCPToolRegistry = tool_registry):
+        self.pool: Optional[AsyncConnectionPool] = None
+        self.memory: Optional[AsyncPostgresSaver] = None
+        self.registry = registry
+        self.schema_version: int = -1
+        self._graph_cache = GraphCache(max_size=app_config.graph_cache_size)
+        self._start_lock = asyncio.Lock()
+        self._build_lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self.memory is not None
+
+    @property
+    def tools(self) -> List[BaseTool]:
+        """当前完整工具列表：内置工具 + MCP工具快照"""
+        return [*BASE_TOOLS, *self.registry.snapshot().tools]
+
+    async def start(self) -> None:
+        """
+        启动运行时：打开数据库连接池、检查表结构版本并启动工具注册表，重复调用无副作用
+        """
+        async with self._start_lock:
+            if self.started:
+                return
+
+            self.pool = await create_connection_pool()
+            if app_config.checkpoint_auto_migrate:
+                self.schema_version = await migrate_checkpoint_schema(self.pool)
+            else:
+                self.schema_version = await get_schema_version(self.pool)
+                if self.schema_version < LATEST_SCHEMA_VERSION:
+                    await self.pool.close()
+                    self.pool = None
+                    raise RuntimeError(
+                        "检查点表结构不是最新版本，请先运行 python migrate.py"
+                    )
+            memory = await self._create_saver()
+
+            # 首次发现失败时只使用内置工具，后台任务会继续重试
+            await self.registry.start()
+            if app_config.thread_lock_backend == "postgres":
+                thread_locks.use_advisory_lock(app_config.database_url)
+            self.memory = memory
+            print(f"ChatRuntime已启动，工具数量: {len(self.tools)}")
+
+    async def _create_saver(self) -> AsyncPostgresSaver:
+        """
+        创建检查点存储，不同线程的读写在连接池上并发执行；启用消息索引且索引表已创建时使用带索引的存储
+        :return: 检查点存储
+        """
+        if app_config.message_index_enabled:
+            if await has_message_index(self.pool):
+                return IndexedPostgresSaver(
+                    self.pool, cache_threads=app_config.message_index_cache_threads
+                )
+            print("消息ID索引表不存在，按ID读取消息将扫描完整历史，请运行 python migrate.py")
+        return PooledPostgresSaver(self.pool)
+
+    async def close(self) -> None:
+        """
+        关闭运行时，释放数据库连接池
+        """
+        async with self._start_lock:
+            await turn_stream_hub.close()
+            await thread_locks.close()
+            thread_locks.use_advisory_lock(None)
+            await self.registry.close()
+            await http_client.close()
+            await close_redis_client()
+            result_cache.close()
+            self._graph_cache.clear()
+            self.memory = None
+            if self.pool is not None:
+                await self.pool.close()
+                self.pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取运行时统计信息
+        :return: 各组件的统计信息
+        """
+        return {
+            "started": self.started,
+            "schema_version": self.schema_version,
+            "graph_cache": {
+                **self._graph_cache.get_stats(),
+                "keys": [list(key) for key in self._graph_cache.keys()],
+            },
+            "tools": self.registry.get_stats(),
+            "http": http_client.get_stats(),
+            "search_cache": search_cache.get_stats(),
+            "crawl_cache": crawl_cache.get_stats(),
+            "result_cache": result_cache.get_stats(),
+            "turn_streams": turn_stream_hub.get_stats(),
+            "thread_locks": thread_locks.get_stats(),
+            "pool": get_pool_stats(self.pool) if self.pool is not None else None,
+            "message_index": (
+                self.memory.get_stats()
+                if isinstance(self.memory, IndexedPostgresSaver)
+                else None
+            ),
+        }
+
+    async def get_chatbot(
+        self, model: Optional[str] = None, enable_result_processing: bool = True
+    ) -> ChatBot:
+        """
+        获取ChatBot，按(模型, 是否启用结果处理, 工具集版本)复用已编译的对话图
+        :param model: 模型名称
+        :param enable_result_processing: 是否启用结果处理
+        :return: 已初始化的ChatBot
+        """
+        model = model or DEFAULT_MODEL
+        key = (model, enable_result_processing, self.registry.version)
+        chatbot = self._graph_cache.get(key)
+        if chatbot is not None:
+            return chatbot
+
+        await self.start()
+        async with self._build_lock:
+            snapshot = self.registry.snapshot()
+            key = (model, enable_result_processing, snapshot.version)
+            chatbot = self._graph_cache.peek(key)
+            if chatbot is not None:
+                return chatbot
+            chatbot = ChatBot(
+                model=model, enable_result_processing=enable_result_processing
+            )
+            await chatbot.initialize(
+                memory=self.memory, tools=[*BASE_TOOLS, *snapshot.tools]
+            )
+            self._graph_cache.put(key, chatbot)
+        return chatbot
+
+
+# 全局运行时实例
+chat_runtime = ChatRuntime()
@@ -0,0 +1,198 @@
+"""
+检查点存储 - 基于共享连接池的PostgreSQL检查点存储
+"""
+
+import time
+from typing import Any, Dict, Sequence
+
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from config import config as app_config
+from llm.llm_chat_with_tools.chatbot.message_index import (
+    MESSAGE_INDEX_TABLES,
+    create_message_index,
+    message_index_exists,
+)
+
+
+# 检查点表结构的最新版本号，与AsyncPostgresSaver内置迁移列表保持一致
+LATEST_SCHEMA_VERSION = len(AsyncPostgresSaver.MIGRATIONS) - 1
+
+# 迁移时使用的advisory lock键，避免多个worker同时执行DDL
+MIGRATION_LOCK_KEY = 7_310_021_001
+
+
+async def create_connection_pool() -> AsyncConnectionPool:
+    """
+    创建并打开检查点存储使用的异步连接池
+
+    连接参数与AsyncPostgresSaver的要求保持一致（autocommit、dict_row、禁用预编译语句），
+    池大小、空闲回收、最长存活时间和借出前检查均可通过配置调整。
+    :return: 已打开的连接池
+    """
+    pool = AsyncConnectionPool(
+        conninfo=app_config.database_url,
+        min_size=app_config.db_pool_min_size,
+        max_size=app_config.db_pool_max_size,
+        max_idle=app_config.db_pool_max_idle,
+        max_lifetime=app_config.db_pool_max_lifetime,
+        timeout=app_config.db_pool_timeout,
+        check=(
+            AsyncConnectionPool.check_connection
+            if app_config.db_pool_pre_ping
+            else None
+        ),
+        kwargs={
+            "autocommit": True,
+            "prepare_threshold": 0,
+            "row_factory": dict_row,
+        },
+        name="checkpoint_pool",
+        open=False,
+    )
+    await pool.open(wait=True)
+    return pool
+
+
+def get_pool_stats(pool: AsyncConnectionPool) -> Dict[str, Any]:
+    """
+    获取连接池使用情况，包含等待指标
+    :param pool: 连接池
+    :return: 连接池统计信息
+    """
+    stats = pool.get_stats()
+    requests_num = stats.get("requests_num", 0)
+    wait_ms = stats.get("requests_wait_ms", 0)
+    return {
+        "pool_min": stats.get("pool_min", 0),
+        "pool_max": stats.get("pool_max", 0),
+        "pool_size": stats.get("pool_size", 0),
+        "pool_available": stats.get("pool_available", 0),
+        "requests_waiting": stats.get("requests_waiting", 0),
+        "requests_num": requests_num,
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_wait_ms": wait_ms,
+        "avg_wait_ms": round(wait_ms / requests_num, 2) if requests_num else 0.0,
+        "requests_errors": stats.get("requests_errors", 0),
+        "connections_num": stats.get("connections_num", 0),
+        "connections_errors": stats.get("connections_errors", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+    }
+
+
+async def _read_schema_version(conn: AsyncConnection) -> int:
+    """
+    读取已应用的检查点表结构版本
+    :param conn: 数据库连接
+    :return: 版本号，未初始化时返回-1
+    """
+    cur = await conn.execute("SELECT to_regclass('checkpoint_migrations') AS tbl")
+    row = await cur.fetchone()
+    if row is None or row["tbl"] is None:
+        return -1
+    cur = await conn.execute(
+        "SELECT v FROM checkpoint_migrations ORDER BY v DESC LIMIT 1"
+    )
+    row = await cur.fetchone()
+    return -1 if row is None else row["v"]
+
+
+async def get_schema_version(pool: AsyncConnectionPool) -> int:
+    """
+    获取已应用的检查点表结构版本
+    :param pool: 连接池
+    :return: 版本号，未初始化时返回-1
+    """
+    async with pool.connection() as conn:
+        return await _read_schema_version(conn)
+
+
+async def migrate_checkpoint_schema(pool: AsyncConnectionPool) -> int:
+    """
+    执行检查点表结构迁移，已是最新版本时不执行任何DDL
+
+    迁移在advisory lock保护下进行，多个worker同时启动时只有一个会真正执行迁移，
+    已应用的版本由AsyncPostgresSaver记录在checkpoint_migrations表中。
+    消息ID索引表（chat_message_index、chat_message_index_state）在同一个锁内创建。
+    :param pool: 连接池
+    :return: 迁移后的版本号
+    """
+    async with pool.connection() as conn:
+        version = await _read_schema_version(conn)
+        if version >= LATEST_SCHEMA_VERSION and await message_index_exists(conn):
+            return version
+
+        await conn.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        try:
+            # 获取锁后重新检查，其他worker可能已完成迁移
+            version = await _read_schema_version(conn)
+            if version < LATEST_SCHEMA_VERSION:
+                await AsyncPostgresSaver(conn).setup()
+                print(
+                    f"检查点表结构已从版本 {version} 迁移到 {LATEST_SCHEMA_VERSION}"
+                )
+                version = await _read_schema_version(conn)
+            if not await message_index_exists(conn):
+                await create_message_index(conn)
+                print("消息ID索引表已创建")
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+        return version
+
+
+async def has_message_index(pool: AsyncConnectionPool) -> bool:
+    """
+    检查消息ID索引表是否已创建
+    :param pool: 连接池
+    :return: 是否存在
+    """
+    async with pool.connection() as conn:
+        return await message_index_exists(conn)
+
+
+# 批量删除线程时清理的检查点表
+CHECKPOINT_TABLES = ("checkpoint_writes", "checkpoint_blobs", "checkpoints")
+
+
+async def delete_threads(
+    pool: AsyncConnectionPool, thread_ids: Sequence[str]
+) -> Dict[str, Any]:
+    """
+    批量删除线程：每张检查点表只执行一条 DELETE ... WHERE thread_id = ANY(%s)，
+    全部在一个事务中完成，失败时整体回滚
+    :param pool: 连接池
+    :param thread_ids: 线程ID列表
+    :return: {"results": {线程ID: "deleted" | "not_found"}, "rows": 每张表删除的行数, "elapsed_ms": 耗时}
+    """
+    ids = list(dict.fromkeys(str(thread_id) for thread_id in thread_ids))
+    start = time.perf_counter()
+    rows: Dict[str, int] = {}
+
+    async with pool.connection() as conn:
+        async with conn.transaction():
+            cur = await conn.execute(
+                "SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id = ANY(%s)",
+                (ids,),
+            )
+            found = {row["thread_id"] for row in await cur.fetchall()}
+
+            tables = list(CHECKPOINT_TABLES)
+            if await message_index_exists(conn):
+                tables.extend(MESSAGE_INDEX_TABLES)
+            for table in tables:
+                cur = await conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ANY(%s)", (ids,)
+                )
+                rows[table] = cur.rowcount
+
+    return {
+        "results": {
+            thread_id: "deleted" if thread_id in found else "not_found"
+            for thread_id in ids
+        },
+        "rows": rows,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
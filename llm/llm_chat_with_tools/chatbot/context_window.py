@@ -0,0 +1,148 @@
+"""
+上下文窗口管理 - 按token预算选择发送给LLM的消息，完整历史仍保存在检查点中
+"""
+
+import json
+from typing import Any, List, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from config import config as app_config
+
+# 每条消息的固定开销（角色、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数：ASCII字符约4个一个token，中文等非ASCII字符按每字一个token计
+    :param text: 文本
+    :return: 估算的token数
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, ensure_ascii=False, default=str)
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    """
+    计算单条消息的token数，结果缓存在message.response_metadata中，内容变化后重新计算
+    :param message: 消息
+    :return: 估算的token数
+    """
+    text = _content_text(message.content)
+    cached = message.response_metadata.get("token_count")
+    if isinstance(cached, dict) and cached.get("chars") == len(text):
+        return cached["tokens"]
+
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(text)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += estimate_tokens(
+            json.dumps(message.tool_calls, ensure_ascii=False, default=str)
+        )
+    message.response_metadata["token_count"] = {"tokens": tokens, "chars": len(text)}
+    return tokens
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """
+    按用户消息把历史切分为轮次，每轮以HumanMessage开头，工具调用和结果总在同一轮内
+    :param messages: 消息列表
+    :return: 轮次列表
+    """
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+class ContextWindow:
+    """
+    token预算内的上下文选择
+
+    1. 较早轮次（最新keep_tool_turns轮之外）的工具输出替换为简短占位；
+    2. 从最新一轮开始向前按整轮加入，直到超出预算，保证工具调用与结果成对出现；
+    3. 当前轮总是保留。
+    返回的是消息副本，不修改检查点中的历史。
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 24000,
+        keep_tool_turns: int = 2,
+        tool_preview_chars: int = 200,
+    ):
+        """
+        初始化上下文窗口
+        :param max_tokens: 发送给LLM的消息token预算（含系统提示词）
+        :param keep_tool_turns: 保留完整工具输出的最新轮数
+        :param tool_preview_chars: 省略工具输出时保留的预览字符数
+        """
+        self.max_tokens = max_tokens
+        self.keep_tool_turns = max(1, keep_tool_turns)
+        self.tool_preview_chars = tool_preview_chars
+
+    def _elide_tool_message(self, message: ToolMessage) -> ToolMessage:
+        text = _content_text(message.content)
+        tokens = count_message_tokens(message)
+        preview = text[: self.tool_preview_chars].strip()
+        if len(text) <= self.tool_preview_chars:
+            return message
+        content = (
+            f"[较早的工具输出已省略：{message.name or 'tool'}，约 {tokens} tokens。"
+            f"如需详细内容请重新调用工具]\n{preview}..."
+        )
+        return message.model_copy(
+            update={"content": content, "response_metadata": {"elided": True}}
+        )
+
+    def select(
+        self, messages: Sequence[BaseMessage], reserved_tokens: int = 0
+    ) -> List[BaseMessage]:
+        """
+        选择本轮发送给LLM的消息
+        :param messages: 完整消息历史
+        :param reserved_tokens: 预留给系统提示词等固定内容的token数
+        :return: 预算内的消息列表
+        """
+        turns = split_turns(messages)
+        if not turns:
+            return []
+
+        old_count = max(0, len(turns) - self.keep_tool_turns)
+        for i in range(old_count):
+            turns[i] = [
+                self._elide_tool_message(message)
+                if isinstance(message, ToolMessage)
+                else message
+                for message in turns[i]
+            ]
+
+        budget = self.max_tokens - reserved_tokens
+        selected: List[List[BaseMessage]] = []
+        used = 0
+        for turn in reversed(turns):
+            turn_tokens = sum(count_message_tokens(message) for message in turn)
+            if selected and used + turn_tokens > budget:
+                break
+            selected.append(turn)
+            used += turn_tokens
+
+        return [message for turn in reversed(selected) for message in turn]
+
+
+# 全局上下文窗口实例
+context_window = ContextWindow(
+    max_tokens=app_config.context_max_tokens,
+    keep_tool_turns=app_config.context_keep_tool_turns,
+    tool_preview_chars=app_config.context_tool_preview_chars,
+)
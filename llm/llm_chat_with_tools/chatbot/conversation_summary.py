@@ -0,0 +1,147 @@
+"""
+滚动对话摘要 - 把最近窗口之前的对话增量合并进摘要，摘要与消息一起保存在ChatState中
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from config import config as app_config
+from llm.llm_chat_with_tools.chatbot.context_window import split_turns
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """你是一个对话摘要助手。请把新增的对话内容合并进已有摘要，生成一份更新后的完整摘要。
+
+要求：
+1. 保留用户的目标、偏好、已确认的事实和结论
+2. 保留重要的数据、数值、链接和工具查询结果要点
+3. 删除寒暄和重复内容，使用简洁的中文
+4. 摘要长度不超过{max_chars}个字符
+
+请直接输出更新后的摘要，不要包含任何解释。""",
+        ),
+        ("human", "已有摘要：\n{summary}\n\n新增对话：\n{conversation}"),
+    ]
+)
+
+
+def messages_after(
+    messages: Sequence[BaseMessage], message_id: Optional[str]
+) -> Optional[List[BaseMessage]]:
+    """
+    获取指定消息之后的消息
+    :param messages: 消息列表
+    :param message_id: 消息ID，为空时返回全部消息
+    :return: 之后的消息列表，消息不存在（已被编辑或删除）时返回None
+    """
+    if not message_id:
+        return list(messages)
+    for i, message in enumerate(messages):
+        if message.id == message_id:
+            return list(messages[i + 1 :])
+    return None
+
+
+def format_conversation(messages: Sequence[BaseMessage], tool_chars: int = 300) -> str:
+    """
+    把消息转换为摘要用的对话文本，工具输出只保留开头部分
+    :param messages: 消息列表
+    :param tool_chars: 每条工具输出保留的字符数
+    :return: 对话文本
+    """
+    lines = []
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        if isinstance(message, HumanMessage):
+            lines.append(f"用户: {content}")
+        elif isinstance(message, AIMessage):
+            if content:
+                lines.append(f"助手: {content}")
+            for tool_call in message.tool_calls:
+                lines.append(f"助手调用工具 {tool_call['name']}: {tool_call['args']}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"工具 {message.name} 返回: {content[:tool_chars]}")
+    return "\n".join(lines)
+
+
+class ConversationSummarizer:
+    """
+    滚动对话摘要
+
+    最近keep_turns轮保持原样发送；更早的轮次在累计到min_delta_turns轮后，
+    只把上次摘要之后新增的部分与已有摘要合并，不重新摘要全部历史。
+    """
+
+    def __init__(
+        self,
+        keep_turns: int = 6,
+        min_delta_turns: int = 2,
+        max_chars: int = 2000,
+    ):
+        """
+        初始化摘要器
+        :param keep_turns: 保持原样的最近轮数
+        :param min_delta_turns: 触发摘要所需的最少新增轮数
+        :param max_chars: 摘要的最大字符数
+        """
+        self.keep_turns = max(1, keep_turns)
+        self.min_delta_turns = max(1, min_delta_turns)
+        self.max_chars = max_chars
+
+    def select_delta(
+        self,
+        messages: Sequence[BaseMessage],
+        summarized_upto: Optional[str],
+    ) -> Tuple[List[BaseMessage], Optional[str], bool]:
+        """
+        选择需要合并进摘要的新增消息
+        :param messages: 完整消息历史
+        :param summarized_upto: 已摘要的最后一条消息ID
+        :return: (新增消息, 新的已摘要消息ID, 是否需要丢弃已有摘要重建)
+        """
+        remaining = messages_after(messages, summarized_upto)
+        rebuild = remaining is None
+        if rebuild:
+            remaining = list(messages)
+
+        turns = split_turns(remaining)
+        delta_turns = turns[: max(0, len(turns) - self.keep_turns)]
+        if len(delta_turns) < self.min_delta_turns:
+            return [], summarized_upto, rebuild
+
+        delta = [message for turn in delta_turns for message in turn]
+        return delta, delta[-1].id, rebuild
+
+    async def summarize(
+        self, llm: BaseChatModel, summary: str, delta: Sequence[BaseMessage]
+    ) -> str:
+        """
+        把新增消息合并进已有摘要
+        :param llm: 生成摘要的模型
+        :param summary: 已有摘要
+        :param delta: 新增消息
+        :return: 更新后的摘要
+        """
+        chain = SUMMARY_PROMPT | llm | StrOutputParser()
+        updated = await chain.ainvoke(
+            {
+                "summary": summary or "（无）",
+                "conversation": format_conversation(delta),
+                "max_chars": self.max_chars,
+            }
+        )
+        return updated.strip()[: self.max_chars]
+
+
+# 全局摘要器实例
+conversation_summarizer = ConversationSummarizer(
+    keep_turns=app_config.summary_keep_turns,
+    min_delta_turns=app_config.summary_min_delta_turns,
+    max_chars=app_config.summary_max_chars,
+)
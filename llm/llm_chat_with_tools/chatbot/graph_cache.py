@@ -0,0 +1,87 @@
+"""
+对话图缓存 - 按(模型, 是否启用结果处理, 工具集版本)缓存已编译的对话图
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# (模型名称, 是否启用结果处理, 工具集版本)
+GraphCacheKey = Tuple[str, bool, int]
+
+
+class GraphCache:
+    """
+    已编译对话图的LRU缓存
+
+    缓存值为已初始化的ChatBot，其中包含bind_tools结果和编译好的图，
+    请求模型名称不受限制，超出容量时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_size: int = 8):
+        """
+        初始化缓存
+        :param max_size: 最大缓存条目数
+        """
+        self.max_size = max(1, max_size)
+        self._data: "OrderedDict[GraphCacheKey, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: GraphCacheKey) -> Optional[Any]:
+        """
+        读取缓存，命中时将条目移到最近使用位置
+        :param key: 缓存键
+        :return: 缓存值，未命中返回None
+        """
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: GraphCacheKey) -> Optional[Any]:
+        """
+        读取缓存但不更新命中统计和使用顺序
+        :param key: 缓存键
+        :return: 缓存值，未命中返回None
+        """
+        return self._data.get(key)
+
+    def put(self, key: GraphCacheKey, value: Any) -> None:
+        """
+        写入缓存，超出容量时淘汰最久未使用的条目
+        :param key: 缓存键
+        :param value: 缓存值
+        """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self) -> List[GraphCacheKey]:
+        return list(self._data.keys())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+        :return: 统计信息
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,90 @@
+"""
+对话历史分页 - 基于消息ID游标的分页、类型过滤和字段裁剪
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+
+def is_tool_message(message: BaseMessage) -> bool:
+    """
+    是否为工具相关消息：工具结果，或只包含工具调用、没有文本内容的AI消息
+    :param message: 消息
+    :return: 是否为工具相关消息
+    """
+    if isinstance(message, ToolMessage):
+        return True
+    return isinstance(message, AIMessage) and bool(message.tool_calls) and not message.content
+
+
+def project_message(
+    message: BaseMessage, fields: str = "full", preview_chars: int = 200
+) -> Dict[str, Any]:
+    """
+    把消息转换为接口返回的字典
+    :param message: 消息
+    :param fields: full返回完整消息，preview只返回id/type/内容预览
+    :param preview_chars: 预览的最大字符数
+    :return: 消息字典
+    """
+    if fields != "preview":
+        return message.model_dump()
+
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return {
+        "id": message.id,
+        "type": message.type,
+        "content": content[:preview_chars],
+        "truncated": len(content) > preview_chars,
+    }
+
+
+def paginate_messages(
+    messages: Sequence[BaseMessage],
+    limit: int = 50,
+    before_id: Optional[str] = None,
+    after_id: Optional[str] = None,
+    exclude_tools: bool = False,
+    fields: str = "full",
+    preview_chars: int = 200,
+) -> Optional[Dict[str, Any]]:
+    """
+    按消息ID游标分页
+    默认返回最新的limit条；before_id返回该消息之前的limit条，after_id返回该消息之后的limit条
+    :param messages: 完整消息历史
+    :param limit: 每页条数
+    :param before_id: 向前翻页的游标消息ID
+    :param after_id: 向后翻页的游标消息ID
+    :param exclude_tools: 是否排除工具相关消息
+    :param fields: 返回字段，full或preview
+    :param preview_chars: 预览的最大字符数
+    :return: 分页结果，游标消息不存在时返回None
+    """
+    cursor_id = before_id or after_id
+    if cursor_id:
+        cursor = next((i for i, m in enumerate(messages) if m.id == cursor_id), None)
+        if cursor is None:
+            return None
+        candidates = messages[:cursor] if before_id else messages[cursor + 1 :]
+    else:
+        candidates = messages
+
+    if exclude_tools:
+        candidates = [m for m in candidates if not is_tool_message(m)]
+
+    if after_id:
+        page = list(candidates[:limit])
+    else:
+        page = list(candidates[-limit:]) if limit else []
+    has_more = len(candidates) > len(page)
+
+    items: List[Dict[str, Any]] = [
+        project_message(m, fields, preview_chars) for m in page
+    ]
+    return {
+        "messages": items,
+        "has_more": has_more,
+        "first_id": page[0].id if page else None,
+        "last_id": page[-1].id if page else None,
+    }
@@ -0,0 +1,30 @@
+"""
+JSON编码 - 安装了orjson时使用orjson，否则回退到标准库json
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return str(obj)
+
+
+def dumps_json(obj: Any) -> bytes:
+    """
+    把对象编码为UTF-8 JSON字节串，中文不转义
+    :param obj: 待编码对象
+    :return: JSON字节串
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
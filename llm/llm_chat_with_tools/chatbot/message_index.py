@@ -0,0 +1,468 @@
+"""
+消息ID索引 - 写入检查点时同步维护 消息ID → (线程, 位置, 检查点) 的PostgreSQL旁路表，
+按ID读取或修改单条消息时不再反序列化整个对话历史
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata
+from psycopg import AsyncConnection
+from psycopg.types.json import Jsonb
+
+from llm.llm_chat_with_tools.chatbot.pooled_saver import PooledPostgresSaver
+
+MESSAGE_INDEX_TABLE = "chat_message_index"
+# 每个线程的索引水位：索引内容对应的检查点ID
+MESSAGE_INDEX_STATE_TABLE = "chat_message_index_state"
+MESSAGE_INDEX_TABLES = (MESSAGE_INDEX_TABLE, MESSAGE_INDEX_STATE_TABLE)
+
+# 索引更新的advisory lock命名空间
+INDEX_LOCK_NAMESPACE = 7_310_019
+
+MESSAGE_INDEX_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {MESSAGE_INDEX_TABLE} (
+        thread_id TEXT NOT NULL,
+        message_id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        message_type TEXT NOT NULL,
+        message JSONB NOT NULL,
+        content_hash TEXT NOT NULL,
+        summarized BOOLEAN NOT NULL DEFAULT FALSE,
+        checkpoint_id TEXT NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (thread_id, message_id)
+    )
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS {MESSAGE_INDEX_TABLE}_position
+    ON {MESSAGE_INDEX_TABLE} (thread_id, position)
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {MESSAGE_INDEX_STATE_TABLE} (
+        thread_id TEXT PRIMARY KEY,
+        checkpoint_id TEXT NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+]
+
+UPSERT_MESSAGE_SQL = f"""
+INSERT INTO {MESSAGE_INDEX_TABLE}
+    (thread_id, message_id, position, message_type, message, content_hash, summarized, checkpoint_id, updated_at)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, now())
+ON CONFLICT (thread_id, message_id) DO UPDATE SET
+    position = EXCLUDED.position,
+    message_type = EXCLUDED.message_type,
+    message = EXCLUDED.message,
+    content_hash = EXCLUDED.content_hash,
+    summarized = EXCLUDED.summarized,
+    checkpoint_id = EXCLUDED.checkpoint_id,
+    updated_at = now()
+"""
+
+UPSERT_WATERMARK_SQL = f"""
+INSERT INTO {MESSAGE_INDEX_STATE_TABLE} (thread_id, checkpoint_id, updated_at)
+VALUES (%s, %s, now())
+ON CONFLICT (thread_id) DO UPDATE SET
+    checkpoint_id = EXCLUDED.checkpoint_id,
+    updated_at = now()
+"""
+
+# 索引水位等于线程最新的根检查点时，索引与当前历史一致（别名i为索引表，参数为线程ID）
+CURRENT_INDEX_SQL = f"""
+EXISTS (
+    SELECT 1 FROM {MESSAGE_INDEX_STATE_TABLE} s
+    WHERE s.thread_id = i.thread_id
+      AND s.checkpoint_id = (
+          SELECT checkpoint_id FROM checkpoints
+          WHERE thread_id = %s AND checkpoint_ns = ''
+          ORDER BY checkpoint_id DESC LIMIT 1
+      )
+)
+"""
+
+# 线程已写入的索引行：消息ID -> (位置, 内容指纹, 内容哈希, 是否已摘要)，
+# 从数据库读取的行没有内容指纹
+IndexedRows = Dict[str, Tuple[int, Optional[int], str, bool]]
+
+
+async def message_index_exists(conn: AsyncConnection) -> bool:
+    """
+    检查消息索引表（包括水位表）是否已创建
+    :param conn: 数据库连接
+    :return: 是否存在
+    """
+    for table in MESSAGE_INDEX_TABLES:
+        cur = await conn.execute("SELECT to_regclass(%s) AS tbl", (table,))
+        row = await cur.fetchone()
+        if row is None or row["tbl"] is None:
+            return False
+    return True
+
+
+async def create_message_index(conn: AsyncConnection) -> None:
+    """
+    创建消息索引表（幂等）
+    :param conn: 数据库连接
+    """
+    for statement in MESSAGE_INDEX_DDL:
+        await conn.execute(statement)
+
+
+def _serialize(message: BaseMessage) -> Tuple[Dict[str, Any], str]:
+    data = message_to_dict(message)
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return json.loads(raw), hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _fingerprint(message: BaseMessage) -> int:
+    """
+    计算消息的进程内内容指纹，节点原地修改content或response_metadata后指纹随之变化
+
+    字符串内容的哈希由解释器缓存在字符串对象上，同一内容重复计算几乎没有开销；
+    其余字段通常很小，直接序列化
+    :param message: 消息
+    :return: 内容指纹
+    """
+    content = message.content
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+    fields = json.dumps(
+        message.model_dump(exclude={"content"}),
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hash((content, fields))
+
+
+class IndexedPostgresSaver(PooledPostgresSaver):
+    """
+    带消息ID索引的检查点存储
+
+    每次写入根命名空间的检查点且messages发生变化时，在一个事务内与该线程已有的索引行比较，
+    只写入新增或变化的消息行、删除已移除的消息行，并把水位（chat_message_index_state）
+    推进到本次的检查点；其他检查点只在水位等于其父检查点时推进水位。
+    已有的索引行缓存在进程内并记录对应的水位，事务内只读取一行水位确认缓存仍与数据库一致，
+    不一致（其他worker写入过、进程重启或线程被删除）时才重新读取该线程的全部索引行。
+    读取时只使用水位等于线程最新检查点的索引，索引写入失败、被取消或落后时
+    读取方回退到完整历史扫描，不会读到过期数据。
+    """
+
+    def __init__(self, conn: Any, cache_threads: int = 256, **kwargs):
+        """
+        初始化检查点存储
+        :param conn: 连接池
+        :param cache_threads: 进程内缓存索引行的线程数
+        """
+        super().__init__(conn, **kwargs)
+        self.cache_threads = max(1, cache_threads)
+        # 线程ID -> (索引水位, 已写入的索引行)
+        self._indexed: "OrderedDict[str, Tuple[str, IndexedRows]]" = OrderedDict()
+        self._stats = {
+            "lookups": 0,
+            "lookup_hits": 0,
+            "rows_written": 0,
+            "rows_deleted": 0,
+            "messages_hashed": 0,
+            "resyncs": 0,
+            "errors": 0,
+        }
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+
+        configurable = config["configurable"]
+        if configurable.get("checkpoint_ns", "") != "":
+            return next_config
+
+        thread_id = str(configurable["thread_id"])
+        parent_checkpoint_id = configurable.get("checkpoint_id")
+        channel_values = checkpoint["channel_values"]
+        messages = channel_values.get("messages")
+        try:
+            if isinstance(messages, list) and (
+                "messages" in new_versions or "summarized_upto" in new_versions
+            ):
+                await self._index_messages(
+                    thread_id,
+                    checkpoint["id"],
+                    messages,
+                    channel_values.get("summarized_upto"),
+                )
+            elif parent_checkpoint_id:
+                await self._advance_watermark(
+                    thread_id, parent_checkpoint_id, checkpoint["id"]
+                )
+        except BaseException as e:
+            # 事务未提交时水位不会推进，读取方自动回退到完整历史扫描
+            self._stats["errors"] += 1
+            self._indexed.pop(thread_id, None)
+            if not isinstance(e, Exception):
+                raise
+            print(f"更新消息索引失败 {thread_id}: {e}")
+        return next_config
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        self._indexed.pop(str(thread_id), None)
+        async with self.conn.connection() as conn:
+            async with conn.transaction():
+                for table in MESSAGE_INDEX_TABLES:
+                    await conn.execute(
+                        f"DELETE FROM {table} WHERE thread_id = %s", (str(thread_id),)
+                    )
+
+    def forget_threads(self, thread_ids: Sequence[str]) -> None:
+        """
+        丢弃线程的进程内索引缓存（线程被外部删除后调用）
+        :param thread_ids: 线程ID列表
+        """
+        for thread_id in thread_ids:
+            self._indexed.pop(str(thread_id), None)
+
+    def _remember(self, thread_id: str, checkpoint_id: str, rows: IndexedRows) -> None:
+        self._indexed[thread_id] = (checkpoint_id, rows)
+        self._indexed.move_to_end(thread_id)
+        while len(self._indexed) > self.cache_threads:
+            self._indexed.popitem(last=False)
+
+    async def _load_indexed(
+        self, conn: AsyncConnection, thread_id: str
+    ) -> IndexedRows:
+        """
+        读取线程在数据库中的全部索引行，进程内缓存失效时使用
+        :param conn: 数据库连接
+        :param thread_id: 线程ID
+        :return: 索引行，内容指纹为空，比较时重新计算
+        """
+        self._stats["resyncs"] += 1
+        cur = await conn.execute(
+            f"""
+            SELECT message_id, position, content_hash, summarized
+            FROM {MESSAGE_INDEX_TABLE} WHERE thread_id = %s
+            """,
+            (thread_id,),
+        )
+        return {
+            row["message_id"]: (
+                row["position"],
+                None,
+                row["content_hash"],
+                row["summarized"],
+            )
+            for row in await cur.fetchall()
+        }
+
+    def _diff_messages(
+        self,
+        thread_id: str,
+        checkpoint_id: str,
+        messages: List[BaseMessage],
+        summarized_position: int,
+        indexed: IndexedRows,
+    ) -> Tuple[IndexedRows, List[Tuple[Any, ...]]]:
+        """
+        与已有索引行比较，内容指纹未变的消息直接复用内容哈希，
+        只序列化新增、被替换或被原地修改的消息
+        :param thread_id: 线程ID
+        :param checkpoint_id: 本次写入的检查点ID
+        :param messages: 完整消息列表
+        :param summarized_position: 已摘要的最后一条消息位置
+        :param indexed: 已有的索引行
+        :return: (本次写入后的索引行, 需要写入的行)
+        """
+        current: IndexedRows = {}
+        rows = []
+        for position, message in enumerate(messages):
+            if not message.id:
+                continue
+            fingerprint = _fingerprint(message)
+            summarized = position <= summarized_position
+            previous = indexed.get(message.id)
+            data = None
+            if previous is not None and previous[1] == fingerprint:
+                content_hash = previous[2]
+            else:
+                data, content_hash = _serialize(message)
+                self._stats["messages_hashed"] += 1
+            current[message.id] = (position, fingerprint, content_hash, summarized)
+
+            if previous is not None and (previous[0], previous[2], previous[3]) == (
+                position,
+                content_hash,
+                summarized,
+            ):
+                continue
+            if data is None:
+                data = _serialize(message)[0]
+            rows.append(
+                (
+                    thread_id,
+                    message.id,
+                    position,
+                    message.type,
+                    Jsonb(data),
+                    content_hash,
+                    summarized,
+                    checkpoint_id,
+                )
+            )
+        return current, rows
+
+    async def _index_messages(
+        self,
+        thread_id: str,
+        checkpoint_id: str,
+        messages: List[BaseMessage],
+        summarized_upto: Optional[str],
+    ) -> None:
+        """
+        增量更新线程的消息索引，并推进水位
+        :param thread_id: 线程ID
+        :param checkpoint_id: 本次写入的检查点ID
+        :param messages: 检查点中的完整消息列表
+        :param summarized_upto: 已摘要的最后一条消息ID
+        """
+        summarized_position = -1
+        if summarized_upto:
+            summarized_position = next(
+                (i for i, m in enumerate(messages) if m.id == summarized_upto), -1
+            )
+        cached = self._indexed.pop(thread_id, None)
+
+        async with self.conn.connection() as conn:
+            async with conn.transaction():
+                # 同一线程的索引更新在多个worker之间串行执行
+                await conn.execute(
+                    "SELECT pg_advisory_xact_lock(%s, hashtext(%s))",
+                    (INDEX_LOCK_NAMESPACE, thread_id),
+                )
+                cur = await conn.execute(
+                    f"""
+                    SELECT checkpoint_id FROM {MESSAGE_INDEX_STATE_TABLE}
+                    WHERE thread_id = %s
+                    """,
+                    (thread_id,),
+                )
+                row = await cur.fetchone()
+                watermark = row["checkpoint_id"] if row is not None else None
+                if cached is not None and cached[0] == watermark:
+                    indexed = cached[1]
+                else:
+                    indexed = await self._load_indexed(conn, thread_id)
+
+                current, rows = self._diff_messages(
+                    thread_id, checkpoint_id, messages, summarized_position, indexed
+                )
+                removed = [mid for mid in indexed if mid not in current]
+
+                if removed:
+                    await conn.execute(
+                        f"""
+                        DELETE FROM {MESSAGE_INDEX_TABLE}
+                        WHERE thread_id = %s AND message_id = ANY(%s)
+                        """,
+                        (thread_id, removed),
+                    )
+                if rows:
+                    async with conn.cursor() as cur:
+                        await cur.executemany(UPSERT_MESSAGE_SQL, rows)
+                await conn.execute(UPSERT_WATERMARK_SQL, (thread_id, checkpoint_id))
+
+        # 事务提交后才缓存，失败时下次写入重新读取
+        self._remember(thread_id, checkpoint_id, current)
+        self._stats["rows_written"] += len(rows)
+        self._stats["rows_deleted"] += len(removed)
+
+    async def _advance_watermark(
+        self, thread_id: str, parent_checkpoint_id: str, checkpoint_id: str
+    ) -> None:
+        """
+        messages未变化的检查点：水位等于父检查点时推进到本次检查点，
+        否则索引已落后，保持不变直到下一次消息变化时重新同步
+        :param thread_id: 线程ID
+        :param parent_checkpoint_id: 父检查点ID
+        :param checkpoint_id: 本次写入的检查点ID
+        """
+        async with self.conn.connection() as conn:
+            cur = await conn.execute(
+                f"""
+                UPDATE {MESSAGE_INDEX_STATE_TABLE}
+                SET checkpoint_id = %s, updated_at = now()
+                WHERE thread_id = %s AND checkpoint_id = %s
+                """,
+                (checkpoint_id, thread_id, parent_checkpoint_id),
+            )
+        cached = self._indexed.get(thread_id)
+        if cur.rowcount and cached is not None and cached[0] == parent_checkpoint_id:
+            self._remember(thread_id, checkpoint_id, cached[1])
+
+    async def lookup(self, thread_id: str, message_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按消息ID读取单条消息，只使用与线程最新检查点一致的索引
+        :param thread_id: 线程ID
+        :param message_id: 消息ID
+        :return: {"message", "position", "summarized", "checkpoint_id"}，未索引或索引落后时返回None
+        """
+        self._stats["lookups"] += 1
+        async with self.conn.connection() as conn:
+            cur = await conn.execute(
+                f"""
+                SELECT i.message, i.position, i.summarized, i.checkpoint_id
+                FROM {MESSAGE_INDEX_TABLE} i
+                WHERE i.thread_id = %s AND i.message_id = %s AND {CURRENT_INDEX_SQL}
+                """,
+                (str(thread_id), message_id, str(thread_id)),
+            )
+            row = await cur.fetchone()
+        if row is None:
+            return None
+        self._stats["lookup_hits"] += 1
+        return {
+            "message": messages_from_dict([row["message"]])[0],
+            "position": row["position"],
+            "summarized": row["summarized"],
+            "checkpoint_id": row["checkpoint_id"],
+        }
+
+    async def message_ids_from(
+        self, thread_id: str, position: int
+    ) -> Optional[List[str]]:
+        """
+        获取线程中指定位置及之后的消息ID
+        :param thread_id: 线程ID
+        :param position: 起始位置
+        :return: 按位置排序的消息ID列表，索引落后时返回None
+        """
+        async with self.conn.connection() as conn:
+            cur = await conn.execute(
+                f"""
+                SELECT i.message_id FROM {MESSAGE_INDEX_TABLE} i
+                WHERE i.thread_id = %s AND i.position >= %s AND {CURRENT_INDEX_SQL}
+                ORDER BY i.position
+                """,
+                (str(thread_id), position, str(thread_id)),
+            )
+            rows = await cur.fetchall()
+        # 起始位置的消息刚由lookup确认存在，结果为空说明索引已落后
+        return [row["message_id"] for row in rows] or None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取索引统计信息
+        :return: 统计信息
+        """
+        return {**self._stats, "cached_threads": len(self._indexed)}
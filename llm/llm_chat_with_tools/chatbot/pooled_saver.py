@@ -0,0 +1,48 @@
+"""
+连接池检查点存储 - 去掉AsyncPostgresSaver的实例锁，不同线程的检查点读写可以并发执行
+"""
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from psycopg import AsyncCursor
+from psycopg.rows import DictRow, dict_row
+from psycopg_pool import AsyncConnectionPool
+
+
+class PooledPostgresSaver(AsyncPostgresSaver):
+    """
+    基于连接池的检查点存储
+
+    AsyncPostgresSaver的每次数据库操作都持有实例级的asyncio.Lock，这是为单个连接准备的；
+    共享一个实例时，所有线程的检查点读写仍然排队执行，连接池只增加了连接数而没有增加并发。
+    使用连接池时每次操作借出的连接本身就是独占的，这里不再获取实例锁。
+    使用单个连接时仍保持原有行为。
+    """
+
+    @asynccontextmanager
+    async def _cursor(
+        self, *, pipeline: bool = False
+    ) -> AsyncIterator[AsyncCursor[DictRow]]:
+        if not isinstance(self.conn, AsyncConnectionPool):
+            async with super()._cursor(pipeline=pipeline) as cur:
+                yield cur
+            return
+
+        async with self.conn.connection() as conn:
+            if not pipeline:
+                async with conn.cursor(binary=True, row_factory=dict_row) as cur:
+                    yield cur
+            elif self.supports_pipeline:
+                async with (
+                    conn.pipeline(),
+                    conn.cursor(binary=True, row_factory=dict_row) as cur,
+                ):
+                    yield cur
+            else:
+                async with (
+                    conn.transaction(),
+                    conn.cursor(binary=True, row_factory=dict_row) as cur,
+                ):
+                    yield cur
@@ -0,0 +1,224 @@
+"""
+SSE事件编码 - /chat/tools流式响应的精简事件格式
+
+每个事件是一行 data: {...}，通过type区分：
+- token：模型输出的文本片段，{"type": "token", "content": "..."}，新消息的第一个片段附带"id"
+- tool_start：模型发起工具调用，{"type": "tool_start", "id", "name", "args"}
+- tool_end：工具执行完成，{"type": "tool_end", "id", "name", "status", "output"}，有耗时信息时附带"duration_ms"
+- done：本轮生成结束，{"type": "done"}
+
+按FlushPolicy把连续的token合并为一个事件发送，默认逐token发送。
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from langchain_core.messages import ToolCall, ToolMessage
+
+from config import config as app_config
+from llm.llm_chat_with_tools.chatbot.json_codec import dumps_json
+
+# 流式事件：("token", (文本, 消息ID)) / ("tool_start", ToolCall) / ("tool_end", ToolMessage)
+StreamEvent = Tuple[str, Any]
+
+
+def chunk_text(content: Any) -> str:
+    """
+    提取消息片段中的文本，兼容字符串和内容块列表两种格式
+    :param content: 消息内容
+    :return: 文本
+    """
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block if isinstance(block, str) else block.get("text", "")
+            for block in content
+            if isinstance(block, (str, dict))
+        )
+    return ""
+
+
+class SSEEncoder:
+    """
+    单次流式响应的事件编码器
+
+    记录上一个token所属的消息ID，只在切换到新消息时发送id字段，
+    token事件只包含变化的文本。
+    """
+
+    def __init__(self):
+        self._message_id: Optional[str] = None
+
+    @staticmethod
+    def encode(payload: Dict[str, Any]) -> bytes:
+        """
+        编码单个SSE事件
+        :param payload: 事件内容
+        :return: SSE事件字节串
+        """
+        return b"data: " + dumps_json(payload) + b"\n\n"
+
+    def token(self, content: str, message_id: Optional[str] = None) -> bytes:
+        payload: Dict[str, Any] = {"type": "token", "content": content}
+        if message_id and message_id != self._message_id:
+            self._message_id = message_id
+            payload["id"] = message_id
+        return self.encode(payload)
+
+    def tool_start(self, tool_call: ToolCall) -> bytes:
+        return self.encode(
+            {
+                "type": "tool_start",
+                "id": tool_call["id"],
+                "name": tool_call["name"],
+                "args": tool_call["args"],
+            }
+        )
+
+    def tool_end(self, message: ToolMessage) -> bytes:
+        payload: Dict[str, Any] = {
+            "type": "tool_end",
+            "id": message.tool_call_id,
+            "name": message.name,
+            "status": message.status,
+            "output": chunk_text(message.content),
+        }
+        timing = message.response_metadata.get("tool_timing")
+        if timing:
+            payload["duration_ms"] = timing["duration_ms"]
+        return self.encode(payload)
+
+    def done(self) -> bytes:
+        return self.encode({"type": "done"})
+
+    def event(self, event: StreamEvent) -> bytes:
+        """
+        编码一个流式事件
+        :param event: (事件类型, 内容)
+        :return: SSE事件字节串
+        """
+        kind, payload = event
+        if kind == "token":
+            return self.token(*payload)
+        if kind == "tool_start":
+            return self.tool_start(payload)
+        return self.tool_end(payload)
+
+
+@dataclass(frozen=True)
+class FlushPolicy:
+    """
+    token合并策略：缓冲达到max_bytes字节，或第一个缓冲的token等待超过max_ms毫秒时发送；
+    两者都不大于0时逐token发送。工具事件和消息切换总是先发送已缓冲的token。
+    """
+
+    max_bytes: int = 0
+    max_ms: int = 0
+
+    @property
+    def immediate(self) -> bool:
+        return self.max_bytes <= 0 and self.max_ms <= 0
+
+    @classmethod
+    def resolve(
+        cls, max_bytes: Optional[int] = None, max_ms: Optional[int] = None
+    ) -> "FlushPolicy":
+        """
+        按请求参数覆盖配置中的合并策略
+        :param max_bytes: 请求指定的字节阈值，为空时使用SSE_FLUSH_BYTES
+        :param max_ms: 请求指定的时间阈值，为空时使用SSE_FLUSH_MS
+        :return: 合并策略
+        """
+        return cls(
+            max_bytes=app_config.sse_flush_bytes if max_bytes is None else max_bytes,
+            max_ms=app_config.sse_flush_ms if max_ms is None else max_ms,
+        )
+
+
+_END = object()
+
+
+async def coalesce_events(
+    events: AsyncIterator[StreamEvent],
+    encoder: SSEEncoder,
+    policy: FlushPolicy,
+    on_cancel: Optional[Callable[[asyncio.Task], None]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    按合并策略编码流式事件
+
+    事件由后台任务读取并放入队列，没有新token到达时也能按时发送。
+    本生成器被关闭或取消时，取消仍在运行的后台任务，并把该任务交给on_cancel
+    :param events: 流式事件
+    :param encoder: 事件编码器
+    :param policy: 合并策略
+    :param on_cancel: 后台任务被取消时的回调
+    :return: SSE事件字节串
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> None:
+        try:
+            async for event in events:
+                await queue.put(event)
+        finally:
+            await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    loop = asyncio.get_running_loop()
+    buffer = []
+    buffered_bytes = 0
+    buffer_id: Optional[str] = None
+    deadline: Optional[float] = None
+
+    def flush() -> bytes:
+        nonlocal buffered_bytes, deadline
+        data = encoder.token("".join(buffer), buffer_id)
+        buffer.clear()
+        buffered_bytes = 0
+        deadline = None
+        return data
+
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield flush()
+                continue
+            if event is _END:
+                break
+
+            kind, payload = event
+            if kind != "token":
+                if buffer:
+                    yield flush()
+                yield encoder.event(event)
+                continue
+
+            content, message_id = payload
+            if policy.immediate:
+                yield encoder.token(content, message_id)
+                continue
+            if buffer and message_id != buffer_id:
+                yield flush()
+            buffer.append(content)
+            buffer_id = message_id
+            buffered_bytes += len(content.encode("utf-8"))
+            if deadline is None and policy.max_ms > 0:
+                deadline = loop.time() + policy.max_ms / 1000
+            if policy.max_bytes > 0 and buffered_bytes >= policy.max_bytes:
+                yield flush()
+
+        if buffer:
+            yield flush()
+        # 读取过程中的异常在这里抛出
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+            if on_cancel is not None:
+                on_cancel(producer)
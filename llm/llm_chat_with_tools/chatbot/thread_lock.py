@@ -0,0 +1,252 @@
+"""
+线程级并发控制 - 同一个thread_id同时只运行一轮对话，线程忙时按策略拒绝、排队或取消较早的一轮
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+
+from config import config as app_config
+
+# 线程忙时的处理策略
+BUSY_POLICIES = ("reject", "queue", "cancel_older")
+
+# 对话线程advisory lock的命名空间，与检查点迁移锁区分
+THREAD_LOCK_NAMESPACE = 7_310_025
+
+
+class ThreadBusyError(Exception):
+    """线程正在运行另一轮对话"""
+
+    def __init__(self, thread_id: str, reason: str):
+        super().__init__(f"对话 {thread_id} 正在生成中（{reason}）")
+        self.thread_id = thread_id
+        self.reason = reason
+
+
+class ThreadLease:
+    """
+    一轮对话持有的线程锁，本轮结束后释放
+    """
+
+    def __init__(self, manager: "ThreadLockManager", thread_id: str):
+        self.manager = manager
+        self.thread_id = thread_id
+        # 是否持有数据库中的advisory lock
+        self.remote = False
+        # 持有者注册的取消回调，cancel_older策略下由较新的一轮调用
+        self.on_preempt: Optional[Callable[[], Any]] = None
+        self.preempted = False
+        self.released = asyncio.Event()
+
+    async def release(self) -> None:
+        await self.manager.release(self)
+
+
+class ThreadLockManager:
+    """
+    线程锁管理器
+
+    默认只在进程内互斥；启用advisory lock后，本进程所有轮次的锁都持有在同一个专用连接上
+    （会话级锁，一个会话可以同时持有多个键），不占用检查点连接池，实现跨worker互斥，
+    连接断开时锁自动释放，下次获取时重新连接。
+    跨worker时无法取消其他进程中的一轮，cancel_older策略退化为排队等待。
+    """
+
+    def __init__(
+        self,
+        policy: str = "queue",
+        queue_timeout: float = 30.0,
+        poll_interval: float = 0.1,
+    ):
+        """
+        初始化线程锁管理器
+        :param policy: 默认的线程忙处理策略（reject/queue/cancel_older）
+        :param queue_timeout: 排队等待的最长时间（秒）
+        :param poll_interval: 等待其他worker释放advisory lock时的重试间隔（秒）
+        """
+        self.policy = policy if policy in BUSY_POLICIES else "queue"
+        self.queue_timeout = queue_timeout
+        self.poll_interval = poll_interval
+        self.conninfo: Optional[str] = None
+        self._conn: Optional[AsyncConnection] = None
+        self._conn_lock = asyncio.Lock()
+        self._holders: Dict[str, ThreadLease] = {}
+        self._waiting: Dict[str, int] = {}
+        self._stats = {
+            "acquired": 0,
+            "queued": 0,
+            "rejected": 0,
+            "preempted": 0,
+            "timeouts": 0,
+            "remote_busy": 0,
+        }
+
+    def use_advisory_lock(self, conninfo: Optional[str]) -> None:
+        """
+        启用或关闭跨worker的advisory lock
+        :param conninfo: 数据库连接串，为空时只在进程内互斥
+        """
+        self.conninfo = conninfo
+
+    async def close(self) -> None:
+        """
+        关闭advisory lock专用连接，持有的锁随会话结束释放
+        """
+        async with self._conn_lock:
+            if self._conn is not None:
+                await self._conn.close()
+                self._conn = None
+
+    async def acquire(self, thread_id: str, policy: Optional[str] = None) -> ThreadLease:
+        """
+        获取线程锁
+        :param thread_id: 线程ID
+        :param policy: 线程忙时的处理策略，为空时使用默认策略
+        :return: 线程锁，本轮结束后需要调用release
+        :raises ThreadBusyError: reject策略下线程忙，或排队超时
+        """
+        policy = policy if policy in BUSY_POLICIES else self.policy
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        queued = False
+
+        try:
+            while True:
+                holder = self._holders.get(thread_id)
+                if holder is None:
+                    lease = ThreadLease(self, thread_id)
+                    # 先在进程内占位，再获取数据库锁，同进程的其他请求在本地等待
+                    self._holders[thread_id] = lease
+                    try:
+                        locked = await self._lock_remote(lease)
+                    except BaseException:
+                        # 连接失败或被取消时撤销占位，否则该线程会一直显示为忙
+                        del self._holders[thread_id]
+                        lease.released.set()
+                        raise
+                    if locked:
+                        self._stats["acquired"] += 1
+                        return lease
+                    del self._holders[thread_id]
+                    lease.released.set()
+                    self._stats["remote_busy"] += 1
+                    wait_for = self.poll_interval
+                else:
+                    wait_for = None
+
+                if policy == "reject":
+                    self._stats["rejected"] += 1
+                    raise ThreadBusyError(thread_id, "rejected")
+
+                if not queued:
+                    queued = True
+                    self._stats["queued"] += 1
+                    self._waiting[thread_id] = self._waiting.get(thread_id, 0) + 1
+
+                if (
+                    policy == "cancel_older"
+                    and holder is not None
+                    and holder.on_preempt is not None
+                    and not holder.preempted
+                ):
+                    holder.preempted = True
+                    self._stats["preempted"] += 1
+                    print(f"对话 {thread_id} 收到新的一轮，取消正在运行的一轮")
+                    holder.on_preempt()
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise ThreadBusyError(thread_id, "timeout")
+                if holder is not None:
+                    try:
+                        await asyncio.wait_for(holder.released.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await asyncio.sleep(min(wait_for, remaining))
+        finally:
+            if queued:
+                self._waiting[thread_id] -= 1
+                if not self._waiting[thread_id]:
+                    del self._waiting[thread_id]
+
+    async def _connection(self) -> AsyncConnection:
+        if self._conn is None or self._conn.closed:
+            self._conn = await AsyncConnection.connect(
+                self.conninfo, autocommit=True, row_factory=dict_row
+            )
+        return self._conn
+
+    async def _lock_remote(self, lease: ThreadLease) -> bool:
+        """
+        在专用连接上尝试获取advisory lock
+        :param lease: 线程锁
+        :return: 是否获取成功，未启用advisory lock时总是成功
+        """
+        if self.conninfo is None:
+            return True
+        async with self._conn_lock:
+            conn = await self._connection()
+            cur = await conn.execute(
+                "SELECT pg_try_advisory_lock(%s, hashtext(%s)) AS locked",
+                (THREAD_LOCK_NAMESPACE, lease.thread_id),
+            )
+            row = await cur.fetchone()
+        lease.remote = row is not None and row["locked"]
+        return lease.remote
+
+    async def release(self, lease: ThreadLease) -> None:
+        """
+        释放线程锁，唤醒排队的请求
+        :param lease: 线程锁
+        """
+        if lease.released.is_set():
+            return
+        if self._holders.get(lease.thread_id) is lease:
+            del self._holders[lease.thread_id]
+        lease.released.set()
+
+        if not lease.remote:
+            return
+        lease.remote = False
+        async with self._conn_lock:
+            # 连接已断开时会话级锁已随之释放
+            if self._conn is None or self._conn.closed:
+                return
+            try:
+                await self._conn.execute(
+                    "SELECT pg_advisory_unlock(%s, hashtext(%s))",
+                    (THREAD_LOCK_NAMESPACE, lease.thread_id),
+                )
+            except Exception as e:
+                print(f"释放对话 {lease.thread_id} 的advisory lock失败: {e}")
+
+    def is_busy(self, thread_id: str) -> bool:
+        return thread_id in self._holders
+
+    def holder(self, thread_id: str) -> Optional[ThreadLease]:
+        return self._holders.get(thread_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        :return: 统计信息
+        """
+        return {
+            **self._stats,
+            "policy": self.policy,
+            "advisory_lock": self.conninfo is not None,
+            "running": len(self._holders),
+            "waiting": sum(self._waiting.values()),
+        }
+
+
+# 全局线程锁管理器
+thread_locks = ThreadLockManager(
+    policy=app_config.thread_busy_policy,
+    queue_timeout=app_config.thread_queue_timeout,
+)
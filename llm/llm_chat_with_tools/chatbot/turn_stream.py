@@ -0,0 +1,507 @@
+"""
+可恢复的流式响应 - 每轮对话在后台任务中运行，事件按序号写入环形缓冲，
+客户端断线后携带 Last-Event-ID 重连即可重放缺失的事件并继续接收，不会重新执行本轮
+"""
+
+import asyncio
+import itertools
+import math
+import uuid
+from collections import deque
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from config import config as app_config
+from llm.llm_chat_with_tools.chatbot.sse_events import SSEEncoder
+from llm.llm_chat_with_tools.chatbot.thread_lock import ThreadLease
+from llm.llm_chat_with_tools.tools.redis_client import get_redis_client
+
+# 已编号的事件：(序号, 带id行的SSE事件)
+Frame = Tuple[int, bytes]
+
+EVENTS_EXPIRED = SSEEncoder.encode(
+    {"type": "error", "message": "缺失的事件已过期，请重新加载对话历史"}
+)
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """
+    解析事件ID
+    :param event_id: "轮次ID:序号"
+    :return: (轮次ID, 序号)，格式错误时返回None
+    """
+    turn_id, _, seq = (event_id or "").strip().rpartition(":")
+    if not turn_id or not seq.isdigit():
+        return None
+    return turn_id, int(seq)
+
+
+def _frame_seq(frame: bytes) -> int:
+    return int(frame.split(b"\n", 1)[0].rsplit(b":", 1)[1])
+
+
+class TurnEventLog:
+    """
+    单轮对话的事件环形缓冲，超过容量时丢弃最早的事件
+    """
+
+    def __init__(self, turn_id: str, max_events: int):
+        self.turn_id = turn_id
+        self.frames: Deque[Frame] = deque(maxlen=max(1, max_events))
+        self.last_seq = 0
+        self.finished = False
+        self._changed = asyncio.Event()
+
+    def append(self, data: bytes) -> Frame:
+        """
+        追加一个事件，序号从1开始单调递增
+        :param data: SSE事件
+        :return: (序号, 带id行的SSE事件)
+        """
+        self.last_seq += 1
+        frame = f"id: {self.turn_id}:{self.last_seq}\n".encode("utf-8") + data
+        self.frames.append((self.last_seq, frame))
+        self._notify()
+        return self.last_seq, frame
+
+    def finish(self) -> None:
+        self.finished = True
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def since(self, after_seq: int) -> Optional[List[Frame]]:
+        """
+        获取指定序号之后的事件
+        :param after_seq: 客户端已收到的最后序号
+        :return: 事件列表，所需事件已被丢弃时返回None
+        """
+        if after_seq >= self.last_seq:
+            return []
+        oldest = self.frames[0][0] if self.frames else self.last_seq + 1
+        if after_seq + 1 < oldest:
+            return None
+        return list(itertools.islice(self.frames, after_seq + 1 - oldest, None))
+
+    async def wait(self, timeout: Optional[float]) -> None:
+        """
+        等待新事件或本轮结束
+        :param timeout: 最长等待时间（秒）
+        """
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class RedisTurnStore:
+    """
+    Redis事件存储，重连请求落到其他worker时从这里重放
+
+    每轮的事件保存在一个列表中（只保留最近max_events个），另有线程ID、结束标记
+    和其他worker上的订阅心跳三个键，所有键在ttl秒后过期。
+    """
+
+    def __init__(
+        self, redis: Any, max_events: int, ttl: int, key_prefix: str = "chat_turn:"
+    ):
+        """
+        初始化Redis事件存储
+        :param redis: Redis异步客户端
+        :param max_events: 每轮保留的最大事件数
+        :param ttl: 键的过期时间（秒）
+        :param key_prefix: Redis键前缀
+        """
+        self.redis = redis
+        self.max_events = max(1, max_events)
+        self.ttl = max(1, ttl)
+        self.key_prefix = key_prefix
+
+    def _key(self, turn_id: str, name: str) -> str:
+        return f"{self.key_prefix}{turn_id}:{name}"
+
+    async def register(self, turn_id: str, thread_id: str) -> None:
+        await self.redis.set(self._key(turn_id, "thread"), thread_id, ex=self.ttl)
+
+    async def append(self, turn_id: str, frame: bytes) -> None:
+        key = self._key(turn_id, "events")
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.rpush(key, frame)
+        pipe.ltrim(key, -self.max_events, -1)
+        pipe.expire(key, self.ttl)
+        pipe.expire(self._key(turn_id, "thread"), self.ttl)
+        await pipe.execute()
+
+    async def finish(self, turn_id: str) -> None:
+        await self.redis.set(self._key(turn_id, "done"), "1", ex=self.ttl)
+
+    async def touch(self, turn_id: str, ttl: int) -> None:
+        await self.redis.set(self._key(turn_id, "attached"), "1", ex=max(1, ttl))
+
+    async def attached(self, turn_id: str) -> bool:
+        return bool(await self.redis.exists(self._key(turn_id, "attached")))
+
+    async def read(self, turn_id: str, after_seq: int) -> Optional[Dict[str, Any]]:
+        """
+        读取指定序号之后的事件
+        :param turn_id: 轮次ID
+        :param after_seq: 客户端已收到的最后序号
+        :return: {"thread_id", "finished", "frames", "gap"}，轮次不存在时返回None
+        """
+        # 先读取结束标记再读取事件，结束标记存在时事件列表一定完整
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.get(self._key(turn_id, "thread"))
+        pipe.exists(self._key(turn_id, "done"))
+        pipe.lrange(self._key(turn_id, "events"), 0, -1)
+        thread_id, finished, raw_frames = await pipe.execute()
+        if thread_id is None:
+            return None
+
+        frames = [(_frame_seq(frame), frame) for frame in raw_frames]
+        return {
+            "thread_id": (
+                thread_id.decode("utf-8") if isinstance(thread_id, bytes) else thread_id
+            ),
+            "finished": bool(finished),
+            "frames": [frame for frame in frames if frame[0] > after_seq],
+            "gap": bool(frames) and frames[0][0] > after_seq + 1,
+        }
+
+
+class TurnRun:
+    """
+    一轮正在运行（或刚结束）的对话
+    """
+
+    def __init__(self, turn_id: str, thread_id: str, max_events: int):
+        self.turn_id = turn_id
+        self.thread_id = thread_id
+        self.log = TurnEventLog(turn_id, max_events)
+        self.task: Optional[asyncio.Task] = None
+        self.status = "running"
+        self.subscribers = 0
+        self.grace_handle: Optional[asyncio.TimerHandle] = None
+        self.lease: Optional[ThreadLease] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.log.finished
+
+
+class TurnStreamHub:
+    """
+    可恢复流式响应的管理器
+
+    对话在独立任务中运行，与HTTP连接解耦；每个连接只是事件的订阅者。
+    所有订阅者断开后等待grace_seconds，期间没有客户端重连（包括其他worker上经Redis的重连）
+    才取消本轮生成；结束的轮次在retention_seconds内仍可重放。
+    """
+
+    def __init__(
+        self,
+        max_events: int = 4096,
+        grace_seconds: float = 30.0,
+        retention_seconds: float = 300.0,
+        poll_interval: float = 0.5,
+        store: Optional[RedisTurnStore] = None,
+    ):
+        """
+        初始化管理器
+        :param max_events: 每轮事件环形缓冲的容量
+        :param grace_seconds: 所有客户端断开后等待重连的时间（秒）
+        :param retention_seconds: 本轮结束后事件保留的时间（秒）
+        :param poll_interval: 检查客户端是否断开的间隔（秒）
+        :param store: Redis事件存储，为空时只在进程内缓冲
+        """
+        self.max_events = max(1, max_events)
+        self.grace_seconds = max(0.0, grace_seconds)
+        self.retention_seconds = max(0.0, retention_seconds)
+        self.poll_interval = max(0.01, poll_interval)
+        self.store = store
+        self._runs: Dict[str, TurnRun] = {}
+        self._background: set = set()
+        self._stats = {
+            "started": 0,
+            "resumed": 0,
+            "remote_resumed": 0,
+            "cancelled": 0,
+            "failed": 0,
+            "store_errors": 0,
+        }
+
+    def start(
+        self,
+        thread_id: str,
+        events: AsyncIterator[bytes],
+        lease: Optional[ThreadLease] = None,
+    ) -> TurnRun:
+        """
+        在后台任务中开始一轮对话
+        :param thread_id: 线程ID
+        :param events: 本轮的SSE事件（ChatBot.generate）
+        :param lease: 本轮持有的线程锁，本轮结束（包括取消后的修复）后释放
+        :return: 运行中的轮次
+        """
+        run = TurnRun(uuid.uuid4().hex, thread_id, self.max_events)
+        run.lease = lease
+        run.task = asyncio.create_task(self._run(run, events))
+        if lease is not None:
+            lease.on_preempt = run.task.cancel
+        self._runs[run.turn_id] = run
+        self._stats["started"] += 1
+        return run
+
+    def find(self, turn_id: str) -> Optional[TurnRun]:
+        return self._runs.get(turn_id)
+
+    async def _store_call(self, operation: Awaitable[Any]) -> Any:
+        try:
+            return await operation
+        except Exception as e:
+            self._stats["store_errors"] += 1
+            print(f"写入Redis事件存储失败: {e}")
+            return None
+
+    async def _append(self, run: TurnRun, data: bytes) -> None:
+        _, frame = run.log.append(data)
+        if self.store is not None:
+            await self._store_call(self.store.append(run.turn_id, frame))
+
+    async def _run(self, run: TurnRun, events: AsyncIterator[bytes]) -> None:
+        try:
+            if self.store is not None:
+                await self._store_call(self.store.register(run.turn_id, run.thread_id))
+            async for data in events:
+                await self._append(run, data)
+            run.status = "done"
+        except asyncio.CancelledError:
+            run.status = "cancelled"
+            self._stats["cancelled"] += 1
+            await self._append(run, SSEEncoder.encode({"type": "cancelled"}))
+        except Exception as e:
+            run.status = "failed"
+            self._stats["failed"] += 1
+            print(f"对话 {run.thread_id} 生成失败: {e}")
+            await self._append(run, SSEEncoder.encode({"type": "error", "message": str(e)}))
+        finally:
+            if run.lease is not None:
+                await run.lease.release()
+            run.log.finish()
+            self._cancel_grace(run)
+            if self.store is not None:
+                await self._store_call(self.store.finish(run.turn_id))
+            asyncio.get_running_loop().call_later(
+                self.retention_seconds, self._runs.pop, run.turn_id, None
+            )
+
+    async def subscribe(
+        self,
+        run: TurnRun,
+        after_seq: int = 0,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        订阅一轮对话的事件：先重放after_seq之后已缓冲的事件，再接收新事件直到本轮结束
+        :param run: 轮次
+        :param after_seq: 客户端已收到的最后序号，新连接为0
+        :param is_disconnected: 检查客户端是否断开的协程函数
+        :return: 带id行的SSE事件
+        """
+        loop = asyncio.get_running_loop()
+        self._attach(run)
+        seq = after_seq
+        check_at = loop.time() + self.poll_interval
+        try:
+            while True:
+                frames = run.log.since(seq)
+                if frames is None:
+                    # 客户端读取过慢，缺失的事件已被环形缓冲丢弃
+                    yield EVENTS_EXPIRED
+                    return
+                for seq, frame in frames:
+                    yield frame
+                if frames:
+                    continue
+                if run.finished:
+                    return
+
+                await run.log.wait(self.poll_interval)
+                # 工具执行期间没有事件发送，需要主动检查客户端是否断开
+                if is_disconnected is not None and loop.time() >= check_at:
+                    if await is_disconnected():
+                        return
+                    check_at = loop.time() + self.poll_interval
+        finally:
+            self._detach(run)
+
+    async def resume(
+        self,
+        thread_id: str,
+        last_event_id: str,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> Optional[AsyncIterator[bytes]]:
+        """
+        按Last-Event-ID恢复事件流，不会重新执行本轮
+        :param thread_id: 线程ID
+        :param last_event_id: 客户端收到的最后事件ID
+        :param is_disconnected: 检查客户端是否断开的协程函数
+        :return: 事件流，轮次不存在、不属于该线程或缺失的事件已过期时返回None
+        """
+        parsed = parse_event_id(last_event_id)
+        if parsed is None:
+            return None
+        turn_id, seq = parsed
+
+        run = self._runs.get(turn_id)
+        if run is not None:
+            if run.thread_id != thread_id or run.log.since(seq) is None:
+                return None
+            self._stats["resumed"] += 1
+            return self.subscribe(run, seq, is_disconnected)
+
+        if self.store is None:
+            return None
+        snapshot = await self._store_call(self.store.read(turn_id, seq))
+        if snapshot is None or snapshot["thread_id"] != thread_id or snapshot["gap"]:
+            return None
+        self._stats["remote_resumed"] += 1
+        return self._subscribe_remote(turn_id, seq, is_disconnected)
+
+    async def _subscribe_remote(
+        self,
+        turn_id: str,
+        after_seq: int,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+    ) -> AsyncIterator[bytes]:
+        """
+        订阅在其他worker上运行的轮次：轮询Redis中的事件，并写入订阅心跳阻止其被取消
+        """
+        seq = after_seq
+        heartbeat_ttl = math.ceil(self.poll_interval * 3)
+        while True:
+            snapshot = await self._store_call(self.store.read(turn_id, seq))
+            if snapshot is None or snapshot["gap"]:
+                yield EVENTS_EXPIRED
+                return
+            for seq, frame in snapshot["frames"]:
+                yield frame
+            if snapshot["finished"]:
+                return
+
+            await self._store_call(self.store.touch(turn_id, heartbeat_ttl))
+            await asyncio.sleep(self.poll_interval)
+            if is_disconnected is not None and await is_disconnected():
+                return
+
+    def _attach(self, run: TurnRun) -> None:
+        run.subscribers += 1
+        self._cancel_grace(run)
+
+    def _detach(self, run: TurnRun) -> None:
+        run.subscribers -= 1
+        if run.subscribers == 0 and not run.finished:
+            self._schedule_grace(run)
+
+    def _schedule_grace(self, run: TurnRun) -> None:
+        self._cancel_grace(run)
+        run.grace_handle = asyncio.get_running_loop().call_later(
+            self.grace_seconds, self._on_grace_expired, run
+        )
+
+    def _cancel_grace(self, run: TurnRun) -> None:
+        if run.grace_handle is not None:
+            run.grace_handle.cancel()
+            run.grace_handle = None
+
+    def _on_grace_expired(self, run: TurnRun) -> None:
+        run.grace_handle = None
+        if run.subscribers or run.finished:
+            return
+        if self.store is None:
+            self._cancel_run(run)
+            return
+        task = asyncio.create_task(self._expire_if_detached(run))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _expire_if_detached(self, run: TurnRun) -> None:
+        attached = await self._store_call(self.store.attached(run.turn_id))
+        if run.subscribers or run.finished:
+            return
+        if attached:
+            # 客户端已在其他worker上重连
+            self._schedule_grace(run)
+        else:
+            self._cancel_run(run)
+
+    def _cancel_run(self, run: TurnRun) -> None:
+        print(f"对话 {run.thread_id} 的客户端已断开超过 {self.grace_seconds} 秒，取消本轮生成")
+        run.task.cancel()
+
+    async def close(self) -> None:
+        """
+        取消所有仍在运行的轮次
+        """
+        tasks = [run.task for run in self._runs.values() if not run.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        :return: 统计信息
+        """
+        running = [run for run in self._runs.values() if not run.finished]
+        return {
+            **self._stats,
+            "running": len(running),
+            "retained": len(self._runs) - len(running),
+            "subscribers": sum(run.subscribers for run in running),
+            "detached": sum(1 for run in running if run.subscribers == 0),
+            "store_enabled": self.store is not None,
+        }
+
+
+def create_turn_stream_hub() -> TurnStreamHub:
+    """
+    按配置创建可恢复流式响应管理器，启用TURN_STREAM_REDIS且Redis可用时同步写入Redis
+    :return: 管理器
+    """
+    store = None
+    if app_config.turn_stream_redis:
+        redis = get_redis_client()
+        if redis is None:
+            print("TURN_STREAM_REDIS已启用但Redis不可用，只使用进程内事件缓冲")
+        else:
+            store = RedisTurnStore(
+                redis,
+                max_events=app_config.turn_stream_max_events,
+                ttl=math.ceil(
+                    app_config.turn_stream_retention_seconds
+                    + app_config.turn_stream_grace_seconds
+                ),
+            )
+    return TurnStreamHub(
+        max_events=app_config.turn_stream_max_events,
+        grace_seconds=app_config.turn_stream_grace_seconds,
+        retention_seconds=app_config.turn_stream_retention_seconds,
+        poll_interval=app_config.sse_disconnect_poll_ms / 1000,
+        store=store,
+    )
+
+
+# 全局可恢复流式响应管理器
+turn_stream_hub = create_turn_stream_hub()
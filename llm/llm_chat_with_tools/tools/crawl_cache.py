@@ -0,0 +1,200 @@
+"""
+网页爬取缓存 - 按URL缓存清理后的网页标题和正文，过期后通过ETag/Last-Modified条件请求重新验证
+"""
+
+import asyncio
+import ipaddress
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from config import config as app_config
+from .http_client import http_client
+
+
+async def is_public_http_url(url: str) -> bool:
+    """
+    检查URL是否为http(s)且主机只解析到公网地址，条件请求不会发往内网、回环等地址
+    :param url: 网页URL
+    :return: 是否允许直接请求
+    """
+    try:
+        parsed = urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        return False
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parsed.hostname, port)
+    except OSError:
+        return False
+    addresses = {info[4][0] for info in infos}
+    return bool(addresses) and all(
+        ipaddress.ip_address(address.split("%", 1)[0]).is_global
+        for address in addresses
+    )
+
+
+@dataclass
+class CrawlCacheEntry:
+    """单个网页的缓存条目"""
+
+    url: str
+    title: str
+    content: str
+    link: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    expires_at: float = 0.0
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > time.monotonic()
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def to_crawl_item(self) -> Dict[str, Any]:
+        """
+        转换为爬取接口的单条结果格式，便于与上游结果合并
+        :return: {"crawlParameters": {...}, "results": {...}}
+        """
+        return {
+            "crawlParameters": {"url": self.url},
+            "results": {"title": self.title, "content": self.content, "link": self.link},
+        }
+
+
+class CrawlCache:
+    """
+    按URL的网页内容缓存
+
+    新鲜条目直接使用；过期条目如果带有ETag/Last-Modified，向源站发送条件请求，
+    返回304时续期，否则视为未命中重新爬取。爬取服务不支持条件请求，条件请求由本服务直接发出，
+    因此只发往解析到公网地址的http(s) URL且不跟随重定向，其余条目直接交给爬取服务重新爬取。
+    """
+
+    def __init__(self, ttl: float = 1800.0, max_entries: int = 256):
+        """
+        初始化爬取缓存
+        :param ttl: 条目过期时间（秒）
+        :param max_entries: 最大条目数
+        """
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, CrawlCacheEntry]" = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "revalidation_failures": 0,
+            "revalidation_refused": 0,
+            "evictions": 0,
+        }
+
+    def get(self, url: str) -> Optional[CrawlCacheEntry]:
+        """
+        读取缓存条目（可能已过期）
+        :param url: 网页URL
+        :return: 缓存条目，不存在时返回None
+        """
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def put(
+        self,
+        url: str,
+        title: str,
+        content: str,
+        link: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> CrawlCacheEntry:
+        """
+        写入缓存条目
+        :param url: 请求的网页URL
+        :param title: 网页标题
+        :param content: 清理后的正文
+        :param link: 最终网页链接
+        :param etag: 源站ETag
+        :param last_modified: 源站Last-Modified
+        :return: 缓存条目
+        """
+        entry = CrawlCacheEntry(
+            url=url,
+            title=title,
+            content=content,
+            link=link or url,
+            etag=etag,
+            last_modified=last_modified,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        self._entries[url] = entry
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+        return entry
+
+    async def revalidate(self, entry: CrawlCacheEntry) -> bool:
+        """
+        向源站发送条件请求验证过期条目
+        :param entry: 过期的缓存条目
+        :return: 内容未变化（304）时返回True并续期
+        """
+        if not await is_public_http_url(entry.link):
+            self._stats["revalidation_refused"] += 1
+            return False
+
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        try:
+            # 重定向可能指向内网地址，不跟随，按内容已变化处理
+            response = await http_client.request(
+                "HEAD", entry.link, headers=headers, follow_redirects=False
+            )
+        except Exception as e:
+            print(f"网页缓存验证失败 {entry.link}: {e}")
+            self._stats["revalidation_failures"] += 1
+            return False
+
+        if response.status_code != 304:
+            return False
+        entry.expires_at = time.monotonic() + self.ttl
+        entry.etag = response.headers.get("ETag", entry.etag)
+        entry.last_modified = response.headers.get("Last-Modified", entry.last_modified)
+        self._stats["revalidated"] += 1
+        return True
+
+    def record(self, hits: int, misses: int) -> None:
+        self._stats["hits"] += hits
+        self._stats["misses"] += misses
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+        :return: 统计信息
+        """
+        total = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": round(self._stats["hits"] / total, 4) if total else 0.0,
+        }
+
+
+# 全局爬取缓存实例
+crawl_cache = CrawlCache(
+    ttl=app_config.crawl_cache_ttl,
+    max_entries=app_config.crawl_cache_max_entries,
+)
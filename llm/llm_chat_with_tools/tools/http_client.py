@@ -0,0 +1,136 @@
+"""
+共享异步HTTP客户端 - 供搜索和网页爬取工具使用，支持连接池、keep-alive、超时和并发上限
+"""
+
+import asyncio
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config import config as app_config
+
+
+class AsyncHTTPClient:
+    """
+    共享异步HTTP客户端
+
+    内部的httpx.AsyncClient在首次使用时创建，复用连接池与keep-alive连接；
+    同时进行的请求数由信号量限制，慢请求只会阻塞发起它的对话。
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 20,
+        max_concurrency: int = 20,
+    ):
+        """
+        初始化HTTP客户端
+        :param connect_timeout: 连接超时时间（秒）
+        :param read_timeout: 读取超时时间（秒）
+        :param max_connections: 连接池最大连接数
+        :param max_keepalive_connections: 最大keep-alive连接数
+        :param max_concurrency: 同时进行的最大请求数
+        """
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=read_timeout,
+            pool=connect_timeout,
+        )
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.max_concurrency = max_concurrency
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stats = {"requests": 0, "errors": 0, "in_flight": 0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        read_timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        发送HTTP请求
+        :param method: 请求方法
+        :param url: 请求地址
+        :param read_timeout: 本次请求的读取超时时间（秒），为空时使用默认值
+        :param kwargs: 传给httpx的其他参数（headers、json等）
+        :return: 响应对象
+        """
+        client = self._get_client()
+        if read_timeout is not None:
+            kwargs["timeout"] = httpx.Timeout(
+                connect=self.timeout.connect,
+                read=read_timeout,
+                write=self.timeout.write,
+                pool=self.timeout.pool,
+            )
+        async with self._semaphore:
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+            try:
+                return await client.request(method, url, **kwargs)
+            except Exception:
+                self._stats["errors"] += 1
+                raise
+            finally:
+                self._stats["in_flight"] -= 1
+
+    async def post_json(
+        self,
+        url: str,
+        payload: Any,
+        headers: Optional[Dict[str, str]] = None,
+        read_timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        发送JSON POST请求并解析JSON响应
+        :param url: 请求地址
+        :param payload: 请求体
+        :param headers: 请求头
+        :param read_timeout: 本次请求的读取超时时间（秒）
+        :return: 解析后的响应数据
+        """
+        response = await self.request(
+            "POST", url, json=payload, headers=headers, read_timeout=read_timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def close(self) -> None:
+        """
+        关闭客户端，释放连接池
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取客户端统计信息
+        :return: 统计信息
+        """
+        return {**self._stats, "max_concurrency": self.max_concurrency}
+
+
+# 全局HTTP客户端实例
+http_client = AsyncHTTPClient(
+    connect_timeout=app_config.http_connect_timeout,
+    read_timeout=app_config.http_read_timeout,
+    max_connections=app_config.http_max_connections,
+    max_keepalive_connections=app_config.http_max_keepalive,
+    max_concurrency=app_config.http_max_concurrency,
+)
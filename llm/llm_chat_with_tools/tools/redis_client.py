@@ -0,0 +1,43 @@
+"""
+可选的Redis客户端 - 配置REDIS_URL且安装了redis包时启用
+"""
+
+from typing import Any, Optional
+
+from config import config as app_config
+
+_redis_client: Optional[Any] = None
+_redis_checked = False
+
+
+def get_redis_client() -> Optional[Any]:
+    """
+    获取共享的Redis异步客户端
+    :return: redis.asyncio客户端，未配置或未安装redis时返回None
+    """
+    global _redis_client, _redis_checked
+    if _redis_checked:
+        return _redis_client
+    _redis_checked = True
+
+    if not app_config.redis_url:
+        return None
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        print("未安装redis包，Redis缓存层已禁用")
+        return None
+
+    _redis_client = redis.from_url(app_config.redis_url)
+    return _redis_client
+
+
+async def close_redis_client() -> None:
+    """
+    关闭共享的Redis客户端
+    """
+    global _redis_client, _redis_checked
+    if _redis_client is not None:
+        await _redis_client.aclose()
+    _redis_client = None
+    _redis_checked = False
@@ -0,0 +1,252 @@
+"""
+工具结果处理缓存 - 按(工具名称, 处理模式, 处理选项, 原始结果)的内容哈希缓存LLM处理结果，
+进程内LRU + 可选SQLite持久化层
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import config as app_config
+from .single_flight import SingleFlight
+
+
+class SQLiteResultStore:
+    """
+    SQLite持久化层，进程重启后仍可复用已处理的结果
+
+    所有数据库操作在线程池中执行，避免阻塞事件循环；超过容量时按最近访问时间淘汰。
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        """
+        初始化SQLite存储
+        :param path: 数据库文件路径
+        :param max_entries: 最大条目数
+        """
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS result_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS result_cache_accessed_at ON result_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE result_cache SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+            return row[0]
+
+    def _put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, value, accessed_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            # 超出容量时删除最久未访问的条目
+            self._conn.execute(
+                """
+                DELETE FROM result_cache WHERE key IN (
+                    SELECT key FROM result_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self._put, key, value)
+
+    def count(self) -> int:
+        return self._count()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """
+    工具结果处理缓存
+
+    缓存键是工具名称、处理模式、处理选项和原始结果的SHA-256哈希，内容相同的结果只处理一次。
+    读取顺序为进程内LRU → SQLite（可选）→ 实际处理；相同键的并发请求只处理一次。
+    """
+
+    def __init__(self, max_entries: int = 1024, store: Optional[SQLiteResultStore] = None):
+        """
+        初始化结果缓存
+        :param max_entries: 进程内缓存的最大条目数
+        :param store: SQLite持久化层，为空时只使用进程内缓存
+        """
+        self.max_entries = max(1, max_entries)
+        self.store = store
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._stats = {
+            "local_hits": 0,
+            "store_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "store_errors": 0,
+        }
+
+    @staticmethod
+    def make_key(
+        tool_name: str, mode: str, options: Optional[Dict[str, Any]], result: str
+    ) -> str:
+        """
+        生成内容哈希缓存键
+        :param tool_name: 工具名称
+        :param mode: 处理模式
+        :param options: 处理选项
+        :param result: 原始工具结果
+        :return: 缓存键
+        """
+        raw = json.dumps(
+            [tool_name, mode, options or {}, result],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[str]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def _put_local(self, key: str, value: str) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def get_or_compute(
+        self,
+        tool_name: str,
+        mode: str,
+        options: Optional[Dict[str, Any]],
+        result: str,
+        compute: Callable[[], Awaitable[str]],
+    ) -> str:
+        """
+        读取缓存，未命中时调用compute处理结果并写入缓存
+        :param tool_name: 工具名称
+        :param mode: 处理模式
+        :param options: 处理选项
+        :param result: 原始工具结果
+        :param compute: 处理结果的协程函数
+        :return: 处理后的结果
+        """
+        key = self.make_key(tool_name, mode, options, result)
+
+        value = self._get_local(key)
+        if value is not None:
+            self._stats["local_hits"] += 1
+            return value
+
+        return await self._flight.do(key, lambda: self._load(key, compute))
+
+    async def _load(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        value = None
+        if self.store is not None:
+            try:
+                value = await self.store.get(key)
+            except Exception as e:
+                self._stats["store_errors"] += 1
+                print(f"读取结果缓存失败: {e}")
+
+        if value is not None:
+            self._stats["store_hits"] += 1
+        else:
+            self._stats["misses"] += 1
+            value = await compute()
+            if self.store is not None:
+                try:
+                    await self.store.put(key, value)
+                except Exception as e:
+                    self._stats["store_errors"] += 1
+                    print(f"写入结果缓存失败: {e}")
+        self._put_local(key, value)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+        :return: 统计信息
+        """
+        flight = self._flight.get_stats()
+        hits = self._stats["local_hits"] + self._stats["store_hits"]
+        total = hits + self._stats["misses"] + flight["coalesced"]
+        return {
+            **self._stats,
+            "coalesced": flight["coalesced"],
+            "cancelled": flight["cancelled"],
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "store_enabled": self.store is not None,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+
+def create_result_cache() -> ResultCache:
+    """
+    按配置创建结果缓存，配置了RESULT_CACHE_PATH时启用SQLite持久化层
+    :return: 结果缓存
+    """
+    store = None
+    if app_config.result_cache_path:
+        try:
+            store = SQLiteResultStore(
+                app_config.result_cache_path,
+                max_entries=app_config.result_cache_store_max_entries,
+            )
+        except sqlite3.Error as e:
+            print(f"打开结果缓存数据库失败，只使用进程内缓存: {e}")
+    return ResultCache(max_entries=app_config.result_cache_max_entries, store=store)
+
+
+# 全局结果缓存实例
+result_cache = create_result_cache()
@@ -2,14 +2,19 @@
 MCP工具结果处理器 - 对MCP工具输出进行智能处理和格式化
 """
 
+import asyncio
 import json
 import re
-from typing import Dict, Any, List, Optional, Union
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
 from enum import Enum
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 
+from config import config as app_config
+from .result_cache import ResultCache, result_cache
+
 
 class ProcessingMode(Enum):
     """结果处理模式"""
@@ -19,13 +24,62 @@ class ProcessingMode(Enum):
     FORMATTED = "formatted"  # 格式化输出
     FILTERED = "filtered"  # 内容过滤
     STRUCTURED = "structured"  # 结构化处理
+    AUTO = "auto"  # JSON/表格数据按规则格式化，其余使用LLM格式化
+
+
+@dataclass(frozen=True)
+class SizePolicy:
+    """
+    按结果大小（UTF-8字节数）选择处理方式
+
+    小于small_bytes：原样返回或按规则格式化，不调用LLM；
+    small_bytes到large_bytes之间：按处理模式使用LLM（AUTO模式下JSON数据仍按规则格式化）；
+    不小于large_bytes：JSON数据按规则格式化并限制表格行数，其余文本按chunk_bytes切块并发摘要后合并。
+    """
+
+    small_bytes: int = 512
+    large_bytes: int = 16000
+    chunk_bytes: int = 6000
+    max_chunks: int = 8
+
+    def tier(self, size: int) -> str:
+        if size < self.small_bytes:
+            return "small"
+        if size < self.large_bytes:
+            return "medium"
+        return "large"
+
+
+def get_size_policy(tool_name: str) -> SizePolicy:
+    """
+    获取工具的结果大小策略，RESULT_POLICY_OVERRIDES中按工具名称配置的阈值优先
+    :param tool_name: 工具名称
+    :return: 大小策略
+    """
+    overrides = app_config.result_policy_overrides.get(tool_name, {})
+    return SizePolicy(
+        small_bytes=int(overrides.get("small_bytes", app_config.result_small_bytes)),
+        large_bytes=int(overrides.get("large_bytes", app_config.result_large_bytes)),
+        chunk_bytes=int(overrides.get("chunk_bytes", app_config.result_chunk_bytes)),
+        max_chunks=int(overrides.get("max_chunks", app_config.result_max_chunks)),
+    )
+
+
+# 需要LLM参与、受大小策略约束的处理模式
+SIZE_AWARE_MODES = (ProcessingMode.AUTO, ProcessingMode.FORMATTED, ProcessingMode.SUMMARY)
 
 
 class MCPResultProcessor:
     """MCP工具结果处理器"""
 
-    def __init__(self):
-        """初始化结果处理器"""
+    def __init__(self, cache: Optional[ResultCache] = None):
+        """
+        初始化结果处理器
+
+        Args:
+            cache: LLM处理结果缓存，默认使用全局结果缓存
+        """
+        self.cache = cache or result_cache
         self.llm = ChatOpenAI(
             model="qwen-turbo",
             temperature=0.3,
@@ -108,41 +162,155 @@ class MCPResultProcessor:
                 return self._filter_result(result, options)
             elif mode == ProcessingMode.STRUCTURED:
                 return self._structure_result(result, options)
+            elif mode == ProcessingMode.AUTO:
+                formatted = self._format_rule_based(tool_name, result, options)
+                if formatted is not None:
+                    return formatted
+                return await self._format_result(tool_name, result, options)
             else:
                 return result
         except Exception as e:
             print(f"结果处理出错: {e}")
             return f"⚠️ 结果处理出错，返回原始结果：\n{result}"
 
+    async def process_results(
+        self,
+        results: Sequence[Tuple[str, str]],
+        mode: ProcessingMode = ProcessingMode.FORMATTED,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> List[str]:
+        """
+        按大小策略并发处理同一轮的多个工具结果
+
+        Args:
+            results: (工具名称, 工具结果) 列表
+            mode: 处理模式
+            options: 处理选项
+
+        Returns:
+            与输入顺序一致的处理结果列表
+        """
+        return list(
+            await asyncio.gather(
+                *[
+                    self.process_sized_result(tool_name, result, mode, options)
+                    for tool_name, result in results
+                ]
+            )
+        )
+
+    async def process_sized_result(
+        self,
+        tool_name: str,
+        result: str,
+        mode: ProcessingMode = ProcessingMode.FORMATTED,
+        options: Optional[Dict[str, Any]] = None,
+        policy: Optional[SizePolicy] = None,
+    ) -> str:
+        """
+        按结果大小选择处理方式：小结果不调用LLM，中等结果按处理模式处理，
+        超大结果中的JSON数据按规则格式化，非结构化文本切块摘要
+
+        Args:
+            tool_name: 工具名称
+            result: 工具执行结果
+            mode: 处理模式
+            options: 处理选项
+            policy: 大小策略，为空时按工具名称读取配置
+
+        Returns:
+            处理后的结果字符串
+        """
+        if mode not in SIZE_AWARE_MODES:
+            return await self.process_result(tool_name, result, mode, options)
+
+        options = options or {}
+        policy = policy or get_size_policy(tool_name)
+        tier = policy.tier(len(result.encode("utf-8")))
+
+        if tier == "small":
+            formatted = self._format_rule_based(tool_name, result, options)
+            return formatted if formatted is not None else result
+        if tier == "medium":
+            return await self.process_result(tool_name, result, mode, options)
+
+        # 结构化数据切块摘要会丢失内容且每块都要调用LLM，按规则格式化并限制行数即可
+        formatted = self._format_rule_based(tool_name, result, options)
+        if formatted is not None:
+            return formatted
+        try:
+            return await self._chunk_and_summarize(tool_name, result, policy, options)
+        except Exception as e:
+            print(f"结果处理出错: {e}")
+            return f"⚠️ 结果处理出错，返回原始结果：\n{result}"
+
+    async def _chunk_and_summarize(
+        self,
+        tool_name: str,
+        result: str,
+        policy: SizePolicy,
+        options: Dict[str, Any],
+    ) -> str:
+        """超大结果切块后并发摘要，按原顺序合并"""
+        chunks = split_into_chunks(result, policy.chunk_bytes)
+        dropped = max(0, len(chunks) - policy.max_chunks)
+        chunks = chunks[: policy.max_chunks]
+
+        async def summarize_chunk(chunk: str) -> str:
+            async def summarize() -> str:
+                chain = self.summary_prompt | self.llm | StrOutputParser()
+                print("_summarize_chunk")
+                return await chain.ainvoke({"tool_name": tool_name, "result": chunk})
+
+            return await self.cache.get_or_compute(
+                tool_name, "summary_chunk", {}, chunk, summarize
+            )
+
+        summaries = await asyncio.gather(*[summarize_chunk(chunk) for chunk in chunks])
+
+        lines = [f"📊 **{tool_name} 结果摘要**（原始结果较大，分 {len(chunks)} 部分摘要）\n"]
+        for i, summary in enumerate(summaries, 1):
+            lines.append(f"### 第 {i}/{len(chunks)} 部分\n\n{summary}\n")
+        if dropped:
+            lines.append(f"... (还有 {dropped} 部分内容超出处理上限，已省略)")
+        return "\n".join(lines)
+
     async def _summarize_result(
         self, tool_name: str, result: str, options: Dict[str, Any]
     ) -> str:
-        """生成结果摘要"""
+        """生成结果摘要，相同内容只调用一次LLM"""
         max_length = options.get("max_length", 500)
 
-        chain = self.summary_prompt | self.llm | StrOutputParser()
+        async def summarize() -> str:
+            chain = self.summary_prompt | self.llm | StrOutputParser()
 
-        print("_summarize_result")
-        summary = await chain.ainvoke({"tool_name": tool_name, "result": result})
+            print("_summarize_result")
+            summary = await chain.ainvoke({"tool_name": tool_name, "result": result})
 
-        # 长度控制
-        if len(summary) > max_length:
-            summary = summary[: max_length - 3] + "..."
+            # 长度控制
+            if len(summary) > max_length:
+                summary = summary[: max_length - 3] + "..."
 
-        return f"📊 **{tool_name} 结果摘要**\n\n{summary}"
+            return f"📊 **{tool_name} 结果摘要**\n\n{summary}"
+
+        return await self.cache.get_or_compute(
+            tool_name, ProcessingMode.SUMMARY.value, options, result, summarize
+        )
 
     async def _format_result(
         self, tool_name: str, result: str, options: Dict[str, Any]
     ) -> str:
-        """格式化结果输出"""
-        chain = self.format_prompt | self.llm | StrOutputParser()
+        """格式化结果输出，相同内容只调用一次LLM"""
 
-        print("_format_result")
-        formatted_result = await chain.ainvoke(
-            {"tool_name": tool_name, "result": result}
-        )
+        async def format_with_llm() -> str:
+            chain = self.format_prompt | self.llm | StrOutputParser()
+
+            print("_format_result")
+            return await chain.ainvoke({"tool_name": tool_name, "result": result})
 
-        return formatted_result
+        return await self.cache.get_or_compute(
+            tool_name, ProcessingMode.FORMATTED.value, options, result, format_with_llm
+        )
 
     def _filter_result(self, result: str, options: Dict[str, Any]) -> str:
         """过滤结果内容"""
@@ -207,6 +375,89 @@ class MCPResultProcessor:
         except json.JSONDecodeError:
             return self._structure_text(result, options)
 
+    def _format_rule_based(
+        self, tool_name: str, result: str, options: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        不调用LLM的确定性格式化，只处理JSON数据
+
+        记录列表（字典列表）渲染为Markdown表格，其余JSON结构使用_format_json_data。
+        结果不是JSON时返回None，由调用方决定是否使用LLM格式化。
+        """
+        stripped = result.strip()
+        if not stripped.startswith(("{", "[")):
+            return None
+        try:
+            data = json.loads(stripped)
+        except json.JSONDecodeError:
+            return None
+
+        max_rows = options.get("max_rows", 50)
+        title = f"📋 **{tool_name} 查询结果**\n"
+
+        records = self._as_records(data)
+        if records is not None:
+            return "\n".join([title, self._format_table(records, max_rows)])
+
+        if isinstance(data, dict):
+            lines = [title]
+            nested = {}
+            for key, value in data.items():
+                value_records = self._as_records(value)
+                if value_records is not None:
+                    separator = "\n" if len(lines) > 1 else ""
+                    lines.append(f"{separator}**{key}:** ({len(value_records)} 条)\n")
+                    lines.append(self._format_table(value_records, max_rows))
+                elif isinstance(value, (dict, list)):
+                    nested[key] = value
+                else:
+                    lines.append(f"**{key}:** {value}")
+            if nested:
+                # 其余嵌套结构沿用结构化展示，去掉重复的标题行
+                lines.append(self._format_json_data(nested, options).split("\n", 1)[1])
+            return "\n".join(lines)
+
+        return self._format_json_data(data, options)
+
+    @staticmethod
+    def _as_records(data: Any) -> Optional[List[Dict[str, Any]]]:
+        """
+        判断数据是否为表格型记录列表：非空列表，每项都是只含标量值的字典
+        """
+        if not isinstance(data, list) or not data:
+            return None
+        if not all(isinstance(item, dict) for item in data):
+            return None
+        if any(isinstance(v, (dict, list)) for item in data for v in item.values()):
+            return None
+        return data
+
+    @staticmethod
+    def _format_table(records: List[Dict[str, Any]], max_rows: int = 50) -> str:
+        """将记录列表渲染为Markdown表格"""
+        columns: List[str] = []
+        for record in records:
+            for key in record:
+                if key not in columns:
+                    columns.append(key)
+
+        def cell(value: Any) -> str:
+            if value is None:
+                return "-"
+            return str(value).replace("|", "\\|").replace("\n", " ")
+
+        lines = [
+            "| " + " | ".join(columns) + " |",
+            "| " + " | ".join("---" for _ in columns) + " |",
+        ]
+        for record in records[:max_rows]:
+            lines.append(
+                "| " + " | ".join(cell(record.get(col)) for col in columns) + " |"
+            )
+        if len(records) > max_rows:
+            lines.append(f"\n... (还有 {len(records) - max_rows} 行)")
+        return "\n".join(lines)
+
     def _format_json_data(self, data: Any, options: Dict[str, Any]) -> str:
         """格式化JSON数据"""
         formatted_lines = ["📋 **结构化数据**\n"]
@@ -271,6 +522,49 @@ class MCPResultProcessor:
         return "\n".join(structured_lines)
 
 
+def split_into_chunks(text: str, chunk_bytes: int) -> List[str]:
+    """
+    按行切分文本，每块不超过chunk_bytes字节（UTF-8），超长的单行按字符切分
+    :param text: 原始文本
+    :param chunk_bytes: 每块的最大字节数
+    :return: 文本块列表
+    """
+    chunk_bytes = max(1, chunk_bytes)
+    chunks: List[str] = []
+    current: List[str] = []
+    current_size = 0
+
+    def flush():
+        nonlocal current, current_size
+        if current:
+            chunks.append("".join(current))
+        current = []
+        current_size = 0
+
+    for line in text.splitlines(keepends=True):
+        line_size = len(line.encode("utf-8"))
+        if line_size > chunk_bytes:
+            flush()
+            piece: List[str] = []
+            piece_size = 0
+            for char in line:
+                char_size = len(char.encode("utf-8"))
+                if piece_size + char_size > chunk_bytes:
+                    chunks.append("".join(piece))
+                    piece, piece_size = [], 0
+                piece.append(char)
+                piece_size += char_size
+            if piece:
+                chunks.append("".join(piece))
+            continue
+        if current_size + line_size > chunk_bytes:
+            flush()
+        current.append(line)
+        current_size += line_size
+    flush()
+    return chunks
+
+
 # 全局处理器实例
 result_processor = MCPResultProcessor()
 
@@ -284,7 +578,7 @@ async def process_mcp_result(
     Args:
         tool_name: 工具名称
         result: 工具结果
-        mode: 处理模式 (raw/summary/formatted/filtered/structured)
+        mode: 处理模式 (raw/summary/formatted/filtered/structured/auto)
         **options: 处理选项
 
     Returns:
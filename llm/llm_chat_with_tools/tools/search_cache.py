@@ -0,0 +1,198 @@
+"""
+搜索结果缓存 - 进程内LRU + 可选Redis二级缓存，支持TTL、查询归一化和并发请求合并
+"""
+
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config import config as app_config
+from .redis_client import get_redis_client
+from .single_flight import SingleFlight
+
+
+def normalize_query(query: str) -> str:
+    """
+    归一化搜索查询：全角转半角、统一大小写并合并空白字符
+    :param query: 原始查询
+    :return: 归一化后的查询
+    """
+    query = unicodedata.normalize("NFKC", query or "")
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class SearchCache:
+    """
+    搜索结果缓存
+
+    缓存键由归一化查询、search_service和max_results组成，每个条目带独立的过期时间。
+    读取顺序为进程内LRU → Redis（可选）→ 上游请求；相同的并发查询只会发起一次上游请求。
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        max_entries: int = 512,
+        redis: Optional[Any] = None,
+        key_prefix: str = "search_cache:raw:",
+    ):
+        """
+        初始化搜索缓存
+        :param ttl: 默认过期时间（秒）
+        :param max_entries: 进程内缓存的最大条目数
+        :param redis: Redis异步客户端（需支持get/set），为空时只使用进程内缓存
+        :param key_prefix: Redis键前缀
+        """
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.redis = redis
+        self.key_prefix = key_prefix
+        # 缓存键 -> (过期时间, 缓存值)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "uncacheable": 0,
+            "redis_errors": 0,
+        }
+
+    @staticmethod
+    def make_key(query: str, search_service: str, max_results: int) -> str:
+        """
+        生成缓存键
+        :param query: 搜索查询
+        :param search_service: 搜索服务名称
+        :param max_results: 最大结果数
+        :return: 缓存键
+        """
+        raw = json.dumps(
+            [normalize_query(query), search_service, max_results], ensure_ascii=False
+        )
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put_local(self, key: str, value: str, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def _get_redis(self, key: str) -> Optional[str]:
+        if self.redis is None:
+            return None
+        try:
+            value = await self.redis.get(self.key_prefix + key)
+        except Exception as e:
+            self._stats["redis_errors"] += 1
+            print(f"读取Redis搜索缓存失败: {e}")
+            return None
+        if value is None:
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    async def _put_redis(self, key: str, value: str, ttl: float) -> None:
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self.key_prefix + key, value, ex=max(1, int(ttl)))
+        except Exception as e:
+            self._stats["redis_errors"] += 1
+            print(f"写入Redis搜索缓存失败: {e}")
+
+    async def get_or_fetch(
+        self,
+        query: str,
+        search_service: str,
+        max_results: int,
+        fetch: Callable[[], Awaitable[str]],
+        ttl: Optional[float] = None,
+        cacheable: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        读取缓存，未命中时调用fetch获取结果并写入缓存
+        :param query: 搜索查询
+        :param search_service: 搜索服务名称
+        :param max_results: 最大结果数
+        :param fetch: 获取结果的协程函数
+        :param ttl: 本条目的过期时间（秒），为空时使用默认值
+        :param cacheable: 判断结果能否写入缓存，返回False的结果（例如失败响应）只返回给本次的等待者
+        :return: 搜索结果
+        """
+        ttl = self.ttl if ttl is None else ttl
+        key = self.make_key(query, search_service, max_results)
+
+        value = self._get_local(key)
+        if value is not None:
+            self._stats["local_hits"] += 1
+            return value
+
+        return await self._flight.do(
+            key, lambda: self._load(key, fetch, ttl, cacheable)
+        )
+
+    async def _load(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[str]],
+        ttl: float,
+        cacheable: Optional[Callable[[str], bool]],
+    ) -> str:
+        value = await self._get_redis(key)
+        if value is not None:
+            self._stats["redis_hits"] += 1
+        else:
+            self._stats["misses"] += 1
+            value = await fetch()
+            if cacheable is not None and not cacheable(value):
+                self._stats["uncacheable"] += 1
+                return value
+            await self._put_redis(key, value, ttl)
+        self._put_local(key, value, ttl)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+        :return: 统计信息
+        """
+        flight = self._flight.get_stats()
+        hits = self._stats["local_hits"] + self._stats["redis_hits"]
+        total = hits + self._stats["misses"] + flight["coalesced"]
+        return {
+            **self._stats,
+            "coalesced": flight["coalesced"],
+            "cancelled": flight["cancelled"],
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "redis_enabled": self.redis is not None,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+
+# 全局搜索缓存实例
+search_cache = SearchCache(
+    ttl=app_config.search_cache_ttl,
+    max_entries=app_config.search_cache_max_entries,
+    redis=get_redis_client(),
+)
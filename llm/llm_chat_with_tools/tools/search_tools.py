@@ -1,7 +1,9 @@
+import asyncio
 import json
-from typing import List
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
-import requests
 from langchain.tools import tool
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
@@ -10,6 +12,9 @@ from langchain_openai import ChatOpenAI
 import os
 from fastmcp import Client
 from .result_processor import process_mcp_result
+from .http_client import http_client
+from .search_cache import search_cache
+from .crawl_cache import crawl_cache
 
 import sys
 from pathlib import Path
@@ -19,6 +24,9 @@ from config import config as app_config
 
 client = Client(app_config.mcp_server_url)
 
+SEARCH_SERVICE = "google"
+SEARCH_MAX_RESULTS = 10
+
 
 @tool
 async def search_tool(query: str, config: RunnableConfig = None) -> str:
@@ -51,18 +59,31 @@ async def search_tool(query: str, config: RunnableConfig = None) -> str:
     # writer(f"web search: {query}")
     print(f"query: {query}")
     # await label_extra(query)
-    response = requests.post(
-        url=app_config.search_api_url,
-        headers={
-            "Authorization": f"Bearer {app_config.search_api_key}",
-        },
-        json={"query": query, "search_service": "google", "max_results": 10},
-    )
-    response.raise_for_status()
-    response = response.json()
 
-    # 格式化搜索结果
-    formatted_result = format_search_results(response, query)
+    async def fetch_search_results() -> str:
+        response = await http_client.post_json(
+            app_config.search_api_url,
+            {
+                "query": query,
+                "search_service": SEARCH_SERVICE,
+                "max_results": SEARCH_MAX_RESULTS,
+            },
+            headers={
+                "Authorization": f"Bearer {app_config.search_api_key}",
+            },
+        )
+        return json.dumps(response, ensure_ascii=False)
+
+    # 缓存原始响应，按本次的查询文本格式化；相同查询在TTL内直接复用，
+    # 并发的相同查询只请求一次上游，失败或没有结果的响应不写入缓存
+    raw_response = await search_cache.get_or_fetch(
+        query,
+        SEARCH_SERVICE,
+        SEARCH_MAX_RESULTS,
+        fetch_search_results,
+        cacheable=has_search_results,
+    )
+    formatted_result = format_search_results(json.loads(raw_response), query)
 
     print(f"\n网页搜索内容：\n{formatted_result}")
     # writer(f"web search result: {formatted_result}")
@@ -222,6 +243,19 @@ async def summary_crawled_content(content: str) -> str:
         return content
 
 
+def has_search_results(raw_response: str) -> bool:
+    """
+    判断搜索API的原始响应是否包含结果，只有包含结果的响应才写入缓存
+    :param raw_response: JSON格式的原始响应
+    :return: 是否包含结果
+    """
+    try:
+        response = json.loads(raw_response)
+    except ValueError:
+        return False
+    return isinstance(response, dict) and bool(response.get("results"))
+
+
 def format_search_results(response, query: str) -> str:
     """
     格式化搜索结果，提供结构化和易读的输出
@@ -322,16 +356,7 @@ async def web_crawler(links: List[str], config: RunnableConfig = None) -> str:
 
     注意：建议一次抓取不超过5个链接，确保响应速度和内容质量
     """
-    crawl_request = [{"url": link} for link in links]
-    response = requests.post(
-        url=app_config.crawl_api_url,
-        headers={
-            "Authorization": f"Bearer {app_config.search_api_key}",
-        },
-        json=crawl_request,
-    )
-    response.raise_for_status()
-    response = response.json()
+    response = await crawl_links(links)
     print(f"\n网页爬取原始内容:\n{response}")
 
     # 处理和格式化网页内容
@@ -356,6 +381,181 @@ async def web_crawler(links: List[str], config: RunnableConfig = None) -> str:
         return formatted_content
 
 
+def _page_validators(page_data: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """从爬取结果中读取源站缓存验证信息（爬取服务返回时才有）"""
+    headers = page_data.get("headers") or {}
+    return {
+        "etag": page_data.get("etag") or headers.get("etag") or headers.get("ETag"),
+        "last_modified": page_data.get("last_modified")
+        or page_data.get("lastModified")
+        or headers.get("last-modified")
+        or headers.get("Last-Modified"),
+    }
+
+
+def _parse_crawl_response(
+    response: Any, urls: List[str]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    解析爬取接口响应
+    :param response: 爬取接口返回的数据
+    :param urls: 本次请求的URL列表，用于补全响应中缺失的URL
+    :return: URL -> 网页数据
+    """
+    items = response if isinstance(response, list) else [response]
+    pages: Dict[str, Dict[str, Any]] = {}
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        page_data = item.get("results", item)
+        url = item.get("crawlParameters", {}).get("url") or (
+            urls[i] if i < len(urls) else page_data.get("link")
+        )
+        if url:
+            pages[url] = page_data
+    return pages
+
+
+async def _post_crawl(urls: List[str]) -> Any:
+    return await http_client.post_json(
+        app_config.crawl_api_url,
+        [{"url": url} for url in urls],
+        headers={
+            "Authorization": f"Bearer {app_config.search_api_key}",
+        },
+        read_timeout=app_config.crawl_read_timeout,
+    )
+
+
+async def _crawl_batch(urls: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    批量模式：一次请求爬取所有URL，等待全部页面返回
+    :param urls: 网页URL列表
+    :return: URL -> 网页数据
+    """
+    return _parse_crawl_response(await _post_crawl(urls), urls)
+
+
+# 并发爬取的全局并发上限与按域名的并发上限，信号量在首次使用时创建
+_crawl_semaphore: Optional[asyncio.Semaphore] = None
+_host_semaphores: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def _get_crawl_semaphores(url: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+    global _crawl_semaphore
+    if _crawl_semaphore is None:
+        _crawl_semaphore = asyncio.Semaphore(app_config.crawl_max_concurrency)
+    host = urlparse(url).netloc.lower()
+    host_semaphore = _host_semaphores.get(host)
+    if host_semaphore is None:
+        host_semaphore = asyncio.Semaphore(app_config.crawl_per_host_limit)
+        _host_semaphores[host] = host_semaphore
+    return _crawl_semaphore, host_semaphore
+
+
+async def _crawl_one(url: str) -> Dict[str, Any]:
+    global_semaphore, host_semaphore = _get_crawl_semaphores(url)
+    async with global_semaphore, host_semaphore:
+        response = await asyncio.wait_for(
+            _post_crawl([url]), timeout=app_config.crawl_url_timeout
+        )
+    return _parse_crawl_response(response, [url]).get(url, {})
+
+
+def _failed_page(url: str, error: str) -> Dict[str, Any]:
+    return {"title": "", "content": "", "link": url, "error": error}
+
+
+async def _crawl_fanout(urls: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    并发模式：每个URL单独请求，受全局和按域名的并发上限约束
+
+    每个URL有独立的超时时间，整体在时间预算内返回已完成的页面，
+    未完成的页面标记为超时，不会拖慢其他页面的结果。
+    :param urls: 网页URL列表
+    :return: URL -> 网页数据
+    """
+    tasks = {url: asyncio.create_task(_crawl_one(url)) for url in urls}
+    try:
+        _, pending = await asyncio.wait(
+            tasks.values(), timeout=app_config.crawl_time_budget
+        )
+    except asyncio.CancelledError:
+        # 对话被取消时不再等待剩余页面
+        for task in tasks.values():
+            task.cancel()
+        raise
+    for task in pending:
+        task.cancel()
+
+    pages: Dict[str, Dict[str, Any]] = {}
+    for url, task in tasks.items():
+        if task in pending:
+            pages[url] = _failed_page(url, "timeout")
+        elif task.exception() is not None:
+            error = task.exception()
+            if isinstance(error, asyncio.TimeoutError):
+                pages[url] = _failed_page(url, "timeout")
+            else:
+                message = (str(error) or type(error).__name__).splitlines()[0]
+                print(f"网页爬取失败 {url}: {message}")
+                pages[url] = _failed_page(url, message)
+        else:
+            pages[url] = task.result() or _failed_page(url, "empty")
+    return pages
+
+
+async def crawl_links(links: List[str]) -> List[Dict[str, Any]]:
+    """
+    爬取网页，优先使用按URL缓存的内容，只把未命中的URL发送给爬取接口
+    :param links: 网页URL列表
+    :return: 与爬取接口相同格式的结果列表，顺序与links一致
+    """
+    links = list(dict.fromkeys(links))
+    pages: Dict[str, Dict[str, Any]] = {}
+    stale = []
+    misses = []
+    for link in links:
+        entry = crawl_cache.get(link)
+        if entry is not None and entry.fresh:
+            pages[link] = entry.to_crawl_item()
+        elif entry is not None and entry.revalidatable:
+            stale.append(entry)
+        else:
+            misses.append(link)
+
+    # 过期条目通过条件请求验证，未变化的直接续期使用
+    if stale:
+        results = await asyncio.gather(*[crawl_cache.revalidate(e) for e in stale])
+        for entry, still_valid in zip(stale, results):
+            if still_valid:
+                pages[entry.url] = entry.to_crawl_item()
+            else:
+                misses.append(entry.url)
+    crawl_cache.record(hits=len(links) - len(misses), misses=len(misses))
+
+    if misses:
+        if app_config.crawl_mode == "fanout":
+            fetched = await _crawl_fanout(misses)
+        else:
+            fetched = await _crawl_batch(misses)
+        for url, page_data in fetched.items():
+            pages[url] = {"crawlParameters": {"url": url}, "results": page_data}
+            content = (page_data.get("content") or "").strip()
+            if content and not page_data.get("error"):
+                crawl_cache.put(
+                    url,
+                    title=(page_data.get("title") or "").strip(),
+                    content=clean_content(content),
+                    link=page_data.get("link") or url,
+                    **_page_validators(page_data),
+                )
+
+    return [pages[link] for link in links if link in pages]
+
+
 def format_crawled_content(raw_response) -> str:
     """
     格式化爬取的网页内容，提取关键信息并结构化展示
@@ -399,7 +599,12 @@ def format_crawled_content(raw_response) -> str:
             title = extract_title_from_url(url)
 
         # 处理内容
-        if content:
+        error = page_data.get("error")
+        if error == "timeout":
+            content_summary = "⏱️ 抓取超时，未能在时间预算内获取内容"
+        elif error:
+            content_summary = f"❌ 抓取失败: {error}"
+        elif content:
             # 清理和截取内容
             cleaned_content = clean_content(content)
             # 提取关键段落
@@ -0,0 +1,62 @@
+"""
+并发请求合并 - 相同键的并发调用共享一次执行，供各类缓存在未命中时使用
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    相同键的并发调用只执行一次
+
+    实际执行在独立任务中进行，某个调用方被取消时其他等待者仍能拿到结果；
+    所有等待者都已取消（例如客户端断开）时，执行任务也随之取消。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats = {"coalesced": 0, "cancelled": 0}
+
+    async def do(self, key: str, load: Callable[[], Awaitable[T]]) -> T:
+        """
+        执行load，相同键已有执行中的任务时等待其结果
+        :param key: 合并键
+        :param load: 实际执行的协程函数
+        :return: 执行结果
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats["coalesced"] += 1
+        else:
+            task = asyncio.create_task(load())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        return await self._wait(key, task)
+
+    async def _wait(self, key: str, task: asyncio.Task) -> Any:
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[key] == 1 and not task.done():
+                task.cancel()
+                self._stats["cancelled"] += 1
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 读取异常，避免所有等待者都已取消时出现未处理异常的警告
+            task.exception()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self._stats, "inflight": len(self._inflight)}
@@ -0,0 +1,155 @@
+"""
+并发工具执行器 - 同一轮模型输出的多个工具调用并发执行，带并发上限和单工具超时
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+
+from config import config as app_config
+
+TOOL_CALL_ERROR_TEMPLATE = "Error: {error}\n Please fix your mistakes."
+
+
+class ConcurrentToolExecutor:
+    """
+    并发工具执行节点
+
+    读取最后一条AIMessage中的全部工具调用并发执行，同时执行的数量受并发上限约束，
+    每个调用有独立的超时时间。结果按原调用顺序返回为ToolMessage，
+    并在response_metadata["tool_timing"]中记录耗时信息。
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        max_concurrency: int = 4,
+        timeout: float = 60.0,
+        timeout_overrides: Optional[Dict[str, float]] = None,
+    ):
+        """
+        初始化工具执行器
+        :param tools: 可调用的工具列表
+        :param max_concurrency: 每轮同时执行的最大工具数
+        :param timeout: 默认的单个工具超时时间（秒）
+        :param timeout_overrides: 按工具名称覆盖的超时时间（秒）
+        """
+        self.tools_by_name: Dict[str, BaseTool] = {tool.name: tool for tool in tools}
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.timeout_overrides = timeout_overrides or {}
+
+    def get_timeout(self, tool_name: str) -> float:
+        return float(self.timeout_overrides.get(tool_name, self.timeout))
+
+    async def __call__(self, state: Dict[str, Any], config: RunnableConfig):
+        """
+        工具节点入口
+        :param state: langgraph状态
+        :param config: 运行配置，会传递给工具
+        :return: 新langgraph状态，包含按调用顺序排列的ToolMessage
+        """
+        messages = state["messages"]
+        last_message = messages[-1] if messages else None
+        if not isinstance(last_message, AIMessage) or not last_message.tool_calls:
+            return {"messages": []}
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(
+            *[
+                self._run_tool_call(tool_call, config, semaphore)
+                for tool_call in last_message.tool_calls
+            ]
+        )
+        return {"messages": list(results)}
+
+    async def _run_tool_call(
+        self,
+        tool_call: Dict[str, Any],
+        config: RunnableConfig,
+        semaphore: asyncio.Semaphore,
+    ) -> ToolMessage:
+        """
+        执行单个工具调用，异常和超时都转换为错误ToolMessage
+        :param tool_call: 工具调用
+        :param config: 运行配置
+        :param semaphore: 本轮共享的并发信号量
+        :return: 工具结果消息
+        """
+        tool_name = tool_call["name"]
+        tool_call_id = tool_call["id"]
+        timeout = self.get_timeout(tool_name)
+        queued_at = time.perf_counter()
+        timed_out = False
+
+        async with semaphore:
+            started_at = time.perf_counter()
+            tool = self.tools_by_name.get(tool_name)
+            if tool is None:
+                message = ToolMessage(
+                    content=f"Error: {tool_name} is not a valid tool, try one of "
+                    f"[{', '.join(self.tools_by_name)}].",
+                    name=tool_name,
+                    tool_call_id=tool_call_id,
+                    status="error",
+                )
+            else:
+                try:
+                    result = await asyncio.wait_for(
+                        tool.ainvoke({**tool_call, "type": "tool_call"}, config),
+                        timeout=timeout,
+                    )
+                    message = self._to_tool_message(result, tool_name, tool_call_id)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    print(f"工具 {tool_name} 执行超时（{timeout}秒）")
+                    message = ToolMessage(
+                        content=f"⏱️ 工具 {tool_name} 执行超时（{timeout}秒），请稍后重试或换一种方式",
+                        name=tool_name,
+                        tool_call_id=tool_call_id,
+                        status="error",
+                    )
+                except Exception as e:
+                    print(f"工具 {tool_name} 执行出错: {e}")
+                    message = ToolMessage(
+                        content=TOOL_CALL_ERROR_TEMPLATE.format(error=repr(e)),
+                        name=tool_name,
+                        tool_call_id=tool_call_id,
+                        status="error",
+                    )
+
+        finished_at = time.perf_counter()
+        message.response_metadata["tool_timing"] = {
+            "queued_ms": round((started_at - queued_at) * 1000, 2),
+            "duration_ms": round((finished_at - started_at) * 1000, 2),
+            "timeout_s": timeout,
+            "timed_out": timed_out,
+        }
+        return message
+
+    @staticmethod
+    def _to_tool_message(result: Any, tool_name: str, tool_call_id: str) -> ToolMessage:
+        if isinstance(result, ToolMessage):
+            if not result.name:
+                result.name = tool_name
+            return result
+        content = result if isinstance(result, (str, list)) else str(result)
+        return ToolMessage(content=content, name=tool_name, tool_call_id=tool_call_id)
+
+
+def create_tool_executor(tools: List[BaseTool]) -> ConcurrentToolExecutor:
+    """
+    按配置创建并发工具执行器
+    :param tools: 工具列表
+    :return: 工具执行器
+    """
+    return ConcurrentToolExecutor(
+        tools,
+        max_concurrency=app_config.tool_max_concurrency,
+        timeout=app_config.tool_timeout,
+        timeout_overrides=app_config.tool_timeout_overrides,
+    )
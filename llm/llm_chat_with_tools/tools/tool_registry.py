@@ -0,0 +1,159 @@
+"""
+MCP工具注册表 - 缓存MCP工具发现结果，按TTL在后台刷新
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+
+from config import config as app_config
+
+
+@dataclass(frozen=True)
+class ToolSnapshot:
+    """MCP工具快照，创建后不可修改"""
+
+    tools: Tuple[BaseTool, ...] = ()
+    version: int = 0
+    loaded_at: float = field(default=0.0)
+
+
+class MCPToolRegistry:
+    """
+    MCP工具注册表
+
+    启动时发现一次MCP工具，之后在后台按TTL刷新。对话请求只读取当前快照，
+    不会等待MCP服务响应；工具集合发生变化时快照版本号递增。
+    """
+
+    def __init__(
+        self,
+        client: MultiServerMCPClient,
+        ttl: float = 300.0,
+        discovery_timeout: float = 10.0,
+        retry_interval: float = 30.0,
+    ):
+        """
+        初始化工具注册表
+        :param client: MCP客户端
+        :param ttl: 工具列表刷新间隔（秒）
+        :param discovery_timeout: 单次工具发现的超时时间（秒）
+        :param retry_interval: 发现失败后的重试间隔（秒）
+        """
+        self.client = client
+        self.ttl = ttl
+        self.discovery_timeout = discovery_timeout
+        self.retry_interval = retry_interval
+        self._snapshot = ToolSnapshot()
+        self._signature: Tuple[Tuple[str, str], ...] = ()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+        self._stats = {"refreshes": 0, "failures": 0, "last_error": None}
+
+    def snapshot(self) -> ToolSnapshot:
+        """
+        获取当前工具快照
+        :return: 不可变的工具快照
+        """
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    async def start(self) -> None:
+        """
+        执行首次工具发现并启动后台刷新任务，首次发现失败不影响启动
+        """
+        await self.refresh()
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        """
+        停止后台刷新任务
+        """
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def refresh(self) -> bool:
+        """
+        重新发现MCP工具，工具集合变化时生成新快照
+        :return: 是否成功
+        """
+        async with self._refresh_lock:
+            try:
+                tools = await asyncio.wait_for(
+                    self.client.get_tools(), timeout=self.discovery_timeout
+                )
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                self._stats["failures"] += 1
+                self._stats["last_error"] = error
+                print(f"MCP工具发现失败，继续使用版本 {self.version} 的工具: {error}")
+                return False
+
+            self._stats["refreshes"] += 1
+            self._stats["last_error"] = None
+            signature = tuple(sorted((t.name, t.description or "") for t in tools))
+            now = time.time()
+            if signature != self._signature:
+                self._signature = signature
+                self._snapshot = ToolSnapshot(
+                    tools=tuple(tools), version=self.version + 1, loaded_at=now
+                )
+                print(f"MCP工具已更新到版本 {self.version}，工具数量: {len(tools)}")
+            else:
+                self._snapshot = ToolSnapshot(
+                    tools=self._snapshot.tools, version=self.version, loaded_at=now
+                )
+            return True
+
+    async def _refresh_loop(self) -> None:
+        """
+        后台刷新循环，成功后等待TTL，失败后按重试间隔重试
+        """
+        ok = self._snapshot.loaded_at > 0
+        while True:
+            await asyncio.sleep(self.ttl if ok else min(self.ttl, self.retry_interval))
+            ok = await self.refresh()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取注册表统计信息
+        :return: 统计信息
+        """
+        return {
+            "version": self.version,
+            "tool_count": len(self._snapshot.tools),
+            "tools": [t.name for t in self._snapshot.tools],
+            "loaded_at": self._snapshot.loaded_at,
+            "ttl": self.ttl,
+            **self._stats,
+        }
+
+
+mcp_client = MultiServerMCPClient(
+    {
+        "Student_Grade_System": {
+            "url": app_config.mcp_server_url,
+            "transport": "streamable_http",
+        }
+    }
+)
+
+# 全局工具注册表实例
+tool_registry = MCPToolRegistry(
+    mcp_client,
+    ttl=app_config.mcp_tools_ttl,
+    discovery_timeout=app_config.mcp_discovery_timeout,
+)
@@ -1,10 +1,22 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from controller.LLMController import LLMController
+from llm.llm_chat_with_tools.chatbot.chat_runtime import chat_runtime
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时创建共享的ChatBot运行时，关闭时释放资源
+    await chat_runtime.start()
+    yield
+    await chat_runtime.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # 添加CORS中间件，允许所有来源的跨域请求
 app.add_middleware(
@@ -0,0 +1,24 @@
+"""
+检查点表结构迁移脚本
+部署时执行一次：python migrate.py
+"""
+import asyncio
+
+from llm.llm_chat_with_tools.chatbot.checkpoint_store import (
+    LATEST_SCHEMA_VERSION,
+    create_connection_pool,
+    migrate_checkpoint_schema,
+)
+
+
+async def main():
+    pool = await create_connection_pool()
+    try:
+        version = await migrate_checkpoint_schema(pool)
+        print(f"检查点表结构版本: {version} (最新: {LATEST_SCHEMA_VERSION})")
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,5 +1,5 @@
 from abc import abstractmethod, ABC
-from typing import Any, List
+from typing import Any, Awaitable, Callable, List, Optional
 
 from langchain_core.messages import BaseMessage
 
@@ -24,11 +24,40 @@ class LLMService(ABC):
     async def clean_thread_messages(self, thread_id: str) -> Any: ...
 
     @abstractmethod
-    async def chat_with_tools(self, query: str, thread_id: str, model: str, summary_with_llm: bool = False) -> Any: ...
+    async def chat_with_tools(
+        self,
+        query: str,
+        thread_id: str,
+        model: str,
+        summary_with_llm: bool = False,
+        flush_bytes: Optional[int] = None,
+        flush_ms: Optional[int] = None,
+        busy_policy: Optional[str] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> Any: ...
+
+    @abstractmethod
+    async def resume_chat_stream(
+        self,
+        thread_id: str,
+        last_event_id: str,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> Any: ...
 
     @abstractmethod
     async def get_history(self, thread_id: str) -> List[BaseMessage]: ...
 
+    @abstractmethod
+    async def get_history_page(
+        self,
+        thread_id: str,
+        limit: int,
+        before_id: Optional[str],
+        after_id: Optional[str],
+        exclude_tools: bool,
+        fields: str,
+    ) -> Optional[dict[str, Any]]: ...
+
     @abstractmethod
     async def delete_thread(self, thread_id: str) -> Any: ...
 
@@ -67,3 +96,6 @@ class LLMService(ABC):
 
     @abstractmethod
     async def delete_threads_batch(self, thread_ids: List[str]) -> dict[str, Any]: ...
+
+    @abstractmethod
+    async def get_runtime_stats(self) -> dict[str, Any]: ...
@@ -1,9 +1,13 @@
-from typing import Any, override, List
+from typing import Any, Awaitable, Callable, override, List, Optional
 
 from langchain_core.messages import BaseMessage
 
 from llm.llm_chat.chat_graph import AgentClass
 from llm.llm_chat_with_tools.chatbot.ChatBot import ChatBot
+from llm.llm_chat_with_tools.chatbot.chat_runtime import chat_runtime
+from llm.llm_chat_with_tools.chatbot.sse_events import FlushPolicy
+from llm.llm_chat_with_tools.chatbot.thread_lock import thread_locks
+from llm.llm_chat_with_tools.chatbot.turn_stream import parse_event_id, turn_stream_hub
 from llm.llm_praser.llm_out import LLMOut
 from llm.llm_praser.llm_schema import Houses
 from service.LLMService import LLMService
@@ -14,7 +18,15 @@ class LLMServiceImpl(LLMService):
     def __init__(self):
         super().__init__()
         self.llm_out = LLMOut()
-        self.chatbot = ChatBot()
+        self.runtime = chat_runtime
+
+    async def _get_chatbot(self, model: Optional[str] = None) -> ChatBot:
+        """
+        从运行时获取共享的ChatBot
+        :param model: 模型名称，为空时使用默认模型
+        :return: 已初始化的ChatBot
+        """
+        return await self.runtime.get_chatbot(model)
 
     @override
     async def test_service(self):
@@ -62,16 +74,66 @@ class LLMServiceImpl(LLMService):
 
     @override
     async def chat_with_tools(
-        self, query: str, thread_id: str, model: str = "Qwen/Qwen2.5-7B-Instruct", summary_with_llm: bool = False
+        self,
+        query: str,
+        thread_id: str,
+        model: str = "Qwen/Qwen2.5-7B-Instruct",
+        summary_with_llm: bool = False,
+        flush_bytes: Optional[int] = None,
+        flush_ms: Optional[int] = None,
+        busy_policy: Optional[str] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
     ) -> Any:
-        custom_chatbot = ChatBot(model=model)
+        """
+        开始一轮带工具的对话，同一线程同时只运行一轮
+        :raises ThreadBusyError: 线程忙且按策略拒绝，或排队超时
+        """
+        chatbot = await self._get_chatbot(model)
+        lease = await thread_locks.acquire(thread_id, busy_policy)
+        run = turn_stream_hub.start(
+            thread_id,
+            chatbot.generate(
+                query=query,
+                thread_id=thread_id,
+                summary_with_llm=summary_with_llm,
+                flush_policy=FlushPolicy.resolve(flush_bytes, flush_ms),
+            ),
+            lease=lease,
+        )
+        return self._event_stream_response(
+            turn_stream_hub.subscribe(run, is_disconnected=is_disconnected),
+            run.turn_id,
+        )
+
+    @override
+    async def resume_chat_stream(
+        self,
+        thread_id: str,
+        last_event_id: str,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> Optional[StreamingResponse]:
+        """
+        按Last-Event-ID恢复对话事件流，重放缺失的事件后继续接收，不会重新执行本轮
+        :param thread_id: 线程ID
+        :param last_event_id: 客户端收到的最后事件ID
+        :param is_disconnected: 检查客户端是否断开的协程函数
+        :return: 事件流响应，无法恢复时返回None
+        """
+        stream = await turn_stream_hub.resume(thread_id, last_event_id, is_disconnected)
+        if stream is None:
+            return None
+        return self._event_stream_response(stream, parse_event_id(last_event_id)[0])
+
+    @staticmethod
+    def _event_stream_response(stream: Any, turn_id: str) -> StreamingResponse:
         return StreamingResponse(
-            custom_chatbot.generate(query=query, thread_id=thread_id, summary_with_llm=summary_with_llm),
+            stream,
             media_type="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
                 "X-Accel-Buffering": "no",
+                "X-Turn-Id": turn_id,
             },
         )
 
@@ -83,7 +145,38 @@ class LLMServiceImpl(LLMService):
         :return: 历史记录
         :type: List[str]
         """
-        return await self.chatbot.get_history(thread_id=thread_id)
+        chatbot = await self._get_chatbot()
+        return await chatbot.get_history(thread_id=thread_id)
+
+    @override
+    async def get_history_page(
+        self,
+        thread_id: str,
+        limit: int = 50,
+        before_id: Optional[str] = None,
+        after_id: Optional[str] = None,
+        exclude_tools: bool = False,
+        fields: str = "full",
+    ) -> Optional[dict[str, Any]]:
+        """
+        分页获取历史记录
+        :param thread_id: 线程ID
+        :param limit: 每页条数
+        :param before_id: 返回该消息之前的消息
+        :param after_id: 返回该消息之后的消息
+        :param exclude_tools: 是否排除工具消息
+        :param fields: 返回字段，full或preview
+        :return: 分页结果，游标消息不存在时返回None
+        """
+        chatbot = await self._get_chatbot()
+        return await chatbot.get_history_page(
+            thread_id,
+            limit=limit,
+            before_id=before_id,
+            after_id=after_id,
+            exclude_tools=exclude_tools,
+            fields=fields,
+        )
 
     @override
     async def delete_thread(self, thread_id: str) -> dict[str, Any]:
@@ -92,7 +185,8 @@ class LLMServiceImpl(LLMService):
         :param thread_id: 线程ID
         :return: 删除状态
         """
-        state = await self.chatbot.delete_history(thread_id=thread_id)
+        chatbot = await self._get_chatbot()
+        state = await chatbot.delete_history(thread_id=thread_id)
         if state:
             return {"message": "success"}
         else:
@@ -109,7 +203,8 @@ class LLMServiceImpl(LLMService):
         :param new_content: 新内容
         :return: 更新状态
         """
-        status = await self.chatbot.edit_message(thread_id, message_idx, new_content)
+        chatbot = await self._get_chatbot()
+        status = await chatbot.edit_message(thread_id, message_idx, new_content)
         if status:
             return {"message": "success", "status": True}
         else:
@@ -126,7 +221,8 @@ class LLMServiceImpl(LLMService):
         :param new_content: 新消息内容
         :return: 修改状态
         """
-        status = await self.chatbot.edit_message_with_id(
+        chatbot = await self._get_chatbot()
+        status = await chatbot.edit_message_with_id(
             thread_id, message_id, new_content
         )
         if status:
@@ -142,7 +238,8 @@ class LLMServiceImpl(LLMService):
         :param message_idx:
         :return: 删除状态
         """
-        status = await self.chatbot.delete_message(thread_id, message_idx)
+        chatbot = await self._get_chatbot()
+        status = await chatbot.delete_message(thread_id, message_idx)
         if status:
             return {"message": "success", "status": True}
         else:
@@ -158,7 +255,8 @@ class LLMServiceImpl(LLMService):
         :param message_id: 消息ID
         :return: 删除状态
         """
-        status = await self.chatbot.delete_message_with_id(thread_id, message_id)
+        chatbot = await self._get_chatbot()
+        status = await chatbot.delete_message_with_id(thread_id, message_id)
         if status:
             return {"message": "success", "status": True}
         else:
@@ -174,7 +272,8 @@ class LLMServiceImpl(LLMService):
         :param message_id: 消息ID
         :return: 删除状态
         """
-        status = await self.chatbot.delete_messages_after_with_id(thread_id, message_id)
+        chatbot = await self._get_chatbot()
+        status = await chatbot.delete_messages_after_with_id(thread_id, message_id)
         if status:
             return {"message": "success", "status": True}
         else:
@@ -190,7 +289,8 @@ class LLMServiceImpl(LLMService):
         :param message_id: 消息ID
         :return: 消息对象
         """
-        return await self.chatbot.get_message_by_id(thread_id, message_id)
+        chatbot = await self._get_chatbot()
+        return await chatbot.get_message_by_id(thread_id, message_id)
 
     @override
     async def generate_chat_name(self, thread_id: str) -> str:
@@ -199,7 +299,8 @@ class LLMServiceImpl(LLMService):
         :param thread_id: 线程ID
         :return: 生成的对话标题
         """
-        return await self.chatbot.named_chat(thread_id)
+        chatbot = await self._get_chatbot()
+        return await chatbot.named_chat(thread_id)
 
     @override
     async def delete_threads_batch(self, thread_ids: List[str]) -> dict[str, Any]:
@@ -211,16 +312,29 @@ class LLMServiceImpl(LLMService):
         if not thread_ids:
             return {"message": "error", "error": "No thread IDs provided"}
         
-        state = await self.chatbot.delete_history_batch(thread_ids)
-        if state:
-            return {
-                "message": "success", 
-                "deleted_count": len(thread_ids),
-                "thread_ids": thread_ids
-            }
-        else:
-            return {
-                "message": "error", 
-                "error": "Failed to delete threads",
-                "thread_ids": thread_ids
-            }
+        chatbot = await self._get_chatbot()
+        outcome = await chatbot.delete_history_batch(thread_ids)
+        results = outcome["results"]
+        deleted = [t for t, status in results.items() if status == "deleted"]
+        not_found = [t for t, status in results.items() if status == "not_found"]
+        failed = [t for t, status in results.items() if status == "error"]
+        return {
+            "message": "error" if failed else "success",
+            "deleted_count": len(deleted),
+            "not_found_count": len(not_found),
+            "failed_count": len(failed),
+            "results": [
+                {"thread_id": thread_id, "status": status}
+                for thread_id, status in results.items()
+            ],
+            "elapsed_ms": outcome["elapsed_ms"],
+            "thread_ids": list(results),
+        }
+
+    @override
+    async def get_runtime_stats(self) -> dict[str, Any]:
+        """
+        获取对话运行时统计信息（连接池等）
+        :return: 统计信息
+        """
+        return self.runtime.get_stats()
@@ -0,0 +1,113 @@
+"""
+测试连接池检查点存储：不同线程的检查点读写并发执行
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from psycopg_pool import AsyncConnectionPool
+
+from llm.llm_chat_with_tools.chatbot.pooled_saver import PooledPostgresSaver
+
+QUERY_DELAY = 0.05
+
+
+class FakeCursor:
+    """模拟每条语句耗时QUERY_DELAY秒的游标，记录同时执行的语句数"""
+
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+
+    async def _run(self):
+        self.pool.active += 1
+        self.pool.max_active = max(self.pool.max_active, self.pool.active)
+        try:
+            await asyncio.sleep(QUERY_DELAY)
+        finally:
+            self.pool.active -= 1
+
+    async def execute(self, *args, **kwargs):
+        await self._run()
+
+    async def executemany(self, *args, **kwargs):
+        await self._run()
+
+    async def fetchone(self):
+        return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.pool)
+
+    @asynccontextmanager
+    async def pipeline(self):
+        yield
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+class FakePool(AsyncConnectionPool):
+    """每次借出一个独立连接的连接池，不连接数据库"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        yield FakeConnection(self)
+
+    def __del__(self):
+        pass
+
+
+async def run_two_threads(saver: AsyncPostgresSaver) -> float:
+    """两个线程同时写入并读取检查点，返回耗时"""
+
+    async def turn(thread_id: str):
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        await saver.aput(config, empty_checkpoint(), {}, {})
+        await saver.aget_tuple(config)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.gather(turn("thread-1"), turn("thread-2"))
+    return loop.time() - start
+
+
+async def test_concurrent_threads():
+    """测试两个线程的aput/aget_tuple在连接池上重叠执行"""
+    print("=== 检查点并发读写测试 ===")
+    locked_pool = FakePool()
+    locked = await run_two_threads(AsyncPostgresSaver(locked_pool))
+    print(f"AsyncPostgresSaver：最大并发 {locked_pool.max_active}，耗时 {locked * 1000:.0f}ms")
+    assert locked_pool.max_active == 1
+
+    pooled_pool = FakePool()
+    pooled = await run_two_threads(PooledPostgresSaver(pooled_pool))
+    print(f"PooledPostgresSaver：最大并发 {pooled_pool.max_active}，耗时 {pooled * 1000:.0f}ms")
+    assert pooled_pool.max_active == 2
+    assert pooled < locked * 0.75
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_concurrent_threads()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""
+测试上下文窗口管理和滚动对话摘要功能
+"""
+
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from llm.llm_chat_with_tools.chatbot.conversation_summary import ConversationSummarizer
+from llm.llm_chat_with_tools.chatbot.context_window import (
+    ContextWindow,
+    count_message_tokens,
+    estimate_tokens,
+    split_turns,
+)
+
+
+def build_history(turns: int, tool_output: str):
+    """构造包含工具调用的多轮对话历史"""
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"第{i}个问题", id=f"h{i}"))
+        messages.append(
+            AIMessage(
+                content="",
+                id=f"a{i}",
+                tool_calls=[{"name": "search_tool", "args": {"query": f"q{i}"}, "id": f"c{i}"}],
+            )
+        )
+        messages.append(
+            ToolMessage(content=tool_output, name="search_tool", tool_call_id=f"c{i}", id=f"t{i}")
+        )
+        messages.append(AIMessage(content=f"第{i}个回答", id=f"r{i}"))
+    return messages
+
+
+async def test_token_count_cache():
+    """测试token计数和缓存"""
+    print("=== token计数测试 ===")
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("你好") == 2
+
+    message = HumanMessage(content="hello world 你好")
+    tokens = count_message_tokens(message)
+    assert message.response_metadata["token_count"]["tokens"] == tokens
+
+    # 内容变化后重新计算
+    message.content = "hello world 你好，世界"
+    assert count_message_tokens(message) > tokens
+    print("✅ 通过\n")
+
+
+async def test_elide_old_tool_outputs():
+    """测试较早轮次的工具输出被省略，历史本身不被修改"""
+    print("=== 省略较早工具输出测试 ===")
+    history = build_history(4, "搜索结果" * 500)
+    window = ContextWindow(max_tokens=100000, keep_tool_turns=2, tool_preview_chars=20)
+    selected = window.select(history)
+
+    assert len(selected) == len(history)
+    tool_messages = [m for m in selected if isinstance(m, ToolMessage)]
+    assert all(m.response_metadata.get("elided") for m in tool_messages[:2])
+    assert not any(m.response_metadata.get("elided") for m in tool_messages[2:])
+    # 检查点中的原始消息保持不变
+    assert history[2].content == "搜索结果" * 500
+    print("✅ 通过\n")
+
+
+async def test_budget_keeps_whole_turns():
+    """测试预算内按整轮保留，工具调用与结果成对出现"""
+    print("=== token预算测试 ===")
+    history = build_history(10, "结果" * 100)
+    window = ContextWindow(max_tokens=600, keep_tool_turns=1, tool_preview_chars=20)
+    selected = window.select(history, reserved_tokens=100)
+
+    assert isinstance(selected[0], HumanMessage)
+    assert selected[-1].id == "r9"
+    assert sum(count_message_tokens(m) for m in selected) <= 500
+    assert len(split_turns(selected)) < 10
+
+    call_ids = {c["id"] for m in selected if isinstance(m, AIMessage) for c in m.tool_calls}
+    result_ids = {m.tool_call_id for m in selected if isinstance(m, ToolMessage)}
+    assert call_ids == result_ids
+    print(f"保留 {len(split_turns(selected))} 轮，共 {len(selected)} 条消息")
+
+    # 当前轮超出预算时仍然保留
+    tiny = ContextWindow(max_tokens=10, keep_tool_turns=1)
+    assert [m.id for m in tiny.select(history)] == ["h9", "a9", "t9", "r9"]
+    print("✅ 通过\n")
+
+
+async def test_summary_delta():
+    """测试滚动摘要只选择上次摘要之后新增的较早轮次"""
+    print("=== 滚动摘要增量测试 ===")
+    summarizer = ConversationSummarizer(keep_turns=2, min_delta_turns=2)
+    history = build_history(3, "结果")
+
+    # 窗口之前只有1轮，不足以触发摘要
+    delta, upto, rebuild = summarizer.select_delta(history, None)
+    assert delta == [] and upto is None and not rebuild
+
+    history = build_history(6, "结果")
+    delta, upto, rebuild = summarizer.select_delta(history, None)
+    assert [m.id for m in delta if isinstance(m, HumanMessage)] == ["h0", "h1", "h2", "h3"]
+    assert upto == "r3" and not rebuild
+
+    # 再新增2轮后只摘要新增部分
+    history = build_history(8, "结果")
+    delta, upto, rebuild = summarizer.select_delta(history, "r3")
+    assert [m.id for m in delta if isinstance(m, HumanMessage)] == ["h4", "h5"]
+    assert upto == "r5" and not rebuild
+
+    # 摘要覆盖的消息被删除时重建摘要
+    delta, upto, rebuild = summarizer.select_delta(history, "deleted")
+    assert rebuild and upto == "r5" and delta[0].id == "h0"
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_token_count_cache()
+    await test_elide_old_tool_outputs()
+    await test_budget_keeps_whole_turns()
+    await test_summary_delta()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""
+测试网页爬取缓存的条件请求验证：只向公网http(s)地址发送，不跟随重定向
+"""
+
+import asyncio
+
+import httpx
+
+from llm.llm_chat_with_tools.tools import crawl_cache as crawl_cache_module
+from llm.llm_chat_with_tools.tools.crawl_cache import CrawlCache, is_public_http_url
+
+
+class FakeHttpClient:
+    """记录请求参数并返回固定状态码的HTTP客户端替身"""
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.requests = []
+
+    async def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        return httpx.Response(self.status_code, headers={"ETag": '"v2"'})
+
+
+async def test_url_guard():
+    """测试非http(s)协议和内网、回环地址被拒绝"""
+    print("=== URL检查测试 ===")
+    for url in [
+        "file:///etc/passwd",
+        "ftp://example.com/a",
+        "http://127.0.0.1/admin",
+        "http://localhost:8080/",
+        "http://10.0.0.5/",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://[::1]/",
+        "http://192.168.1.1:99999/",
+    ]:
+        assert not await is_public_http_url(url), url
+    assert await is_public_http_url("https://8.8.8.8/")
+    print("✅ 通过\n")
+
+
+async def test_revalidate():
+    """测试内网条目不发送请求，公网条目不跟随重定向"""
+    print("=== 条件请求验证测试 ===")
+    original = crawl_cache_module.http_client
+    try:
+        cache = CrawlCache(ttl=60)
+        client = FakeHttpClient(304)
+        crawl_cache_module.http_client = client
+
+        internal = cache.put("http://127.0.0.1/page", "标题", "正文", etag='"v1"')
+        assert not await cache.revalidate(internal)
+        assert client.requests == []
+        assert cache.get_stats()["revalidation_refused"] == 1
+
+        public = cache.put("https://8.8.8.8/page", "标题", "正文", etag='"v1"')
+        assert await cache.revalidate(public)
+        method, url, kwargs = client.requests[0]
+        assert method == "HEAD" and url == "https://8.8.8.8/page"
+        assert kwargs["follow_redirects"] is False
+        assert kwargs["headers"]["If-None-Match"] == '"v1"'
+        assert public.etag == '"v2"'
+
+        # 重定向按内容已变化处理，交给爬取服务重新爬取
+        crawl_cache_module.http_client = FakeHttpClient(302)
+        assert not await cache.revalidate(public)
+    finally:
+        crawl_cache_module.http_client = original
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_url_guard()
+    await test_revalidate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+测试对话历史分页功能
+"""
+
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from llm.llm_chat_with_tools.chatbot.history import paginate_messages
+from llm.llm_chat_with_tools.chatbot.json_codec import dumps_json
+
+
+def build_history(turns: int):
+    """构造包含工具调用的多轮对话历史"""
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"第{i}个问题", id=f"h{i}"))
+        messages.append(
+            AIMessage(
+                content="",
+                id=f"a{i}",
+                tool_calls=[{"name": "search_tool", "args": {}, "id": f"c{i}"}],
+            )
+        )
+        messages.append(
+            ToolMessage(content="搜索结果" * 100, tool_call_id=f"c{i}", id=f"t{i}")
+        )
+        messages.append(AIMessage(content=f"第{i}个回答", id=f"r{i}"))
+    return messages
+
+
+async def test_cursor_pagination():
+    """测试游标分页"""
+    print("=== 游标分页测试 ===")
+    history = build_history(5)
+
+    page = paginate_messages(history, limit=4)
+    assert [m["id"] for m in page["messages"]] == ["h4", "a4", "t4", "r4"]
+    assert page["has_more"] and page["first_id"] == "h4"
+
+    page = paginate_messages(history, limit=4, before_id="h4")
+    assert [m["id"] for m in page["messages"]] == ["h3", "a3", "t3", "r3"]
+
+    page = paginate_messages(history, limit=2, after_id="r3")
+    assert [m["id"] for m in page["messages"]] == ["h4", "a4"] and page["has_more"]
+
+    assert paginate_messages(history, before_id="not-exist") is None
+    print("✅ 通过\n")
+
+
+async def test_filter_and_projection():
+    """测试排除工具消息和字段裁剪"""
+    print("=== 过滤与字段裁剪测试 ===")
+    history = build_history(3)
+
+    page = paginate_messages(
+        history, limit=10, exclude_tools=True, fields="preview", preview_chars=3
+    )
+    assert [m["id"] for m in page["messages"]] == ["h0", "r0", "h1", "r1", "h2", "r2"]
+    assert page["messages"][0] == {"id": "h0", "type": "human", "content": "第0个", "truncated": True}
+
+    full = dumps_json(paginate_messages(history, limit=100))
+    preview = dumps_json(page)
+    print(f"完整响应 {len(full)} 字节，裁剪后 {len(preview)} 字节")
+    assert len(preview) < len(full)
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_cursor_pagination()
+    await test_filter_and_projection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+"""
+测试按消息ID编辑和删除：保留消息ID与工具调用，每次操作只写入一个检查点，历史检查点可回溯
+"""
+
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.memory import MemorySaver
+
+from llm.llm_chat_with_tools.chatbot.ChatBot import ChatBot
+
+THREAD_ID = "edit-thread"
+CONFIG = RunnableConfig(configurable={"thread_id": THREAD_ID})
+
+
+def build_history():
+    """构造包含工具调用的两轮对话"""
+    return [
+        HumanMessage(content="杭州天气", id="h0"),
+        AIMessage(
+            content="我来查询一下",
+            id="a0",
+            tool_calls=[
+                {"name": "search_tool", "args": {"query": "杭州天气"}, "id": "c0"}
+            ],
+        ),
+        ToolMessage(content="晴，25度", tool_call_id="c0", id="t0"),
+        AIMessage(content="杭州今天晴，25度", id="r0"),
+        HumanMessage(content="明天呢", id="h1"),
+        AIMessage(content="明天多云", id="r1"),
+    ]
+
+
+async def create_chatbot() -> ChatBot:
+    """使用内存检查点存储初始化ChatBot，不连接数据库和MCP服务"""
+    chatbot = ChatBot()
+    await chatbot.initialize(memory=MemorySaver(), tools=[])
+    await chatbot.graph.aupdate_state(
+        CONFIG, {"messages": build_history()}, as_node="chatbot"
+    )
+    return chatbot
+
+
+async def checkpoint_ids(chatbot: ChatBot):
+    return [
+        snapshot.config["configurable"]["checkpoint_id"]
+        async for snapshot in chatbot.graph.aget_state_history(CONFIG)
+    ]
+
+
+async def current_messages(chatbot: ChatBot):
+    state = await chatbot.graph.aget_state(CONFIG)
+    return state.values["messages"]
+
+
+async def test_edit_preserves_ids():
+    """测试编辑后消息ID和工具调用保持不变，且只写入一个检查点"""
+    print("=== 按ID编辑消息测试 ===")
+    chatbot = await create_chatbot()
+    before = await checkpoint_ids(chatbot)
+
+    assert await chatbot.edit_message_with_id(THREAD_ID, "a0", "我来搜索一下")
+    after = await checkpoint_ids(chatbot)
+    assert len(after) == len(before) + 1, (before, after)
+
+    messages = await current_messages(chatbot)
+    assert [m.id for m in messages] == ["h0", "a0", "t0", "r0", "h1", "r1"]
+    assert messages[1].content == "我来搜索一下"
+    assert messages[1].tool_calls[0]["id"] == "c0"
+    assert messages[2].tool_call_id == "c0"
+
+    # 不支持编辑工具消息，也不写入检查点
+    assert not await chatbot.edit_message_with_id(THREAD_ID, "t0", "篡改")
+    assert await checkpoint_ids(chatbot) == after
+    print("✅ 通过\n")
+
+
+async def test_delete_writes_one_checkpoint():
+    """测试删除单条消息和删除之后的所有消息各只写入一个检查点"""
+    print("=== 按ID删除消息测试 ===")
+    chatbot = await create_chatbot()
+
+    count = len(await checkpoint_ids(chatbot))
+    assert await chatbot.delete_message_with_id(THREAD_ID, "r0")
+    assert len(await checkpoint_ids(chatbot)) == count + 1
+    messages = await current_messages(chatbot)
+    assert [m.id for m in messages] == ["h0", "a0", "t0", "h1", "r1"]
+
+    count += 1
+    assert await chatbot.delete_messages_after_with_id(THREAD_ID, "h1")
+    assert len(await checkpoint_ids(chatbot)) == count + 1
+    messages = await current_messages(chatbot)
+    assert [m.id for m in messages] == ["h0", "a0", "t0"]
+
+    # 不存在的消息不写入检查点
+    count += 1
+    assert not await chatbot.delete_message_with_id(THREAD_ID, "not-exist")
+    assert len(await checkpoint_ids(chatbot)) == count
+    print("✅ 通过\n")
+
+
+async def test_history_checkpoints_readable():
+    """测试编辑和删除后，之前的检查点仍可读取原始消息"""
+    print("=== 历史检查点回溯测试 ===")
+    chatbot = await create_chatbot()
+    original = (await checkpoint_ids(chatbot))[0]
+
+    assert await chatbot.edit_message_with_id(THREAD_ID, "h1", "后天呢")
+    edited = (await checkpoint_ids(chatbot))[0]
+    assert await chatbot.delete_messages_after_with_id(THREAD_ID, "h1")
+
+    async def messages_at(checkpoint_id: str):
+        config = RunnableConfig(
+            configurable={"thread_id": THREAD_ID, "checkpoint_id": checkpoint_id}
+        )
+        state = await chatbot.graph.aget_state(config)
+        return state.values["messages"]
+
+    messages = await messages_at(original)
+    assert [m.id for m in messages] == ["h0", "a0", "t0", "r0", "h1", "r1"]
+    assert messages[4].content == "明天呢"
+
+    messages = await messages_at(edited)
+    assert len(messages) == 6 and messages[4].content == "后天呢"
+
+    assert [m.id for m in await current_messages(chatbot)] == ["h0", "a0", "t0", "r0"]
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_edit_preserves_ids()
+    await test_delete_writes_one_checkpoint()
+    await test_history_checkpoints_readable()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
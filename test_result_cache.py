@@ -0,0 +1,94 @@
+"""
+测试工具结果处理缓存功能
+"""
+
+import asyncio
+import os
+import tempfile
+
+from llm.llm_chat_with_tools.tools.result_cache import ResultCache, SQLiteResultStore
+
+
+async def test_content_addressed_key():
+    """测试缓存键由工具名称、处理模式、选项和结果内容共同决定"""
+    print("=== 缓存键测试 ===")
+    key = ResultCache.make_key("query_grade", "formatted", {"a": 1, "b": 2}, "data")
+    assert key == ResultCache.make_key("query_grade", "formatted", {"b": 2, "a": 1}, "data")
+    assert key != ResultCache.make_key("query_grade", "summary", {"a": 1, "b": 2}, "data")
+    assert key != ResultCache.make_key("query_grade", "formatted", {"a": 1, "b": 2}, "data2")
+    assert key != ResultCache.make_key("get_grade", "formatted", {"a": 1, "b": 2}, "data")
+    print("✅ 通过\n")
+
+
+async def test_compute_once():
+    """测试相同结果只处理一次，并发请求合并"""
+    print("=== 相同结果只处理一次测试 ===")
+    cache = ResultCache(max_entries=16)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "格式化结果"
+
+    results = await asyncio.gather(
+        *[cache.get_or_compute("query_grade", "formatted", {}, "raw", compute) for _ in range(5)]
+    )
+    assert calls == 1 and all(r == "格式化结果" for r in results)
+    assert await cache.get_or_compute("query_grade", "formatted", {}, "raw", compute) == "格式化结果"
+    assert calls == 1
+
+    # 处理失败不缓存
+    async def failing():
+        raise RuntimeError("llm error")
+
+    for _ in range(2):
+        try:
+            await cache.get_or_compute("query_grade", "formatted", {}, "bad", failing)
+            assert False, "应当抛出异常"
+        except RuntimeError:
+            pass
+    stats = cache.get_stats()
+    print(f"统计信息: {stats}")
+    assert stats["misses"] == 3 and stats["local_hits"] == 1 and stats["coalesced"] == 4
+    print("✅ 通过\n")
+
+
+async def test_sqlite_store():
+    """测试SQLite持久化层和容量限制"""
+    print("=== SQLite持久化层测试 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "result_cache.db")
+        first = ResultCache(max_entries=1, store=SQLiteResultStore(path, max_entries=2))
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            return f"结果{calls}"
+
+        for raw in ["a", "b", "c"]:
+            await first.get_or_compute("get_x", "formatted", {}, raw, compute)
+        assert first.get_stats()["evictions"] == 2
+        assert first.store.count() == 2
+        first.close()
+
+        # 模拟进程重启：新的进程内缓存从SQLite读取
+        second = ResultCache(max_entries=4, store=SQLiteResultStore(path, max_entries=2))
+        assert await second.get_or_compute("get_x", "formatted", {}, "c", compute) == "结果3"
+        assert calls == 3 and second.get_stats()["store_hits"] == 1
+        # 最早写入的条目已被淘汰
+        assert await second.get_or_compute("get_x", "formatted", {}, "a", compute) == "结果4"
+        second.close()
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_content_addressed_key()
+    await test_compute_once()
+    await test_sqlite_store()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
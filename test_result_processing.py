@@ -3,7 +3,35 @@
 """
 
 import asyncio
-from llm.llm_chat_with_tools.tools.result_processor import process_mcp_result, ProcessingMode
+import json
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from llm.llm_chat_with_tools.tools.result_cache import ResultCache
+from llm.llm_chat_with_tools.tools.result_processor import (
+    MCPResultProcessor,
+    process_mcp_result,
+    result_processor,
+    ProcessingMode,
+    SizePolicy,
+    split_into_chunks,
+)
+
+
+def create_offline_processor(calls: list) -> MCPResultProcessor:
+    """创建使用确定性假LLM的结果处理器：摘要为每块的第一行，不访问网络"""
+
+    async def fake_llm(prompt_value) -> AIMessage:
+        chunk = prompt_value.to_messages()[-1].content.split("工具结果：", 1)[1]
+        first_line = chunk.strip().splitlines()[0]
+        calls.append(first_line)
+        await asyncio.sleep(0.01)
+        return AIMessage(content=f"摘要：{first_line}")
+
+    processor = MCPResultProcessor(cache=ResultCache())
+    processor.llm = RunnableLambda(fake_llm)
+    return processor
 
 
 async def test_result_processing():
@@ -85,7 +113,101 @@ async def test_text_processing():
         print("-" * 50 + "\n")
 
 
+async def test_auto_mode():
+    """测试AUTO模式的规则格式化和并发处理（JSON结果不调用LLM）"""
+
+    grade_rows = """
+    [
+        {"student_id": 1, "name": "张三", "chinese": 92, "math": 88},
+        {"student_id": 2, "name": "李四", "chinese": 85, "math": null}
+    ]
+    """
+    class_summary = """
+    {
+        "class_name": "class_1",
+        "student_count": 2,
+        "students": [{"name": "张三", "total": 180}, {"name": "李四", "total": 85}]
+    }
+    """
+
+    print("=== 测试AUTO模式规则格式化 ===\n")
+
+    results = await result_processor.process_results(
+        [
+            ("query_student_grades", grade_rows),
+            ("get_class_summary", class_summary),
+        ],
+        mode=ProcessingMode.AUTO,
+    )
+    for processed in results:
+        print(f"处理结果:\n{processed}\n")
+
+    assert "| student_id | name | chinese | math |" in results[0]
+    assert "| 2 | 李四 | 85 | - |" in results[0]
+    assert "**class_name:** class_1" in results[1]
+    assert "| 张三 | 180 |" in results[1]
+    print("✅ 通过\n")
+    print("-" * 50 + "\n")
+
+
+async def test_size_policy():
+    """测试按结果大小选择处理方式（小结果不调用LLM，超大结果切块摘要）"""
+
+    print("=== 测试结果大小策略 ===\n")
+
+    text = "第一行成绩记录\n" * 40
+    chunks = split_into_chunks(text, 200)
+    assert "".join(chunks) == text
+    assert all(len(chunk.encode("utf-8")) <= 200 for chunk in chunks)
+
+    policy = SizePolicy(small_bytes=64, large_bytes=1024, chunk_bytes=256, max_chunks=4)
+
+    # 小结果原样返回，不调用LLM
+    small = await result_processor.process_sized_result(
+        "query_student_count", "学生总数：25人", ProcessingMode.FORMATTED, policy=policy
+    )
+    assert small == "学生总数：25人"
+
+    # 超大的JSON结果按规则格式化为表格并限制行数，不切块摘要
+    grades = [{"name": f"学生{i}", "score": 60 + i % 40} for i in range(200)]
+    large_json = await result_processor.process_sized_result(
+        "query_all_grades",
+        json.dumps(grades, ensure_ascii=False),
+        ProcessingMode.AUTO,
+        policy=policy,
+    )
+    assert "| 学生0 | 60 |" in large_json
+    assert "还有 150 行" in large_json and "部分摘要" not in large_json
+
+    # 超大的文本结果切块并发摘要，按原顺序合并，超出块数上限的部分省略
+    calls = []
+    processor = create_offline_processor(calls)
+    large_text = "".join(f"学生{i}：语文{60 + i % 40}分\n" for i in range(200))
+    large = await processor.process_sized_result(
+        "query_all_grades", large_text, ProcessingMode.FORMATTED, policy=policy
+    )
+    print(f"处理结果:\n{large}\n")
+    chunks = split_into_chunks(large_text, policy.chunk_bytes)
+    assert len(calls) == 4
+    positions = []
+    for i, chunk in enumerate(chunks[:4], 1):
+        positions.append(large.index(f"### 第 {i}/4 部分"))
+        assert f"摘要：{chunk.strip().splitlines()[0]}" in large
+    assert positions == sorted(positions)
+    assert f"还有 {len(chunks) - 4} 部分内容超出处理上限" in large
+
+    # 相同的块命中缓存，不再调用LLM
+    again = await processor.process_sized_result(
+        "query_all_grades", large_text, ProcessingMode.FORMATTED, policy=policy
+    )
+    assert again == large and len(calls) == 4
+    print("✅ 通过\n")
+    print("-" * 50 + "\n")
+
+
 if __name__ == "__main__":
     # 运行测试
+    asyncio.run(test_auto_mode())
+    asyncio.run(test_size_policy())
     asyncio.run(test_result_processing())
     asyncio.run(test_text_processing())
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+测试搜索结果缓存功能
+"""
+
+import asyncio
+import json
+import time
+
+from llm.llm_chat_with_tools.tools.search_cache import SearchCache, normalize_query
+from llm.llm_chat_with_tools.tools.search_tools import (
+    format_search_results,
+    has_search_results,
+)
+
+
+class FakeRedis:
+    """本地Redis替身，只实现搜索缓存用到的get/set"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        entry = self.store.get(key)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1].encode("utf-8")
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = (time.time() + (ex or 3600), value)
+
+
+async def test_normalize_query():
+    """测试查询归一化"""
+    print("=== 查询归一化测试 ===")
+    assert normalize_query("  杭州   天气 ") == "杭州 天气"
+    assert normalize_query("ＨＥＬＬＯ World") == "hello world"
+    assert SearchCache.make_key("Hello  World", "google", 10) == SearchCache.make_key(
+        "hello world", "google", 10
+    )
+    assert SearchCache.make_key("hello", "google", 10) != SearchCache.make_key(
+        "hello", "google", 5
+    )
+    print("✅ 通过\n")
+
+
+async def test_single_flight():
+    """测试并发相同查询只请求一次上游"""
+    print("=== 并发请求合并测试 ===")
+    cache = SearchCache(ttl=60)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "杭州天气结果"
+
+    results = await asyncio.gather(
+        *[cache.get_or_fetch("杭州天气", "google", 10, fetch) for _ in range(10)]
+    )
+    assert calls == 1, calls
+    assert all(r == "杭州天气结果" for r in results)
+
+    # 缓存命中后不再请求上游
+    await cache.get_or_fetch("  杭州天气 ", "google", 10, fetch)
+    assert calls == 1
+    print(f"统计信息: {cache.get_stats()}")
+    print("✅ 通过\n")
+
+
+async def test_ttl_and_errors():
+    """测试过期和异常不缓存"""
+    print("=== TTL与异常测试 ===")
+    cache = SearchCache(ttl=0.05)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return f"结果{calls}"
+
+    assert await cache.get_or_fetch("q", "google", 10, fetch) == "结果1"
+    await asyncio.sleep(0.1)
+    assert await cache.get_or_fetch("q", "google", 10, fetch) == "结果2"
+
+    async def failing_fetch():
+        raise RuntimeError("upstream error")
+
+    for _ in range(2):
+        try:
+            await cache.get_or_fetch("bad", "google", 10, failing_fetch)
+            assert False, "应当抛出异常"
+        except RuntimeError:
+            pass
+    assert cache.get_stats()["misses"] == 4
+    print("✅ 通过\n")
+
+
+async def test_uncacheable_results():
+    """测试失败或没有结果的响应不缓存，缓存的原始响应按各自的查询格式化"""
+    print("=== 失败响应与原始响应缓存测试 ===")
+    cache = SearchCache(ttl=60)
+    responses = ['{"error": "rate limited"}', '{"results": []}']
+    ok = '{"results": [{"title": "杭州天气", "url": "https://example.com"}]}'
+
+    async def fetch():
+        return responses.pop(0) if responses else ok
+
+    for _ in range(2):
+        await cache.get_or_fetch(
+            "杭州天气", "google", 10, fetch, cacheable=has_search_results
+        )
+    assert cache.get_stats()["uncacheable"] == 2
+    assert cache.get_stats()["size"] == 0
+
+    first = await cache.get_or_fetch(
+        "杭州天气", "google", 10, fetch, cacheable=has_search_results
+    )
+    second = await cache.get_or_fetch(
+        " 杭州天气  ", "google", 10, fetch, cacheable=has_search_results
+    )
+    assert first == second == ok
+    assert cache.get_stats()["local_hits"] == 1
+    # 格式化结果使用调用方自己的查询文本
+    formatted = format_search_results(json.loads(second), " 杭州天气  ")
+    assert "**搜索查询**:  杭州天气  " in formatted
+    print("✅ 通过\n")
+
+
+async def test_redis_tier():
+    """测试Redis二级缓存"""
+    print("=== Redis二级缓存测试 ===")
+    redis = FakeRedis()
+    first = SearchCache(ttl=60, redis=redis)
+    second = SearchCache(ttl=60, redis=redis)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return "共享结果"
+
+    await first.get_or_fetch("news", "google", 10, fetch)
+    # 另一个进程内缓存为空，从Redis读取
+    assert await second.get_or_fetch("news", "google", 10, fetch) == "共享结果"
+    assert calls == 1
+    assert second.get_stats()["redis_hits"] == 1
+    print("✅ 通过\n")
+
+
+async def test_lru_eviction():
+    """测试进程内缓存容量限制"""
+    print("=== LRU淘汰测试 ===")
+    cache = SearchCache(ttl=60, max_entries=2)
+
+    async def fetch():
+        return "r"
+
+    for query in ["a", "b", "c"]:
+        await cache.get_or_fetch(query, "google", 10, fetch)
+    stats = cache.get_stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_normalize_query()
+    await test_single_flight()
+    await test_ttl_and_errors()
+    await test_uncacheable_results()
+    await test_redis_tier()
+    await test_lru_eviction()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+测试SSE事件编码和token合并发送
+"""
+
+import asyncio
+import json
+
+from langchain_core.messages import ToolMessage
+
+from llm.llm_chat_with_tools.chatbot.sse_events import (
+    FlushPolicy,
+    SSEEncoder,
+    coalesce_events,
+)
+
+
+async def fake_events(delay: float = 0.01):
+    """模拟两段模型输出，中间穿插一次工具调用结果"""
+    for i in range(10):
+        yield "token", (f"词{i}", "m1")
+        await asyncio.sleep(delay)
+    yield "tool_end", ToolMessage(content="结果", tool_call_id="c1", name="search_tool")
+    for i in range(3):
+        yield "token", (f"字{i}", "m2")
+
+
+async def collect(policy: FlushPolicy):
+    events = []
+    async for data in coalesce_events(fake_events(), SSEEncoder(), policy):
+        assert data.startswith(b"data: ") and data.endswith(b"\n\n")
+        events.append(json.loads(data[6:]))
+    return events
+
+
+def token_text(events):
+    return "".join(e["content"] for e in events if e["type"] == "token")
+
+
+async def test_event_schema():
+    """测试精简事件格式"""
+    print("=== 事件格式测试 ===")
+    events = await collect(FlushPolicy())
+    print(f"逐token发送：{len(events)} 个事件")
+    assert len(events) == 14
+    assert events[0] == {"type": "token", "content": "词0", "id": "m1"}
+    assert events[1] == {"type": "token", "content": "词1"}
+    assert events[10]["type"] == "tool_end" and events[10]["output"] == "结果"
+    assert events[11]["id"] == "m2"
+    print("✅ 通过\n")
+
+
+async def test_coalesced_flush():
+    """测试按时间和大小合并token"""
+    print("=== token合并测试 ===")
+    expected = token_text(await collect(FlushPolicy()))
+
+    by_time = await collect(FlushPolicy(max_ms=35))
+    print(f"按时间合并（35ms）：{len(by_time)} 个事件")
+    assert token_text(by_time) == expected
+    assert len(by_time) < 14
+
+    by_size = await collect(FlushPolicy(max_bytes=12))
+    print(f"按大小合并（12字节）：{len(by_size)} 个事件")
+    assert token_text(by_size) == expected
+    # 工具事件前先发送已缓冲的token，消息切换时重新附带id
+    kinds = [e["type"] for e in by_size]
+    assert kinds.index("tool_end") == len(kinds) - 2
+    assert by_size[-1]["id"] == "m2"
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_event_schema()
+    await test_coalesced_flush()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
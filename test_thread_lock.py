@@ -0,0 +1,121 @@
+"""
+测试同一线程的并发对话：拒绝、排队和取消较早的一轮
+"""
+
+import asyncio
+
+from llm.llm_chat_with_tools.chatbot.thread_lock import ThreadBusyError, ThreadLockManager
+from llm.llm_chat_with_tools.chatbot.turn_stream import TurnStreamHub
+
+ORDER = []
+
+
+async def fake_turn(name: str, count: int = 3, delay: float = 0.02):
+    """模拟一轮对话，记录开始、结束和被取消"""
+    ORDER.append(f"{name}:start")
+    try:
+        for i in range(count):
+            yield f'data: {{"type": "token", "content": "{name}{i}"}}\n\n'.encode("utf-8")
+            await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        ORDER.append(f"{name}:cancelled")
+        raise
+    ORDER.append(f"{name}:end")
+
+
+async def start_turn(hub: TurnStreamHub, locks: ThreadLockManager, name: str, policy: str):
+    lease = await locks.acquire("thread-1", policy)
+    return hub.start("thread-1", fake_turn(name), lease=lease)
+
+
+async def test_reject():
+    """测试reject策略：线程忙时立即拒绝，本轮结束后可以再次开始"""
+    print("=== reject 测试 ===")
+    ORDER.clear()
+    hub, locks = TurnStreamHub(), ThreadLockManager(policy="reject")
+    first = await start_turn(hub, locks, "a", "reject")
+    try:
+        await start_turn(hub, locks, "b", "reject")
+        raise AssertionError("线程忙时应拒绝")
+    except ThreadBusyError as e:
+        print(f"第二轮被拒绝: {e}")
+    await first.task
+    second = await start_turn(hub, locks, "c", "reject")
+    await second.task
+    print(f"执行顺序 {ORDER}，统计 {locks.get_stats()}")
+    assert ORDER == ["a:start", "a:end", "c:start", "c:end"]
+    assert locks.get_stats()["rejected"] == 1 and not locks.is_busy("thread-1")
+    print("✅ 通过\n")
+
+
+async def test_queue():
+    """测试queue策略：后到的轮次依次等待，不会交叉执行"""
+    print("=== queue 测试 ===")
+    ORDER.clear()
+    hub, locks = TurnStreamHub(), ThreadLockManager(policy="queue", queue_timeout=5)
+    runs = await asyncio.gather(
+        *(start_turn(hub, locks, name, "queue") for name in "abc")
+    )
+    await asyncio.gather(*(run.task for run in runs))
+    print(f"执行顺序 {ORDER}")
+    assert ORDER == ["a:start", "a:end", "b:start", "b:end", "c:start", "c:end"]
+
+    short = ThreadLockManager(policy="queue", queue_timeout=0.01)
+    run = await start_turn(hub, short, "d", "queue")
+    try:
+        await start_turn(hub, short, "e", "queue")
+        raise AssertionError("排队超时应拒绝")
+    except ThreadBusyError as e:
+        print(f"排队超时: {e}")
+    await run.task
+    assert short.get_stats()["timeouts"] == 1
+    print("✅ 通过\n")
+
+
+async def test_cancel_older():
+    """测试cancel_older策略：取消正在运行的一轮，等待其结束后再开始"""
+    print("=== cancel_older 测试 ===")
+    ORDER.clear()
+    hub, locks = TurnStreamHub(), ThreadLockManager(policy="cancel_older")
+    first = await start_turn(hub, locks, "a", "cancel_older")
+    await asyncio.sleep(0.03)
+    second = await start_turn(hub, locks, "b", "cancel_older")
+    await second.task
+    print(f"执行顺序 {ORDER}，第一轮状态 {first.status}")
+    assert ORDER == ["a:start", "a:cancelled", "b:start", "b:end"]
+    assert first.status == "cancelled" and second.status == "done"
+    assert locks.get_stats()["preempted"] == 1
+    print("✅ 通过\n")
+
+
+async def test_remote_lock_failure():
+    """测试获取数据库锁失败时撤销本地占位，不会让线程一直显示为忙"""
+    print("=== advisory lock 失败测试 ===")
+    locks = ThreadLockManager(policy="reject")
+    locks.use_advisory_lock("host=127.0.0.1 port=1 connect_timeout=1")
+    failed = False
+    try:
+        await locks.acquire("thread-1")
+    except ThreadBusyError:
+        raise
+    except Exception as e:
+        failed = True
+        print(f"获取数据库锁失败: {type(e).__name__}")
+    assert failed and not locks.is_busy("thread-1")
+
+    locks.use_advisory_lock(None)
+    lease = await locks.acquire("thread-1")
+    await lease.release()
+    assert locks.get_stats()["running"] == 0
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_reject()
+    await test_queue()
+    await test_cancel_older()
+    await test_remote_lock_failure()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
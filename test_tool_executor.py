@@ -0,0 +1,126 @@
+"""
+测试并发工具执行器：结果按调用顺序返回、单工具超时和并发上限
+"""
+
+import asyncio
+import os
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from llm.llm_chat_with_tools.tools.tool_executor import create_tool_executor
+
+# 执行中的工具数，用于检查并发上限
+running = {"active": 0, "max_active": 0}
+
+
+async def track(delay: float) -> None:
+    running["active"] += 1
+    running["max_active"] = max(running["max_active"], running["active"])
+    try:
+        await asyncio.sleep(delay)
+    finally:
+        running["active"] -= 1
+
+
+@tool
+async def fast_tool(value: str) -> str:
+    """快速返回的工具"""
+    await track(0.01)
+    return f"fast:{value}"
+
+
+@tool
+async def medium_tool(value: str) -> str:
+    """中等耗时的工具"""
+    await track(0.05)
+    return f"medium:{value}"
+
+
+@tool
+async def slow_tool(value: str) -> str:
+    """超过超时时间的工具"""
+    await track(1.0)
+    return f"slow:{value}"
+
+
+def build_message(names):
+    return AIMessage(
+        content="",
+        tool_calls=[
+            {"name": name, "args": {"value": str(i)}, "id": f"call_{i}"}
+            for i, name in enumerate(names)
+        ],
+    )
+
+
+def create_executor(max_concurrency: int):
+    """通过环境变量配置并发上限和slow_tool的超时时间"""
+    os.environ["TOOL_MAX_CONCURRENCY"] = str(max_concurrency)
+    os.environ["TOOL_TIMEOUTS"] = '{"slow_tool": 0.1}'
+    return create_tool_executor([fast_tool, medium_tool, slow_tool])
+
+
+async def test_result_order():
+    """测试耗时不同的工具结果仍按调用顺序返回"""
+    print("=== 结果顺序测试 ===")
+    executor = create_executor(4)
+    names = ["medium_tool", "fast_tool", "medium_tool", "fast_tool"]
+    result = await executor({"messages": [build_message(names)]}, {})
+
+    messages = result["messages"]
+    assert [m.tool_call_id for m in messages] == [f"call_{i}" for i in range(4)]
+    contents = [m.content for m in messages]
+    assert contents == ["medium:0", "fast:1", "medium:2", "fast:3"]
+    assert all(m.name == name for m, name in zip(messages, names))
+    print("✅ 通过\n")
+
+
+async def test_timeout():
+    """测试超时的工具返回错误ToolMessage，其他工具不受影响"""
+    print("=== 单工具超时测试 ===")
+    executor = create_executor(4)
+    assert executor.get_timeout("slow_tool") == 0.1
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await executor(
+        {"messages": [build_message(["slow_tool", "fast_tool"])]}, {}
+    )
+    elapsed = loop.time() - start
+
+    slow, fast = result["messages"]
+    assert slow.tool_call_id == "call_0" and slow.status == "error"
+    assert "超时" in slow.content
+    assert slow.response_metadata["tool_timing"]["timed_out"]
+    assert fast.content == "fast:1" and fast.status == "success"
+    assert elapsed < 0.5, elapsed
+    print("✅ 通过\n")
+
+
+async def test_concurrency_limit():
+    """测试同时执行的工具数不超过TOOL_MAX_CONCURRENCY"""
+    print("=== 并发上限测试 ===")
+    for limit in (1, 2, 3):
+        running["max_active"] = 0
+        executor = create_executor(limit)
+        assert executor.max_concurrency == limit
+        message = build_message(["medium_tool"] * 6)
+        result = await executor({"messages": [message]}, {})
+        assert len(result["messages"]) == 6
+        assert running["max_active"] == limit, (limit, running["max_active"])
+        queued = [
+            m.response_metadata["tool_timing"]["queued_ms"] for m in result["messages"]
+        ]
+        print(f"并发上限 {limit}：最大并发 {running['max_active']}，排队耗时 {queued}")
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_result_order()
+    await test_timeout()
+    await test_concurrency_limit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+测试可恢复的流式响应：事件编号、Last-Event-ID重放和断开后的取消
+"""
+
+import asyncio
+
+from llm.llm_chat_with_tools.chatbot.turn_stream import TurnStreamHub, parse_event_id
+
+RUNS = []
+
+
+async def fake_turn(count: int = 6, delay: float = 0.02):
+    """模拟一轮对话，记录执行次数"""
+    RUNS.append(1)
+    for i in range(count):
+        yield f'data: {{"type": "token", "content": "{i}"}}\n\n'.encode("utf-8")
+        await asyncio.sleep(delay)
+
+
+def event_id(frame: bytes) -> str:
+    return frame.split(b"\n", 1)[0][len(b"id: "):].decode("utf-8")
+
+
+async def test_resume_with_last_event_id():
+    """测试断线重连只重放缺失的事件，不重新执行"""
+    print("=== Last-Event-ID 重放测试 ===")
+    RUNS.clear()
+    hub = TurnStreamHub(grace_seconds=1, poll_interval=0.02)
+    run = hub.start("thread-1", fake_turn())
+
+    first = hub.subscribe(run)
+    received = [await first.__anext__(), await first.__anext__()]
+    await first.aclose()
+    last_event_id = event_id(received[-1])
+    print(f"断开前收到 {len(received)} 个事件，最后事件ID {last_event_id}")
+    assert parse_event_id(last_event_id) == (run.turn_id, 2)
+
+    await asyncio.sleep(0.05)
+    resumed = await hub.resume("thread-1", last_event_id)
+    async for frame in resumed:
+        received.append(frame)
+
+    seqs = [parse_event_id(event_id(frame))[1] for frame in received]
+    print(f"重连后共收到事件序号 {seqs}，执行次数 {len(RUNS)}")
+    assert seqs == [1, 2, 3, 4, 5, 6]
+    assert len(RUNS) == 1 and run.status == "done"
+
+    assert await hub.resume("thread-2", last_event_id) is None
+    assert await hub.resume("thread-1", "not-an-id") is None
+    print("✅ 通过\n")
+
+
+async def test_expired_events():
+    """测试缺失的事件已被环形缓冲丢弃时无法恢复"""
+    print("=== 环形缓冲过期测试 ===")
+    hub = TurnStreamHub(max_events=3, grace_seconds=1, poll_interval=0.02)
+    run = hub.start("thread-1", fake_turn(delay=0))
+    await run.task
+    assert await hub.resume("thread-1", f"{run.turn_id}:1") is None
+    assert await hub.resume("thread-1", f"{run.turn_id}:3") is not None
+    print("✅ 通过\n")
+
+
+async def test_cancel_after_grace():
+    """测试所有客户端断开超过等待时间后取消本轮"""
+    print("=== 断开取消测试 ===")
+    cancelled = []
+
+    async def slow_turn():
+        yield b'data: {"type": "token", "content": "start"}\n\n'
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        yield b'data: {"type": "token", "content": "never"}\n\n'
+
+    disconnected = False
+
+    async def is_disconnected():
+        return disconnected
+
+    hub = TurnStreamHub(grace_seconds=0.1, poll_interval=0.02)
+    run = hub.start("thread-1", slow_turn())
+    async for _ in hub.subscribe(run, is_disconnected=is_disconnected):
+        disconnected = True
+
+    assert run.status == "running"
+    await asyncio.sleep(0.2)
+    print(f"本轮状态 {run.status}，统计 {hub.get_stats()}")
+    assert cancelled and run.status == "cancelled"
+    print("✅ 通过\n")
+
+
+async def main():
+    await test_resume_with_last_event_id()
+    await test_expired_events()
+    await test_cancel_after_grace()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
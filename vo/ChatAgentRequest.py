@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -12,3 +12,18 @@ class ChatAgentRequest(BaseModel):
     summary_with_llm: bool = Field(
         description="是否启用LLM智能总结功能", default=False
     )
+    flush_bytes: Optional[int] = Field(
+        description="token缓冲达到该字节数时发送，为空时使用服务端配置，0表示不按大小合并",
+        default=None,
+        ge=0,
+    )
+    flush_ms: Optional[int] = Field(
+        description="token缓冲超过该毫秒数时发送，为空时使用服务端配置，0表示不按时间合并",
+        default=None,
+        ge=0,
+        le=5000,
+    )
+    busy_policy: Optional[Literal["reject", "queue", "cancel_older"]] = Field(
+        description="该线程已有一轮在运行时的处理策略：reject返回409，queue排队等待，cancel_older取消正在运行的一轮；为空时使用服务端配置",
+        default=None,
+    )